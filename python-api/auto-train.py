@@ -14,16 +14,29 @@ import os
 from datetime import datetime
 import time
 import json
-import threading
-import queue
 import sys
 
+from ml_features import (
+    MACRO_ELEMENTS, MICRO_ELEMENTS, ENHANCED_ELEMENTS, ENHANCED_FEATURE_NAMES,
+    CATION_ELEMENTS, ANION_ELEMENTS,
+    enhanced_features_from_scenarios
+)
+from ml_models import (
+    as_multi_output, create_base_model, benchmark_models, BENCHMARK_MODELS,
+    dosage_metrics, is_micro_fertilizer, micro_fertilizer_mask
+)
+from model_registry import get_model_registry
+from training_workers import CandidatePool, available_cpus
+from training_data import (
+    ENHANCED_PROFILE, SequentialMicronutrientLabeler, dicts_to_matrix,
+    generate_training_shards, shard_to_scenarios, iter_training_scenarios
+)
+
 # ML Imports
 try:
     from sklearn.ensemble import RandomForestRegressor, ExtraTreesRegressor, GradientBoostingRegressor
     from sklearn.preprocessing import StandardScaler, RobustScaler
     from sklearn.model_selection import train_test_split
-    from sklearn.metrics import mean_absolute_error, r2_score
     from sklearn.multioutput import MultiOutputRegressor
     from sklearn.linear_model import Ridge, ElasticNet
     SKLEARN_AVAILABLE = True
@@ -48,6 +61,12 @@ class EnhancedTrainingConfig:
     timeout_seconds: int = 240             # 4 minute timeout per model (more time for complexity)
     models_to_try: List[str] = None
     
+    # Candidate worker processes (timed-out or outpaced candidates are terminated)
+    candidate_workers: int = 0             # Parallel candidate processes (0 = one per model, capped by CPUs)
+    threads_per_candidate: int = 1         # BLAS/OpenMP threads per candidate process
+    pin_candidate_cpus: bool = False       # Pin each candidate process to its own CPUs (Linux)
+    time_budget_seconds: Optional[float] = None  # Wall-clock budget for the whole training run
+    
     # Validation requirements
     validation_split: float = 0.2
     convergence_patience: int = 4          # More patience for micronutrient convergence
@@ -56,33 +75,25 @@ class EnhancedTrainingConfig:
     target_accuracy_weight: float = 0.8
     micronutrient_weight: float = 0.3      # NEW: Weight for micronutrient accuracy
     
+    # Synthetic data generation
+    data_workers: int = 0                  # Worker processes for data generation (0 = TRAINING_DATA_WORKERS)
+    data_shard_size: int = 5000            # Scenarios per shard / per worker task
+    data_seed: Optional[int] = None        # Fixed seed for reproducible training data
+    training_data_dir: Optional[str] = None  # Write shards here and stream them back
+    
     def __post_init__(self):
         if self.models_to_try is None:
             # Enhanced models for micronutrient complexity
             self.models_to_try = [
-                "GradientBoostingRegressor",    # Best for complex relationships
+                "HistGradientBoostingRegressor",  # Boosting on binned features (much faster than GradientBoosting)
                 "ExtraTreesRegressor",          # Good for micronutrients
                 "RandomForestRegressor",        # Reliable fallback
                 "Ridge"                         # Fast backup
             ]
 
-class ModelTrainingThread(threading.Thread):
-    """Thread for model training with timeout support"""
-    
-    def __init__(self, trainer, training_data, model_name, result_queue):
-        super().__init__()
-        self.trainer = trainer
-        self.training_data = training_data
-        self.model_name = model_name
-        self.result_queue = result_queue
-        self.daemon = True
-    
-    def run(self):
-        try:
-            result = self.trainer._train_and_evaluate_safe(self.training_data, self.model_name)
-            self.result_queue.put(('success', result))
-        except Exception as e:
-            self.result_queue.put(('error', str(e)))
+def _train_candidate(trainer, X: np.ndarray, y: np.ndarray, model_name: str) -> Dict[str, Any]:
+    """Candidate worker entry point (runs in a CandidatePool process)"""
+    return trainer._fit_and_evaluate(X, y, model_name)
 
 class EnhancedWindowsMLTrainer:
     """Enhanced Windows-compatible ML trainer with complete micronutrient support"""
@@ -94,6 +105,7 @@ class EnhancedWindowsMLTrainer:
         self.best_score = float('inf')
         self.scaler = None
         self.fertilizer_names = []
+        self.micro_fertilizer_mask = np.zeros(0, dtype=bool)
         
         # Enhanced fertilizer database for Windows with micronutrients
         self.fertilizer_compositions = self._create_enhanced_fertilizer_db()
@@ -104,9 +116,9 @@ class EnhancedWindowsMLTrainer:
         self.convergence_achieved = False
         
         # Micronutrient elements
-        self.macro_elements = ['N', 'P', 'K', 'Ca', 'Mg', 'S']
-        self.micro_elements = ['Fe', 'Mn', 'Zn', 'Cu', 'B', 'Mo']
-        self.all_elements = self.macro_elements + self.micro_elements
+        self.macro_elements = list(MACRO_ELEMENTS)
+        self.micro_elements = list(MICRO_ELEMENTS)
+        self.all_elements = list(ENHANCED_ELEMENTS)
         
         print(f"[ENHANCED-TRAIN] Enhanced Windows ML Trainer initialized with micronutrient support")
         print(f"   Target MAE threshold: {self.config.target_mae_threshold} mg/L")
@@ -114,6 +126,12 @@ class EnhancedWindowsMLTrainer:
         print(f"   Max iterations: {self.config.max_training_iterations}")
         print(f"   Micronutrient elements: {', '.join(self.micro_elements)}")
 
+    def __getstate__(self):
+        # Candidate workers get the configuration and fertilizer list, not fitted models
+        state = self.__dict__.copy()
+        state.update(best_model=None, scaler=None, training_history=[])
+        return state
+
     def _create_enhanced_fertilizer_db(self) -> Dict[str, Dict]:
         """Create enhanced Windows-optimized fertilizer database with micronutrients"""
         return {
@@ -221,65 +239,73 @@ class EnhancedWindowsMLTrainer:
             print(f"\n--- ENHANCED ITERATION {iteration + 1}/{self.config.max_training_iterations} ---")
             print(f"Training samples: {current_samples:,}")
             
+            remaining_budget = None
+            if self.config.time_budget_seconds is not None:
+                remaining_budget = self.config.time_budget_seconds - (time.time() - self.training_start_time)
+                if remaining_budget <= 0:
+                    print(f"   [TIME] Training budget of {self.config.time_budget_seconds:.0f}s used up")
+                    break
+            
             # Generate enhanced training data with micronutrients
             training_data = self._generate_enhanced_training_data(current_samples)
             
-            # Try models with threading timeout
+            # Featurize once; every candidate process fits the same arrays
+            X, y = self._prepare_training_arrays(training_data)
             best_iteration_model = None
             best_iteration_score = float('inf')
             
-            for model_name in self.config.models_to_try:
-                print(f"\nTesting enhanced model: {model_name}")
+            models = list(self.config.models_to_try)
+            print(f"\nTesting {len(models)} enhanced models in parallel: {', '.join(models)}")
+            pool = CandidatePool(
+                max_workers=min(len(models), self.config.candidate_workers or len(models),
+                                max(1, len(available_cpus()) // max(1, self.config.threads_per_candidate))),
+                threads_per_worker=self.config.threads_per_candidate,
+                pin_cpus=self.config.pin_candidate_cpus
+            )
+            # The first candidate to meet the requirements ends the iteration; the others are terminated
+            outcomes = pool.run(
+                _train_candidate,
+                [(model_name, (self, X, y, model_name)) for model_name in models],
+                timeout_seconds=self.config.timeout_seconds,
+                time_budget_seconds=remaining_budget,
+                stop_when=lambda name, result: result['meets_requirements']
+            )
+            
+            for outcome in outcomes:
+                model_name = outcome['name']
+                if outcome['status'] != 'success':
+                    if outcome['status'] == 'timeout':
+                        print(f"   [TIME] Model {model_name} timed out after {self.config.timeout_seconds}s (terminated)")
+                    elif outcome['status'] == 'error':
+                        print(f"   [ERROR] Model {model_name} failed: {outcome['error']}")
+                    else:
+                        print(f"   [?] Model {model_name} {outcome['status']}")
+                    continue
                 
-                try:
-                    # Use threading for timeout on Windows
-                    result_queue = queue.Queue()
-                    training_thread = ModelTrainingThread(self, training_data, model_name, result_queue)
-                    
-                    training_thread.start()
-                    training_thread.join(timeout=self.config.timeout_seconds)
-                    
-                    if training_thread.is_alive():
-                        print(f"   [TIME] Model {model_name} timed out after {self.config.timeout_seconds}s")
-                        continue
-                    
-                    # Get result from queue
-                    try:
-                        status, result = result_queue.get_nowait()
-                        if status == 'error':
-                            print(f"   [ERROR] Model {model_name} failed: {result}")
-                            continue
-                        
-                        model_results = result
-                        
-                    except queue.Empty:
-                        print(f"   [ERROR] Model {model_name} failed: No result returned")
-                        continue
-                    
-                    # Check if acceptable (enhanced requirements)
-                    if self._check_enhanced_requirements(model_results):
-                        print(f"\n[TARGET] SUCCESS! Enhanced model {model_name} meets micronutrient requirements!")
-                        print(f"   MAE: {model_results['target_mae']:.3f} mg/L")
-                        print(f"   R²: {model_results['target_r2']:.4f}")
-                        print(f"   Max deviation: {model_results['max_deviation']:.1f}%")
-                        print(f"   Micronutrient accuracy: {model_results.get('micronutrient_accuracy', 0):.3f}")
-                        
-                        self.best_model = model_results['model']
-                        self.scaler = model_results['scaler']
-                        self.convergence_achieved = True
-                        
-                        self._save_enhanced_model(model_results, iteration, model_name)
-                        return self._create_enhanced_summary(iteration + 1, model_name)
+                model_results = outcome['result']
+                print(f"   {model_name}: MAE {model_results['target_mae']:.3f}, R² {model_results['target_r2']:.4f}, "
+                      f"max dev {model_results['max_deviation']:.1f}%, {outcome['seconds']:.1f}s")
+                
+                # Check if acceptable (enhanced requirements, evaluated in the worker)
+                if model_results.get('meets_requirements'):
+                    print(f"\n[TARGET] SUCCESS! Enhanced model {model_name} meets micronutrient requirements!")
+                    print(f"   MAE: {model_results['target_mae']:.3f} mg/L")
+                    print(f"   R²: {model_results['target_r2']:.4f}")
+                    print(f"   Max deviation: {model_results['max_deviation']:.1f}%")
+                    print(f"   Micronutrient accuracy: {model_results.get('micronutrient_accuracy', 0):.3f}")
                     
-                    # Track best
-                    if model_results['combined_score'] < best_iteration_score:
-                        best_iteration_score = model_results['combined_score']
-                        best_iteration_model = model_results
-                        print(f"   [?] New iteration best: {best_iteration_score:.4f}")
+                    self.best_model = model_results['model']
+                    self.scaler = model_results['scaler']
+                    self.convergence_achieved = True
                     
-                except Exception as e:
-                    print(f"   [ERROR] Model {model_name} failed: {e}")
-                    continue
+                    self._save_enhanced_model(model_results, iteration, model_name)
+                    return self._create_enhanced_summary(iteration + 1, model_name)
+                
+                # Track best
+                if model_results['combined_score'] < best_iteration_score:
+                    best_iteration_score = model_results['combined_score']
+                    best_iteration_model = model_results
+                    print(f"   [?] New iteration best: {best_iteration_score:.4f}")
             
             # Update global best
             if best_iteration_model and best_iteration_score < self.best_score:
@@ -319,238 +345,72 @@ class EnhancedWindowsMLTrainer:
         """Generate enhanced training data with complete micronutrient support"""
         print(f"   Generating {n_samples:,} enhanced training samples with micronutrients...")
         
-        training_scenarios = []
-        
-        # Enhanced crop scenarios with micronutrient requirements
-        crop_scenarios = {
-            'leafy_greens': {
-                # Macronutrients
-                'N': (120, 180), 'P': (30, 50), 'K': (150, 250), 'Ca': (120, 200), 'Mg': (30, 60), 'S': (50, 100),
-                # Micronutrients
-                'Fe': (1.5, 2.5), 'Mn': (0.4, 0.7), 'Zn': (0.2, 0.4), 'Cu': (0.08, 0.15), 'B': (0.3, 0.6), 'Mo': (0.03, 0.07)
-            },
-            'fruiting_crops': {
-                # Macronutrients
-                'N': (150, 220), 'P': (40, 70), 'K': (200, 350), 'Ca': (150, 250), 'Mg': (40, 80), 'S': (60, 120),
-                # Micronutrients
-                'Fe': (2.0, 3.5), 'Mn': (0.5, 1.0), 'Zn': (0.3, 0.6), 'Cu': (0.1, 0.2), 'B': (0.4, 0.8), 'Mo': (0.04, 0.08)
-            },
-            'herbs': {
-                # Macronutrients
-                'N': (100, 150), 'P': (25, 45), 'K': (120, 200), 'Ca': (100, 160), 'Mg': (25, 50), 'S': (40, 80),
-                # Micronutrients
-                'Fe': (1.2, 2.2), 'Mn': (0.3, 0.6), 'Zn': (0.15, 0.35), 'Cu': (0.06, 0.12), 'B': (0.25, 0.55), 'Mo': (0.02, 0.06)
-            }
-        }
-        
-        # Enhanced water scenarios with micronutrients
-        water_scenarios = {
-            'soft': {
-                # Macronutrients
-                'Ca': (5, 25), 'K': (1, 8), 'Mg': (2, 12), 'N': (0, 5), 'S': (2, 10),
-                # Micronutrients
-                'Fe': (0.05, 0.2), 'Mn': (0.01, 0.05), 'Zn': (0.005, 0.02), 'Cu': (0.002, 0.01), 'B': (0.02, 0.1), 'Mo': (0.001, 0.005)
-            },
-            'medium': {
-                # Macronutrients
-                'Ca': (20, 60), 'K': (3, 15), 'Mg': (8, 25), 'N': (1, 10), 'S': (5, 20),
-                # Micronutrients
-                'Fe': (0.1, 0.4), 'Mn': (0.02, 0.1), 'Zn': (0.01, 0.04), 'Cu': (0.005, 0.02), 'B': (0.05, 0.2), 'Mo': (0.002, 0.01)
-            },
-            'hard': {
-                # Macronutrients
-                'Ca': (50, 120), 'K': (5, 25), 'Mg': (20, 50), 'N': (2, 20), 'S': (10, 40),
-                # Micronutrients
-                'Fe': (0.2, 0.8), 'Mn': (0.05, 0.2), 'Zn': (0.02, 0.08), 'Cu': (0.01, 0.04), 'B': (0.1, 0.4), 'Mo': (0.005, 0.02)
-            }
-        }
+        # Each iteration draws fresh data; a fixed seed stays reproducible per iteration
+        seed = None
+        if self.config.data_seed is not None:
+            seed = self.config.data_seed + self.total_samples_generated
         
-        # Complete fertilizer set including micronutrients
-        fertilizer_set = ['nitrato_calcio', 'nitrato_potasio', 'fosfato_monopotasico', 'sulfato_magnesio', 'sulfato_potasio',
-                         'quelato_hierro', 'sulfato_manganeso', 'sulfato_zinc', 'sulfato_cobre', 'acido_borico', 'molibdato_sodio']
+        result = generate_training_shards(
+            ENHANCED_PROFILE, SequentialMicronutrientLabeler(), n_samples,
+            shard_size=self.config.data_shard_size,
+            workers=self.config.data_workers or None,
+            seed=seed,
+            output_dir=self.config.training_data_dir
+        )
         
-        for i in range(n_samples):
-            # Random selections
-            crop_type = np.random.choice(list(crop_scenarios.keys()))
-            water_type = np.random.choice(list(water_scenarios.keys()))
-            
-            # Generate targets including micronutrients
-            targets = {}
-            for element, (min_val, max_val) in crop_scenarios[crop_type].items():
-                targets[element] = np.random.uniform(min_val, max_val)
-            
-            # Generate water including micronutrients
-            water = {}
-            for element, (min_val, max_val) in water_scenarios[water_type].items():
-                water[element] = np.random.uniform(min_val, max_val)
-            
-            # Fill missing elements
-            for element in self.all_elements:
-                if element not in water:
-                    if element in self.micro_elements:
-                        water[element] = np.random.uniform(0, 0.1)
-                    else:
-                        water[element] = np.random.uniform(0, 5)
-                if element not in targets:
-                    if element in self.micro_elements:
-                        defaults = {'Fe': 2.0, 'Mn': 0.5, 'Zn': 0.3, 'Cu': 0.1, 'B': 0.5, 'Mo': 0.05}
-                        targets[element] = defaults.get(element, 0.1)
-                    else:
-                        targets[element] = np.random.uniform(50, 200)
-            
-            # Calculate optimal dosages including micronutrients
-            optimal_dosages = self._calculate_enhanced_optimal_dosages(targets, water, fertilizer_set)
-            
-            # Calculate micronutrient quality score
-            micronutrient_quality = self._evaluate_micronutrient_quality(optimal_dosages, targets, fertilizer_set)
-            
-            scenario = {
-                'targets': targets,
-                'water': water,
-                'fertilizer_set': fertilizer_set,
-                'optimal_dosages': optimal_dosages,
-                'micronutrient_quality': micronutrient_quality,
-                'crop_type': crop_type,
-                'water_type': water_type
-            }
-            
-            training_scenarios.append(scenario)
-            
-            # Progress update
-            if (i + 1) % (n_samples // 4) == 0:
-                progress = (i + 1) / n_samples * 100
-                print(f"     Progress: {progress:.0f}%")
+        training_scenarios = []
+        if self.config.training_data_dir:
+            # Stream shards back from disk
+            for shard_scenarios in iter_training_scenarios(self.config.training_data_dir):
+                training_scenarios.extend(shard_scenarios)
+        else:
+            for shard in result['shards']:
+                training_scenarios.extend(shard_to_scenarios(shard, result['manifest']))
         
         self.total_samples_generated += n_samples
         print(f"   [SUCCESS] Generated {n_samples:,} enhanced training scenarios with micronutrients")
         return training_scenarios
 
     def _calculate_enhanced_optimal_dosages(self, targets: Dict[str, float], water: Dict[str, float], fertilizer_names: List[str]) -> Dict[str, float]:
-        """Calculate optimal dosages including micronutrients using enhanced chemistry"""
-        dosages = {}
-        
-        # Calculate remaining needs
-        remaining = {elem: max(0, targets.get(elem, 0) - water.get(elem, 0)) for elem in self.all_elements}
-        
-        # Enhanced sequential calculation including micronutrients
-        calculations = [
-            # Macronutrients
-            ('fosfato_monopotasico', 'P', 22.76, {'K': 28.73}),
-            ('nitrato_calcio', 'Ca', 16.97, {'N': 11.86}),
-            ('nitrato_potasio', 'K', 38.67, {'N': 13.85}),
-            ('sulfato_magnesio', 'Mg', 9.87, {'S': 13.01}),
-            ('sulfato_potasio', 'K', 44.87, {'S': 18.39}),
-            
-            # Micronutrients
-            ('quelato_hierro', 'Fe', 13.0, {'Na': 6.27, 'N': 7.63}),
-            ('sulfato_manganeso', 'Mn', 24.63, {'S': 14.37}),
-            ('sulfato_zinc', 'Zn', 22.74, {'S': 11.15}),
-            ('sulfato_cobre', 'Cu', 25.45, {'S': 12.84}),
-            ('acido_borico', 'B', 17.48, {}),
-            ('molibdato_sodio', 'Mo', 39.66, {'Na': 19.01})
-        ]
-        
-        for fert_name, primary_element, primary_content, secondary_elements in calculations:
-            if fert_name in fertilizer_names and remaining.get(primary_element, 0) > 0:
-                need = remaining[primary_element]
-                
-                # Adjust dosage calculation for micronutrients (smaller amounts)
-                if primary_element in self.micro_elements:
-                    # Micronutrients: more precise calculation
-                    dosage_mg = need / (primary_content / 100) * (100 / 98)
-                    # Limit micronutrient fertilizer dosages
-                    if dosage_mg > 100:  # Max 100 mg/L for any micronutrient fertilizer
-                        dosage_mg = 100
-                else:
-                    # Macronutrients: standard calculation
-                    dosage_mg = need / (primary_content / 100) * (100 / 98)
-                
-                # Apply reasonable dosage limits
-                if primary_element in self.micro_elements:
-                    min_dosage, max_dosage = 0.001, 0.1  # 0.001-0.1 g/L for micros
-                else:
-                    min_dosage, max_dosage = 0.01, 5.0   # 0.01-5.0 g/L for macros
-                
-                if min_dosage <= dosage_mg / 1000 <= max_dosage:
-                    dosages[fert_name] = dosage_mg / 1000
-                    
-                    # Update remaining nutrients
-                    remaining[primary_element] = 0
-                    for elem, content in secondary_elements.items():
-                        contribution = dosage_mg * (content / 100) * (98 / 100)
-                        if elem in remaining:
-                            remaining[elem] = max(0, remaining.get(elem, 0) - contribution)
-        
-        return dosages
+        """Calculate optimal dosages including micronutrients using enhanced chemistry (one scenario)"""
+        labeler = SequentialMicronutrientLabeler(fertilizer_names)
+        dosages = labeler.dosages(dicts_to_matrix([targets], labeler.elements),
+                                  dicts_to_matrix([water], labeler.elements))[0]
+        return {name: float(d) for name, d in zip(labeler.fertilizer_names, dosages) if d > 0}
 
     def _evaluate_micronutrient_quality(self, dosages: Dict[str, float], targets: Dict[str, float], fertilizer_set: List[str]) -> float:
-        """Evaluate micronutrient coverage and quality"""
-        
-        # Calculate achieved micronutrient concentrations
-        achieved_micros = {}
-        
-        # Micronutrient fertilizer contributions
-        micro_fertilizers = {
-            'quelato_hierro': ('Fe', 13.0),
-            'sulfato_manganeso': ('Mn', 24.63),
-            'sulfato_zinc': ('Zn', 22.74),
-            'sulfato_cobre': ('Cu', 25.45),
-            'acido_borico': ('B', 17.48),
-            'molibdato_sodio': ('Mo', 39.66)
-        }
-        
-        for fert_name, (element, content_percent) in micro_fertilizers.items():
-            if fert_name in dosages and dosages[fert_name] > 0:
-                dosage_mg_l = dosages[fert_name] * 1000
-                contribution = dosage_mg_l * (content_percent / 100) * (98 / 100)  # 98% purity
-                achieved_micros[element] = achieved_micros.get(element, 0) + contribution
-        
-        # Evaluate micronutrient adequacy
-        micro_scores = []
-        for micro in self.micro_elements:
-            target = targets.get(micro, 0)
-            achieved = achieved_micros.get(micro, 0)
-            
-            if target > 0:
-                # More forgiving scoring for micronutrients (+/-50% acceptable)
-                deviation = abs(achieved - target) / target
-                if deviation <= 0.5:
-                    score = 1.0 - deviation
-                else:
-                    score = max(0, 0.5 - (deviation - 0.5) * 0.3)
-                micro_scores.append(score)
-        
-        # Overall micronutrient quality
-        if micro_scores:
-            return sum(micro_scores) / len(micro_scores)
-        else:
-            return 0.5  # Default score if no micronutrients
+        """Evaluate micronutrient coverage and quality (one scenario)"""
+        labeler = SequentialMicronutrientLabeler(fertilizer_set)
+        targets_row = dicts_to_matrix([targets], labeler.elements)
+        dosage_row = np.array([[dosages.get(name, 0.0) for name in labeler.fertilizer_names]])
+        return float(labeler.quality(targets_row, np.zeros_like(targets_row), dosage_row)[0])
 
     def _train_and_evaluate_safe(self, training_data: List[Dict], model_name: str) -> Dict[str, Any]:
         """Enhanced Windows-safe training and evaluation with micronutrients"""
-        # Prepare data
-        X_features = []
-        y_dosages = []
-        
+        X, y = self._prepare_training_arrays(training_data)
+        return self._fit_and_evaluate(X, y, model_name)
+
+    def _prepare_training_arrays(self, training_data: List[Dict]) -> Tuple[np.ndarray, np.ndarray]:
+        """Feature matrix and dosage targets; sets fertilizer_names (the output columns)"""
         # Extract fertilizer names including micronutrients
         all_fertilizer_names = set()
         for scenario in training_data:
             all_fertilizer_names.update(scenario['optimal_dosages'].keys())
         self.fertilizer_names = sorted(list(all_fertilizer_names))
+        self.micro_fertilizer_mask = micro_fertilizer_mask(self.fertilizer_names)
         
         print(f"       Training with {len(self.fertilizer_names)} fertilizers (including micronutrients)")
         
-        # Extract enhanced features and targets
-        for scenario in training_data:
-            features = self._extract_enhanced_features(scenario)
-            X_features.append(features)
-            
-            dosage_array = [scenario['optimal_dosages'].get(name, 0.0) for name in self.fertilizer_names]
-            y_dosages.append(dosage_array)
-        
-        X = np.array(X_features, dtype=np.float64)
-        y = np.array(y_dosages, dtype=np.float64)
-        
+        # Extract enhanced features for every scenario at once (shared featurizer)
+        X = enhanced_features_from_scenarios(training_data)
+        y = np.array([
+            [scenario['optimal_dosages'].get(name, 0.0) for name in self.fertilizer_names]
+            for scenario in training_data
+        ], dtype=np.float64)
+        return X, y
+
+    def _fit_and_evaluate(self, X: np.ndarray, y: np.ndarray, model_name: str) -> Dict[str, Any]:
+        """Split, scale, fit and score one candidate model"""
         # Split and scale
         X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
         
@@ -567,13 +427,14 @@ class EnhancedWindowsMLTrainer:
         # Evaluate
         y_pred_test = model.predict(X_test_scaled)
         
-        # Calculate enhanced metrics including micronutrient accuracy
-        target_mae = mean_absolute_error(y_test.flatten(), y_pred_test.flatten())
-        target_r2 = r2_score(y_test, y_pred_test, multioutput='uniform_average')
-        max_deviation = self._calculate_enhanced_max_deviation(y_test, y_pred_test)
+        # Enhanced metrics over the full test set: overall, micro/macro and per fertilizer
+        metrics = dosage_metrics(y_test, y_pred_test, self.fertilizer_names, self.micro_fertilizer_mask)
+        target_mae = metrics['mae']
+        target_r2 = metrics['r2']
+        max_deviation = metrics['max_deviation']
         
-        # Calculate micronutrient-specific accuracy
-        micronutrient_accuracy = self._calculate_micronutrient_accuracy(y_test, y_pred_test)
+        # Micronutrient accuracy is the micro columns' R² (1.0 without micronutrient fertilizers)
+        micronutrient_accuracy = max(0.0, metrics['micro']['r2']) if metrics['micro'] else 1.0
         
         # Enhanced combined score considering micronutrients
         combined_score = (target_mae * 2.0 + 
@@ -589,96 +450,33 @@ class EnhancedWindowsMLTrainer:
             'target_r2': target_r2,
             'max_deviation': max_deviation,
             'micronutrient_accuracy': micronutrient_accuracy,
+            'micro_metrics': metrics['micro'],
+            'macro_metrics': metrics['macro'],
+            'per_fertilizer_metrics': metrics['per_fertilizer'],
             'combined_score': combined_score,
             'training_time': training_time,
             'training_samples': len(X_train),
             'feature_count': X.shape[1],
             'fertilizer_count': len(self.fertilizer_names)
         }
+        results['meets_requirements'] = self._check_enhanced_requirements(results)
         
         print(f"       MAE: {target_mae:.3f} mg/L")
         print(f"       R²: {target_r2:.4f}")
         print(f"       Max dev: {max_deviation:.1f}%")
         print(f"       Micro accuracy: {micronutrient_accuracy:.3f}")
+        worst = sorted(metrics['per_fertilizer'].items(), key=lambda item: item[1]['mae'], reverse=True)[:3]
+        print(f"       Worst fertilizers: " + ", ".join(f"{name} (MAE {m['mae']:.4f})" for name, m in worst))
         print(f"       Time: {training_time:.1f}s")
         
         return results
 
     def _extract_enhanced_features(self, scenario: Dict) -> List[float]:
-        """Extract enhanced features including micronutrient relationships"""
-        features = []
-        
-        # 1. Target concentrations (macro + micro)
-        for element in self.all_elements:
-            target = scenario['targets'].get(element, 0)
-            if element in self.macro_elements:
-                normalized = target / 300.0  # Macro: 0-300 mg/L
-            else:
-                normalized = target / 5.0    # Micro: 0-5 mg/L
-            features.append(normalized)
-        
-        # 2. Water concentrations (macro + micro)
-        for element in self.all_elements:
-            water = scenario['water'].get(element, 0)
-            if element in self.macro_elements:
-                normalized = water / 100.0   # Water macro: 0-100 mg/L
-            else:
-                normalized = water / 1.0     # Water micro: 0-1 mg/L
-            features.append(normalized)
-        
-        # 3. Remaining needs (target - water)
-        for element in self.all_elements:
-            target = scenario['targets'].get(element, 0)
-            water = scenario['water'].get(element, 0)
-            remaining = max(0, target - water)
-            if element in self.macro_elements:
-                normalized = remaining / 300.0
-            else:
-                normalized = remaining / 5.0
-            features.append(normalized)
-        
-        # 4. Nutrient ratios (enhanced with micronutrient ratios)
-        targets = scenario['targets']
-        
-        # Traditional macro ratios
-        k_ca_ratio = targets.get('K', 0) / max(targets.get('Ca', 1), 1) / 2.0
-        ca_mg_ratio = targets.get('Ca', 0) / max(targets.get('Mg', 1), 1) / 5.0
-        n_k_ratio = targets.get('N', 0) / max(targets.get('K', 1), 1) / 1.5
-        features.extend([k_ca_ratio, ca_mg_ratio, n_k_ratio])
-        
-        # Micronutrient ratios
-        fe_mn_ratio = targets.get('Fe', 0) / max(targets.get('Mn', 0.1), 0.1) / 10.0
-        fe_zn_ratio = targets.get('Fe', 0) / max(targets.get('Zn', 0.1), 0.1) / 20.0
-        mn_zn_ratio = targets.get('Mn', 0) / max(targets.get('Zn', 0.1), 0.1) / 3.0
-        features.extend([fe_mn_ratio, fe_zn_ratio, mn_zn_ratio])
-        
-        # 5. Total nutrient demands
-        total_macro = sum(targets.get(elem, 0) for elem in self.macro_elements) / 1000.0
-        total_micro = sum(targets.get(elem, 0) for elem in self.micro_elements) / 10.0
-        micro_intensity = total_micro / max(total_macro, 0.1)
-        features.extend([total_macro, total_micro, micro_intensity])
-        
-        # 6. Crop and water type encoding
-        crop_encoding = {
-            'leafy_greens': [1, 0, 0],
-            'fruiting_crops': [0, 1, 0],
-            'herbs': [0, 0, 1]
-        }
-        crop_features = crop_encoding.get(scenario.get('crop_type', 'leafy_greens'), [1, 0, 0])
-        features.extend(crop_features)
-        
-        water_encoding = {
-            'soft': [1, 0, 0],
-            'medium': [0, 1, 0],
-            'hard': [0, 0, 1]
-        }
-        water_features = water_encoding.get(scenario.get('water_type', 'medium'), [0, 1, 0])
-        features.extend(water_features)
-        
-        return features
+        """Extract enhanced features including micronutrient relationships (one scenario)"""
+        return enhanced_features_from_scenarios([scenario])[0].tolist()
 
     def _create_enhanced_model(self, model_name: str):
-        """Create enhanced Windows-compatible model for micronutrients"""
+        """Create enhanced Windows-compatible model for micronutrients (natively multi-output where possible)"""
         if model_name == "GradientBoostingRegressor":
             base_model = GradientBoostingRegressor(
                 n_estimators=100,       # More estimators for micronutrient complexity
@@ -687,6 +485,14 @@ class EnhancedWindowsMLTrainer:
                 subsample=0.8,
                 random_state=42
             )
+        elif model_name in ("HistGradientBoostingRegressor", "XGBRegressor"):
+            base_model = create_base_model(
+                model_name,
+                n_estimators=100,
+                max_depth=10,
+                learning_rate=0.1,
+                random_state=42
+            )
         elif model_name == "ExtraTreesRegressor":
             base_model = ExtraTreesRegressor(
                 n_estimators=80,        # More trees for micronutrients
@@ -708,45 +514,8 @@ class EnhancedWindowsMLTrainer:
         else:
             base_model = Ridge(alpha=1.0, random_state=42)  # Safe fallback
         
-        return MultiOutputRegressor(base_model)
-
-    def _calculate_enhanced_max_deviation(self, y_true: np.ndarray, y_pred: np.ndarray) -> float:
-        """Calculate maximum deviation with micronutrient consideration"""
-        max_deviation = 0
-        for i in range(min(y_true.shape[0], 100)):  # Limit for Windows performance
-            for j in range(y_true.shape[1]):
-                true_val = y_true[i, j]
-                pred_val = y_pred[i, j]
-                
-                # Different tolerance for macro vs micro fertilizers
-                fertilizer_name = self.fertilizer_names[j] if j < len(self.fertilizer_names) else "unknown"
-                is_micro_fert = any(micro in fertilizer_name.lower() 
-                                  for micro in ['hierro', 'manganeso', 'zinc', 'cobre', 'borico', 'molibdato'])
-                
-                if true_val > (0.0001 if is_micro_fert else 0.001):
-                    deviation_percent = abs(pred_val - true_val) / true_val * 100
-                    max_deviation = max(max_deviation, deviation_percent)
-        
-        return max_deviation
-
-    def _calculate_micronutrient_accuracy(self, y_true: np.ndarray, y_pred: np.ndarray) -> float:
-        """Calculate specific accuracy for micronutrient fertilizers"""
-        micro_fertilizer_indices = []
-        
-        for i, fert_name in enumerate(self.fertilizer_names):
-            if any(micro in fert_name.lower() for micro in ['hierro', 'manganeso', 'zinc', 'cobre', 'borico', 'molibdato']):
-                micro_fertilizer_indices.append(i)
-        
-        if not micro_fertilizer_indices:
-            return 1.0  # No micronutrient fertilizers
-        
-        # Calculate accuracy for micronutrient fertilizers only
-        micro_true = y_true[:, micro_fertilizer_indices]
-        micro_pred = y_pred[:, micro_fertilizer_indices]
-        
-        # Use R² as micronutrient accuracy metric
-        micro_r2 = r2_score(micro_true, micro_pred, multioutput='uniform_average')
-        return max(0, micro_r2)
+        # Forests, extra-trees and Ridge fit all fertilizers at once; boosting is wrapped per output
+        return as_multi_output(base_model)
 
     def _check_enhanced_requirements(self, model_results: Dict[str, Any]) -> bool:
         """Check enhanced requirements including micronutrients"""
@@ -776,12 +545,16 @@ class EnhancedWindowsMLTrainer:
             'model': model_results['model'],
             'scaler': model_results['scaler'],
             'fertilizer_names': self.fertilizer_names,
+            'feature_names': list(ENHANCED_FEATURE_NAMES),
             'training_config': self.config,
             'model_metrics': {
                 'target_mae': model_results.get('target_mae', 0),
                 'target_r2': model_results.get('target_r2', 0),
                 'max_deviation': model_results.get('max_deviation', 0),
-                'micronutrient_accuracy': model_results.get('micronutrient_accuracy', 0)
+                'micronutrient_accuracy': model_results.get('micronutrient_accuracy', 0),
+                'micro': model_results.get('micro_metrics'),
+                'macro': model_results.get('macro_metrics'),
+                'per_fertilizer': model_results.get('per_fertilizer_metrics')
             },
             'micronutrient_features': {
                 'macro_elements': self.macro_elements,
@@ -805,19 +578,40 @@ class EnhancedWindowsMLTrainer:
         
         print(f"     [?] Enhanced model saved: {filename}")
         
-        # Update main model file
-        main_filepath = os.path.join(save_dir, "ml_optimizer_model.pkl")
-        with open(main_filepath, 'wb') as f:
-            pickle.dump(model_data, f)
-        print(f"     [?] Main enhanced model updated: ml_optimizer_model.pkl")
+        # Register and promote so the API serves it (replaces overwriting ml_optimizer_model.pkl)
+        registry = get_model_registry()
+        metrics = model_data['model_metrics']
+        version = registry.register(
+            {'primary_model': model_results['model'], 'balance_model': None, 'scaler': model_results['scaler']},
+            {
+                'source': f"auto_train:{model_name}",
+                'schema': 'enhanced',
+                'model_type': model_name,
+                'fertilizer_names': list(self.fertilizer_names),
+                'feature_names': list(ENHANCED_FEATURE_NAMES),
+                'training_metrics': {
+                    'dosage_test_r2': metrics['target_r2'],
+                    'dosage_test_mae': metrics['target_mae'],
+                    'max_deviation': metrics['max_deviation'],
+                    'micronutrient_accuracy': metrics['micronutrient_accuracy'],
+                    'micro': metrics['micro'],
+                    'macro': metrics['macro']
+                },
+                'per_fertilizer_metrics': metrics['per_fertilizer'],
+                'cation_elements': [e for e in self.all_elements if e in CATION_ELEMENTS],
+                'anion_elements': [e for e in self.all_elements if e in ANION_ELEMENTS],
+                'training_metadata': model_data['training_metadata']
+            }
+        )
+        registry.promote(version)
+        print(f"     [?] Enhanced model registered and promoted: {version}")
 
     def _create_enhanced_summary(self, iterations_completed: int, final_model_name: str) -> Dict[str, Any]:
         """Create enhanced training summary with micronutrient info"""
         training_duration = time.time() - self.training_start_time if self.training_start_time else 0
         
         # Count micronutrient fertilizers
-        micro_fertilizers = [name for name in self.fertilizer_names 
-                           if any(micro in name.lower() for micro in ['hierro', 'manganeso', 'zinc', 'cobre', 'borico', 'molibdato'])]
+        micro_fertilizers = [name for name, micro in zip(self.fertilizer_names, self.micro_fertilizer_mask) if micro]
         
         summary = {
             'training_status': 'convergence_achieved' if self.convergence_achieved else 'max_iterations_reached',
@@ -874,8 +668,7 @@ class EnhancedWindowsMLTrainer:
                 dosage = max(0.0, float(dosage_prediction[i]))
                 
                 # Apply minimum thresholds
-                is_micro_fert = any(micro in fert_name.lower() 
-                                  for micro in ['hierro', 'manganeso', 'zinc', 'cobre', 'borico', 'molibdato'])
+                is_micro_fert = is_micro_fertilizer(fert_name)
                 min_threshold = 0.0001 if is_micro_fert else 0.001
                 
                 if dosage > min_threshold:
@@ -963,11 +756,9 @@ def enhanced_production_train():
         predictions = trainer.predict_enhanced_dosages(test_targets, test_water)
         
         macro_fertilizers = len([name for name, dosage in predictions.items() 
-                               if dosage > 0.001 and not any(micro in name.lower() 
-                               for micro in ['hierro', 'manganeso', 'zinc', 'cobre', 'borico', 'molibdato'])])
+                               if dosage > 0.001 and not is_micro_fertilizer(name)])
         micro_fertilizers = len([name for name, dosage in predictions.items() 
-                               if dosage > 0.001 and any(micro in name.lower() 
-                               for micro in ['hierro', 'manganeso', 'zinc', 'cobre', 'borico', 'molibdato'])])
+                               if dosage > 0.001 and is_micro_fertilizer(name)])
         
         print(f"\n[SUCCESS] Enhanced model test successful!")
         print(f"Total predictions: {len(predictions)}")
@@ -975,7 +766,7 @@ def enhanced_production_train():
         print(f"Micro fertilizers: {micro_fertilizers}")
         print(f"Sample predictions:")
         for fert, dosage in list(predictions.items())[:10]:  # Show first 10
-            fert_type = "[?]" if any(micro in fert.lower() for micro in ['hierro', 'manganeso', 'zinc', 'cobre', 'borico', 'molibdato']) else "[FORM]"
+            fert_type = "[?]" if is_micro_fertilizer(fert) else "[FORM]"
             print(f"  {fert_type} {fert}: {dosage:.4f} g/L")
         
     except Exception as e:
@@ -987,7 +778,7 @@ if __name__ == "__main__":
     print("=== ENHANCED WINDOWS-COMPATIBLE ML TRAINER WITH MICRONUTRIENTS ===")
     print("Designed specifically for Windows environments")
     print("Enhanced with complete micronutrient support (Fe, Mn, Zn, Cu, B, Mo)")
-    print("Uses threading instead of Unix signals for timeouts")
+    print("Trains candidate models in parallel worker processes with real timeouts")
     print("Optimized for Windows performance and stability")
     print()
     
@@ -997,6 +788,31 @@ if __name__ == "__main__":
             enhanced_quick_test()
         elif sys.argv[1] == "production":
             enhanced_production_train()
+        elif sys.argv[1] == "generate-data":
+            # python auto-train.py generate-data [samples] [output_dir] [seed]
+            n_samples = int(sys.argv[2]) if len(sys.argv) > 2 else 20000
+            output_dir = sys.argv[3] if len(sys.argv) > 3 else "training_data"
+            seed = int(sys.argv[4]) if len(sys.argv) > 4 else None
+            generate_training_shards(ENHANCED_PROFILE, SequentialMicronutrientLabeler(), n_samples,
+                                     seed=seed, output_dir=output_dir)
+            print(f"Shards written to {output_dir}/ (manifest.json lists them)")
+        elif sys.argv[1] == "benchmark-models":
+            # python auto-train.py benchmark-models [samples] [seed]
+            n_samples = int(sys.argv[2]) if len(sys.argv) > 2 else 5000
+            seed = int(sys.argv[3]) if len(sys.argv) > 3 else 42
+            trainer = EnhancedWindowsMLTrainer(EnhancedTrainingConfig(data_seed=seed))
+            scenarios = trainer._generate_enhanced_training_data(n_samples)
+            fertilizer_names = sorted({name for s in scenarios for name in s['optimal_dosages']})
+            X = enhanced_features_from_scenarios(scenarios)
+            y = np.array([[s['optimal_dosages'].get(name, 0.0) for name in fertilizer_names]
+                          for s in scenarios], dtype=np.float64)
+            print(f"Benchmarking {len(BENCHMARK_MODELS)} models on {len(scenarios)} scenarios "
+                  f"x {len(fertilizer_names)} fertilizers...")
+            results = benchmark_models(X, y, random_state=seed, compare_wrapped=True)
+            os.makedirs("reports", exist_ok=True)
+            with open("reports/model_benchmark.json", "w") as f:
+                json.dump({'samples': len(scenarios), 'outputs': len(fertilizer_names), 'results': results}, f, indent=2)
+            print(f"Benchmark written to reports/model_benchmark.json")
         elif sys.argv[1] == "test":
             trainer = EnhancedWindowsMLTrainer()
             print("Testing enhanced trainer...")
@@ -1010,7 +826,7 @@ if __name__ == "__main__":
             }
             print("Enhanced trainer initialized successfully!")
         else:
-            print("Enhanced options: quick, production, test")
+            print("Enhanced options: quick, production, test, generate-data, benchmark-models")
     else:
         # Default: Enhanced production training
         try:
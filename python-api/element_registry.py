@@ -0,0 +1,152 @@
+# element_registry.py
+"""
+Element Registry Module
+Every nutrient species the calculator reports, in one fixed order, with molar mass and
+valence vectors. N, S and P are the element-basis forms (nitrate-N, sulfate-S,
+phosphate-P); NO3, SO4 and H2PO4 the ions themselves. Conversions between mg/L, mmol/L
+and meq/L take a scalar with one element, or an array whose last axis follows an element
+list (ELEMENTS by default); species outside the registry convert to 0, and so do species
+outside `species` when a call site passes the set its conversion covers. The
+verification divisors and the report's standard-atomic-weight tables derive from the
+same rows.
+"""
+
+import numpy as np
+from functools import lru_cache
+from typing import Any, Optional, Sequence, Tuple, Union
+
+# (symbol, molar mass g/mol, standard atomic weight g/mol for reports, valence as |charge|)
+_REGISTRY = (
+    ('Ca', 40.08, 40.078, 2),
+    ('K', 39.10, 39.098, 1),
+    ('Mg', 24.31, 24.305, 2),
+    ('Na', 22.99, 22.990, 1),
+    ('NH4', 18.04, 18.038, 1),
+    ('NO3', 62.00, 62.004, 1),
+    ('N', 14.01, 14.007, 1),
+    ('SO4', 96.06, 96.06, 2),
+    ('S', 32.06, 32.065, 2),
+    ('Cl', 35.45, 35.453, 1),
+    ('H2PO4', 96.99, 96.987, 1),
+    ('P', 30.97, 30.974, 1),
+    ('HCO3', 61.02, 61.017, 1),
+    ('Fe', 55.85, 55.845, 2),
+    ('Mn', 54.94, 54.938, 2),
+    ('Zn', 65.38, 65.38, 2),
+    ('Cu', 63.55, 63.546, 2),
+    ('B', 10.81, 10.811, 3),
+    ('Mo', 95.95, 95.96, 6),
+)
+
+ELEMENTS: Tuple[str, ...] = tuple(symbol for symbol, _, _, _ in _REGISTRY)
+ELEMENT_INDEX = {symbol: i for i, symbol in enumerate(ELEMENTS)}
+MOLAR_MASS = np.array([mass for _, mass, _, _ in _REGISTRY])
+VALENCE = np.array([float(valence) for _, _, _, valence in _REGISTRY])
+MEQ_PER_MG = VALENCE / MOLAR_MASS
+for _vector in (MOLAR_MASS, VALENCE, MEQ_PER_MG):
+    _vector.setflags(write=False)
+
+_MOLAR_MASS_BY_ELEMENT = {symbol: mass for symbol, mass, _, _ in _REGISTRY}
+_REPORT_MOLAR_MASS_BY_ELEMENT = {symbol: weight for symbol, _, weight, _ in _REGISTRY}
+_VALENCE_BY_ELEMENT = {symbol: valence for symbol, _, _, valence in _REGISTRY}
+
+# Ionic groups on the element basis (balances, verification, ML features)
+CATION_ELEMENTS = ('Ca', 'K', 'Mg', 'Na', 'NH4', 'Fe', 'Mn', 'Zn', 'Cu')
+ANION_ELEMENTS = ('N', 'S', 'Cl', 'P', 'HCO3', 'B', 'Mo')
+# Anions on the ion basis (LP ionic balance)
+ANION_IONS = ('NO3', 'H2PO4', 'SO4', 'Cl', 'HCO3')
+
+MACRO_ELEMENTS = ('N', 'P', 'K', 'Ca', 'Mg', 'S')
+MICRO_ELEMENTS = ('Fe', 'Mn', 'Zn', 'Cu', 'B', 'Mo')
+OTHER_ELEMENTS = ('Na', 'NH4', 'Cl', 'HCO3')
+
+# Element-basis species a fertilizer composition lists, in registry order
+COMPOSITION_ELEMENTS = tuple(e for e in ELEMENTS if e not in ('NO3', 'SO4', 'H2PO4'))
+# Species of the calculation results (mg, mmol and meq/L), in registry order
+SOLUTION_ELEMENTS = tuple(e for e in ELEMENTS if e != 'NO3')
+
+# Species each conversion covers (the rest convert to 0):
+# calculator mg -> mmol -> meq on the element basis (the ions NO3, SO4, H2PO4 are not converted)
+MMOL_SPECIES = COMPOSITION_ELEMENTS
+# direct mg -> meq of the ionic balances: cations and ion-basis anions (N, S, P, B, Mo are not converted)
+BALANCE_SPECIES = CATION_ELEMENTS + ANION_IONS
+# verification ionic balance: macro cations and element-basis anions
+VERIFICATION_SPECIES = ('Ca', 'K', 'Mg', 'Na', 'NH4', 'N', 'S', 'P', 'Cl', 'HCO3')
+# report summary meq rows: everything but the element-basis N, S and P (reported in mmol only)
+REPORT_MEQ_SPECIES = tuple(e for e in ELEMENTS if e not in ('N', 'S', 'P'))
+
+# mg/L per meq/L of the verification species, at the 2-decimal precision the verification reports
+MG_PER_MEQ = {e: round(_MOLAR_MASS_BY_ELEMENT[e] / _VALENCE_BY_ELEMENT[e], 2) for e in VERIFICATION_SPECIES}
+
+Elements = Union[str, Sequence[str]]
+
+
+def is_known(element: str) -> bool:
+    return element in ELEMENT_INDEX
+
+
+def _covered(element: str, species: Optional[Sequence[str]]) -> bool:
+    return element in ELEMENT_INDEX and (species is None or element in species)
+
+
+@lru_cache(maxsize=256)
+def _factors(elements: Tuple[str, ...], species: Optional[Tuple[str, ...]]) -> Tuple[np.ndarray, np.ndarray]:
+    """Molar mass and valence vectors for an element list (0 for unknown or uncovered species)"""
+    molar_mass = np.array([_MOLAR_MASS_BY_ELEMENT[e] if _covered(e, species) else 0.0 for e in elements])
+    valence = np.array([float(_VALENCE_BY_ELEMENT[e]) if _covered(e, species) else 0.0 for e in elements])
+    molar_mass.setflags(write=False)
+    valence.setflags(write=False)
+    return molar_mass, valence
+
+
+def _species_key(species: Optional[Sequence[str]]) -> Optional[Tuple[str, ...]]:
+    return None if species is None else tuple(species)
+
+
+def mg_to_mmol(mg_l: Any, elements: Elements = ELEMENTS, species: Optional[Sequence[str]] = None) -> Any:
+    if isinstance(elements, str):
+        return mg_l / _MOLAR_MASS_BY_ELEMENT[elements] if _covered(elements, species) else 0.0
+    molar_mass = _factors(tuple(elements), _species_key(species))[0]
+    mg_l = np.asarray(mg_l, dtype=float)
+    mmol_l = np.zeros(np.broadcast_shapes(mg_l.shape, molar_mass.shape))
+    return np.divide(mg_l, molar_mass, out=mmol_l, where=molar_mass > 0)
+
+
+def mmol_to_meq(mmol_l: Any, elements: Elements = ELEMENTS, species: Optional[Sequence[str]] = None) -> Any:
+    if isinstance(elements, str):
+        return mmol_l * _VALENCE_BY_ELEMENT[elements] if _covered(elements, species) else 0.0
+    return np.asarray(mmol_l, dtype=float) * _factors(tuple(elements), _species_key(species))[1]
+
+
+def mg_to_meq(mg_l: Any, elements: Elements = ELEMENTS, species: Optional[Sequence[str]] = None) -> Any:
+    return mmol_to_meq(mg_to_mmol(mg_l, elements, species), elements, species)
+
+
+def meq_factors(elements: Sequence[str], group: Optional[Sequence[str]] = None,
+                species: Optional[Sequence[str]] = None) -> np.ndarray:
+    """meq/L per mg/L of each element (0 outside group, when given, and outside species)"""
+    factors = mg_to_meq(np.ones(len(elements)), elements, species)
+    if group is not None:
+        factors = np.where([e in group for e in elements], factors, 0.0)
+    return factors
+
+
+@lru_cache(maxsize=64)
+def mg_per_meq(elements: Tuple[str, ...]) -> np.ndarray:
+    """MG_PER_MEQ vector for an element list (NaN outside VERIFICATION_SPECIES)"""
+    divisors = np.array([MG_PER_MEQ.get(e, np.nan) for e in elements], dtype=float)
+    divisors.setflags(write=False)
+    return divisors
+
+
+@lru_cache(maxsize=32)
+def report_factors(elements: Tuple[str, ...]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Standard atomic weight (1.0 when unknown) and meq valence (0 outside REPORT_MEQ_SPECIES)
+    vectors for the report tables
+    """
+    molar_mass = np.array([_REPORT_MOLAR_MASS_BY_ELEMENT.get(e, 1.0) for e in elements])
+    valence = np.array([float(_VALENCE_BY_ELEMENT[e]) if e in REPORT_MEQ_SPECIES else 0.0 for e in elements])
+    molar_mass.setflags(write=False)
+    valence.setflags(write=False)
+    return molar_mass, valence
@@ -0,0 +1,317 @@
+# feedback_trainer.py
+"""
+Feedback Trainer Module
+Background retraining of the ML model on logged production LP solutions. A candidate
+is registered (and promoted) only when it beats the active model on a held-out set
+that stays fixed across runs, so each record is either always trained on or never.
+The comparison uses only the fertilizer columns both models predict. Cycles run as
+training jobs in a separate process; the job manager promotes and installs a better
+candidate only once the job has completed. The timestamp of the newest record trained on
+is persisted next to the log, so a restart does not retrain on data already seen.
+"""
+
+import json
+import os
+import tempfile
+import threading
+import time
+import zlib
+from collections import Counter
+from datetime import datetime
+from typing import Dict, List, Optional, Any
+
+import numpy as np
+
+from ml_features import nutrient_array
+from models import MLModelConfig
+from solution_log import SolutionLog
+from training_jobs import TrainingJobManager, TrainingJobConflict
+
+
+STATE_FILE = "feedback_state.json"
+
+
+def _env_flag(name: str, default: bool) -> bool:
+    return os.getenv(name, str(default)).lower() not in ("0", "false", "no")
+
+
+class FeedbackTrainer:
+    """Scheduled retrain-and-compare loop over a SolutionLog"""
+
+    def __init__(self,
+                 solution_log: SolutionLog,
+                 model_type: str = "ExtraTrees",
+                 interval_seconds: float = 3600,
+                 min_samples: int = 500,
+                 min_new_samples: int = 200,
+                 holdout_fraction: float = 0.2,
+                 max_fertilizers: int = 40,
+                 job_manager: Optional[TrainingJobManager] = None):
+        self.solution_log = solution_log
+        self.model_type = model_type
+        self.interval_seconds = interval_seconds
+        self.min_samples = min_samples
+        self.min_new_samples = min_new_samples
+        self.holdout_fraction = holdout_fraction
+        self.max_fertilizers = max_fertilizers
+        self.job_manager = job_manager
+
+        self.last_run: Dict[str, Any] = {'status': 'never_run'}
+        self._trained_through = self._load_state().get('trained_through')
+        self._run_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # ------------------------------------------------------------------
+    # STATE
+    # ------------------------------------------------------------------
+
+    def _state_path(self) -> str:
+        return os.path.join(self.solution_log.directory, STATE_FILE)
+
+    def _load_state(self) -> Dict[str, Any]:
+        try:
+            with open(self._state_path()) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_state(self, result: Dict[str, Any]):
+        """Persist the trained-on watermark (temp file + rename, so a crash never leaves half a file)"""
+        state = {'trained_through': self._trained_through, 'total_samples': result.get('total_samples'),
+                 'updated_at': datetime.now().isoformat()}
+        try:
+            fd, tmp_path = tempfile.mkstemp(prefix=".feedback_", suffix=".json", dir=self.solution_log.directory)
+            with os.fdopen(fd, "w") as f:
+                json.dump(state, f, indent=2)
+            os.replace(tmp_path, self._state_path())
+        except OSError as e:
+            print(f"[FEEDBACK] Could not save trainer state: {e}")
+
+    # ------------------------------------------------------------------
+    # DATASET
+    # ------------------------------------------------------------------
+
+    def _is_holdout(self, record_id: str) -> bool:
+        return zlib.crc32(record_id.encode()) % 1000 < self.holdout_fraction * 1000
+
+    def load_dataset(self, since: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Optimal logged solutions as training scenarios, split into train / holdout, with the
+        newest record timestamp and how many records are newer than since
+        """
+        train, holdout = [], []
+        newest, new = None, 0
+        for record in self.solution_log.iter_records():
+            if record.get('status') != 'Optimal' or not record.get('dosages'):
+                continue
+            timestamp = record.get('timestamp', '')
+            if newest is None or timestamp > newest:
+                newest = timestamp
+            if since is None or timestamp > since:
+                new += 1
+            scenario = {
+                'targets': record['targets'],
+                'water': record['water'],
+                'optimal_dosages': record['dosages'],
+                'balance_quality': max(0.0, 1.0 - record.get('ionic_balance_error', 0.0) / 100.0)
+            }
+            (holdout if self._is_holdout(record['record_id']) else train).append(scenario)
+        return {'train': train, 'holdout': holdout, 'newest': newest, 'new': new}
+
+    def _output_fertilizers(self, scenarios: List[Dict[str, Any]]) -> List[str]:
+        """Most frequently dosed fertilizers become the model's output columns"""
+        usage = Counter(name for s in scenarios for name in s['optimal_dosages'])
+        return sorted(name for name, _ in usage.most_common(self.max_fertilizers))
+
+    @staticmethod
+    def holdout_mae(ml_optimizer, holdout: List[Dict[str, Any]], fertilizer_names: List[str]) -> float:
+        """Mean absolute dosage error (g/L) over the holdout set and the given fertilizer columns"""
+        predicted = ml_optimizer.predict_dosage_matrix(
+            nutrient_array([s['targets'] for s in holdout]),
+            nutrient_array([s['water'] for s in holdout]),
+            fertilizer_names
+        )
+        actual = np.array([[s['optimal_dosages'].get(name, 0.0) for name in fertilizer_names] for s in holdout])
+        return float(np.mean(np.abs(predicted - actual)))
+
+    # ------------------------------------------------------------------
+    # TRAINING
+    # ------------------------------------------------------------------
+
+    def run_once(self, force: bool = False) -> Dict[str, Any]:
+        """One retrain-and-compare cycle; skipped if another cycle is running or data is insufficient"""
+        if not self._run_lock.acquire(blocking=False):
+            return {'status': 'already_running'}
+        try:
+            result = (self._run_job(force) if self.job_manager is not None
+                      else self.train_cycle(force, self._trained_through))
+            if result.get('trained_through'):
+                self._trained_through = result['trained_through']
+                self._save_state(result)
+        except Exception as e:
+            print(f"[FEEDBACK] Training cycle failed: {e}")
+            result = {'status': 'failed', 'error': str(e)}
+        finally:
+            self._run_lock.release()
+        result['finished_at'] = datetime.now().isoformat()
+        self.last_run = result
+        return result
+
+    def job_params(self, force: bool) -> Dict[str, Any]:
+        """Everything a training process needs to rebuild this trainer and run one cycle"""
+        return {
+            'log_directory': os.path.abspath(self.solution_log.directory),
+            'settings': {'model_type': self.model_type, 'min_samples': self.min_samples,
+                         'min_new_samples': self.min_new_samples, 'holdout_fraction': self.holdout_fraction,
+                         'max_fertilizers': self.max_fertilizers},
+            'force': force,
+            'trained_through': self._trained_through
+        }
+
+    def _run_job(self, force: bool) -> Dict[str, Any]:
+        """Run the cycle as a training job (separate process) and wait for it"""
+        self.solution_log.flush()
+        try:
+            job = self.job_manager.submit_feedback(self.job_params(force))
+        except TrainingJobConflict as e:
+            return {'status': 'skipped', 'reason': f"training job {e} is running"}
+        job = self.job_manager.wait(job['job_id'])
+        if job['status'] != 'completed':
+            return {'status': job['status'], 'error': job['error'], 'job_id': job['job_id']}
+        # The job manager promoted (or failed to install) a pending candidate after the job completed
+        registration = job['result'].get('registration') or {}
+        result = dict(job['result']['feedback'], job_id=job['job_id'], registration=registration)
+        if result['status'] == 'promoted' and not registration.get('promoted'):
+            result.update(status='install_failed', error=job['result'].get('install_error'))
+        return result
+
+    def train_cycle(self, force: bool, trained_through: Optional[str],
+                    defer_promotion: bool = False) -> Dict[str, Any]:
+        """
+        Train a candidate on the logged solutions and register it; it is promoted only if it
+        beats the active model on the holdout over the fertilizer columns both models predict.
+        New samples are those logged after trained_through (the newest record of the last cycle).
+        With defer_promotion a better candidate is registered 'promotion_pending' instead
+        (a training job: the job manager promotes it once the job has completed).
+        """
+        from ml_optimizer import ProfessionalMLFertilizerOptimizer
+        from model_registry import get_model_registry
+
+        start = time.perf_counter()
+        self.solution_log.flush()
+        dataset = self.load_dataset(since=trained_through)
+        train, holdout = dataset['train'], dataset['holdout']
+        total = len(train) + len(holdout)
+
+        if total < self.min_samples or not holdout:
+            return {'status': 'skipped', 'reason': f"{total} samples (< {self.min_samples}) or empty holdout"}
+        if not force and dataset['new'] < self.min_new_samples:
+            return {'status': 'skipped', 'reason': f"{dataset['new']} new samples (< {self.min_new_samples})"}
+
+        print(f"[FEEDBACK] Training {self.model_type} on {len(train)} logged solutions "
+              f"({len(holdout)} held out)")
+        fertilizer_names = self._output_fertilizers(train)
+        candidate = ProfessionalMLFertilizerOptimizer(MLModelConfig(model_type=self.model_type), auto_load=False)
+        candidate.train_advanced_model(fertilizer_names, train, register=False)
+        candidate_mae = self.holdout_mae(candidate, holdout, fertilizer_names)
+
+        registry = get_model_registry()
+        current_mae = None
+        shared: List[str] = []
+        current_version = registry.active_version()
+        if current_version:
+            current = ProfessionalMLFertilizerOptimizer(auto_load=False)
+            current.load_from_registry(registry, current_version)
+            # A column the current model does not predict would count as a 0 g/L prediction
+            known = set(current.fertilizer_names)
+            shared = [name for name in fertilizer_names if name in known]
+            if shared:
+                current_mae = self.holdout_mae(current, holdout, shared)
+        compared_mae = self.holdout_mae(candidate, holdout, shared) if shared else None
+
+        result = {
+            'train_samples': len(train),
+            'holdout_samples': len(holdout),
+            'total_samples': total,
+            'new_samples': dataset['new'],
+            'trained_through': dataset['newest'],
+            'fertilizers': len(fertilizer_names),
+            'candidate_holdout_mae': candidate_mae,
+            'current_version': current_version,
+            'compared_fertilizers': len(shared),
+            'candidate_compared_mae': compared_mae,
+            'current_holdout_mae': current_mae,
+            'seconds': round(time.perf_counter() - start, 2)
+        }
+        candidate.training_metrics['feedback_holdout_mae'] = candidate_mae
+
+        if current_version and not shared:
+            # Nothing to compare on: keep the candidate for a manual promote, do not replace serving
+            registration = candidate.register_in_registry(registry, source="feedback", promote=False)
+            print(f"[FEEDBACK] Candidate {registration['version']} registered, not promoted: "
+                  f"no fertilizer columns in common with {current_version}")
+            return dict(result, status='not_comparable', version=registration['version'],
+                        registration=registration)
+        if current_mae is not None and compared_mae >= current_mae:
+            print(f"[FEEDBACK] Candidate not better (holdout MAE {compared_mae:.4f} "
+                  f"vs {current_mae:.4f} over {len(shared)} shared fertilizers)")
+            return dict(result, status='not_better')
+
+        registration = candidate.register_in_registry(registry, source="feedback", promote=not defer_promotion)
+        registration['promotion_pending'] = defer_promotion
+        print(f"[FEEDBACK] {'Promoting' if defer_promotion else 'Promoted'} {registration['version']} "
+              f"(holdout MAE {compared_mae if shared else candidate_mae:.4f} vs {current_mae})")
+        return dict(result, status='promoted', version=registration['version'], registration=registration)
+
+    # ------------------------------------------------------------------
+    # SCHEDULE
+    # ------------------------------------------------------------------
+
+    def start(self) -> threading.Thread:
+        def loop():
+            while not self._stop.wait(self.interval_seconds):
+                self.run_once()
+
+        self._stop.clear()
+        self._thread = threading.Thread(target=loop, name="feedback-trainer", daemon=True)
+        self._thread.start()
+        print(f"[FEEDBACK] Background trainer started (every {self.interval_seconds:.0f}s)")
+        return self._thread
+
+    def stop(self):
+        self._stop.set()
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            'scheduled': self._thread is not None and self._thread.is_alive(),
+            'running': self._run_lock.locked(),
+            'model_type': self.model_type,
+            'interval_seconds': self.interval_seconds,
+            'min_samples': self.min_samples,
+            'min_new_samples': self.min_new_samples,
+            'holdout_fraction': self.holdout_fraction,
+            'trained_through': self._trained_through,
+            'last_run': self.last_run
+        }
+
+
+def create_feedback_trainer_from_env(solution_log: Optional[SolutionLog],
+                                     job_manager: Optional[TrainingJobManager] = None) -> Optional[FeedbackTrainer]:
+    """Build the trainer from FEEDBACK_* environment variables (None without a solution log)"""
+    if solution_log is None:
+        return None
+    return FeedbackTrainer(
+        solution_log,
+        model_type=os.getenv("FEEDBACK_MODEL_TYPE", "ExtraTrees"),
+        interval_seconds=float(os.getenv("FEEDBACK_INTERVAL_SECONDS", 3600)),
+        min_samples=int(os.getenv("FEEDBACK_MIN_SAMPLES", 500)),
+        min_new_samples=int(os.getenv("FEEDBACK_MIN_NEW_SAMPLES", 200)),
+        holdout_fraction=float(os.getenv("FEEDBACK_HOLDOUT_FRACTION", 0.2)),
+        max_fertilizers=int(os.getenv("FEEDBACK_MAX_FERTILIZERS", 40)),
+        job_manager=job_manager
+    )
+
+
+def feedback_schedule_enabled() -> bool:
+    return _env_flag("FEEDBACK_TRAINING_ENABLED", False)
@@ -0,0 +1,110 @@
+# fertilizer_mapping_cache.py
+"""
+Fertilizer Mapping Cache Module
+Swagger fertilizers already mapped to records, keyed by (catalog id, product id, product
+version, chemistry, composition database version). The product version is the backend's
+dateUpdated, or a content hash when the product has none, so an unchanged product is never
+parsed again. Every catalog fetch revalidates the catalog: entries of products that
+changed version or left the catalog are dropped.
+"""
+
+import hashlib
+import json
+import os
+import threading
+from typing import Callable, Dict, List, Optional, Any, Hashable, Set, Tuple
+
+from fertilizer_records import FertilizerRecord
+from lru_table import LRUTable
+
+
+def product_version(swagger_fert: Dict[str, Any]) -> str:
+    """dateUpdated of the product, or a hash of its content when the backend sends none"""
+    date_updated = swagger_fert.get('dateUpdated')
+    if date_updated:
+        return f"updated:{date_updated}"
+    canonical = json.dumps(swagger_fert, sort_keys=True, separators=(',', ':'), default=str)
+    return "sha256:" + hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+def product_key(swagger_fert: Dict[str, Any]) -> Tuple[Hashable, Hashable, str]:
+    return (swagger_fert.get('catalogId'), swagger_fert.get('id', swagger_fert.get('name', 'Unknown')),
+            product_version(swagger_fert))
+
+
+def chemistry_key(chemistry: Optional[Dict[str, Any]]) -> Optional[str]:
+    if chemistry is None:
+        return None
+    return json.dumps(chemistry, sort_keys=True, separators=(',', ':'), default=str)
+
+
+class MappedFertilizerCache:
+    """Mapped records, least recently used evicted, revalidated per catalog"""
+
+    def __init__(self, max_entries: int = 5000):
+        self.max_entries = max_entries
+        self.invalidated = 0
+        self._records = LRUTable(max_entries)
+        self._catalog_products: Dict[Hashable, Set[Tuple]] = {}
+        self._lock = threading.Lock()
+
+    def get_or_map(self, swagger_fert: Dict[str, Any], chemistry: Optional[Dict[str, Any]],
+                   database_version: Hashable,
+                   mapper: Callable[[], FertilizerRecord]) -> FertilizerRecord:
+        """Cached record for this product version; mapper() runs (outside the lock) only on a miss"""
+        key = product_key(swagger_fert) + (chemistry_key(chemistry), database_version)
+        return self._records.get_or_build(key, mapper)
+
+    def revalidate(self, catalog_id: Hashable, fertilizers: List[Dict[str, Any]]) -> int:
+        """
+        Catalog revalidation signal: the catalog now lists these fertilizers. Entries of
+        products it listed before in another version (or no longer lists) are dropped.
+        Returns the number of entries removed.
+        """
+        current = {product_key(fert) for fert in fertilizers}
+        with self._lock:
+            previous = self._catalog_products.get(catalog_id, set())
+            self._catalog_products[catalog_id] = current
+            stale = previous - current
+            if not stale:
+                return 0
+            removed = self._records.drop(lambda key: key[:3] in stale)
+            self.invalidated += removed
+
+        print(f"[MAPPING] Catalog {catalog_id} revalidated: {len(stale)} products changed, "
+              f"{removed} mapped entries dropped")
+        return removed
+
+    def invalidate(self, catalog_id: Optional[Hashable] = None) -> int:
+        """Drop one catalog's mapped fertilizers (all of them when catalog_id is None)"""
+        with self._lock:
+            if catalog_id is None:
+                removed = self._records.clear()
+                self._catalog_products.clear()
+            else:
+                products = self._catalog_products.pop(catalog_id, set())
+                removed = self._records.drop(lambda key: key[:3] in products or key[0] == catalog_id)
+            self.invalidated += removed
+        print(f"[MAPPING] Invalidated {removed} mapped fertilizers"
+              f"{'' if catalog_id is None else f' of catalog {catalog_id}'}")
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            catalogs = len(self._catalog_products)
+        return dict(self._records.stats(), catalogs=catalogs, invalidated=self.invalidated)
+
+
+_cache: Optional[MappedFertilizerCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_mapped_fertilizer_cache() -> MappedFertilizerCache:
+    """Process-wide mapping cache (size from FERTILIZER_MAPPING_CACHE_MAX_ENTRIES)"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = MappedFertilizerCache(
+                    max_entries=int(os.getenv("FERTILIZER_MAPPING_CACHE_MAX_ENTRIES", 5000)))
+    return _cache
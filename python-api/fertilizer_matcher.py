@@ -0,0 +1,281 @@
+# fertilizer_matcher.py
+"""
+Fertilizer Matcher Module
+Compiled name / formula matcher for the fertilizer composition database. Patterns are
+normalized once (accents stripped, lowercased) into Aho-Corasick automata, so one pass
+over a product name finds every pattern it contains; the reverse test (name contained in
+a pattern) is a single find over the concatenated patterns. Results are memoized.
+Match order is the database's: name patterns, then formula patterns, then fuzzy keywords,
+each in entry / pattern order.
+"""
+
+import bisect
+import time
+import unicodedata
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Any, Iterable, Tuple
+
+NO_MATCH = 1 << 62
+SEPARATOR = "\x00"
+
+
+def normalize_name(text: str) -> str:
+    """Accent-stripped, lowercased, whitespace-collapsed product name"""
+    text = text or ""
+    if not text.isascii():
+        decomposed = unicodedata.normalize("NFKD", text)
+        text = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return " ".join(text.replace(SEPARATOR, "").lower().split())
+
+
+def normalize_formula(text: str) -> str:
+    return (text or "").upper().strip().replace(SEPARATOR, "")
+
+
+# ------------------------------------------------------------------
+# PATTERN AUTOMATON
+# ------------------------------------------------------------------
+
+class PatternAutomaton:
+    """
+    Aho-Corasick automaton over ranked patterns. first_contained(text) is the lowest rank of
+    a pattern occurring in text; first_containing(text) the lowest rank of a pattern that
+    contains text. Both return NO_MATCH when there is none.
+    """
+
+    def __init__(self, patterns: Iterable[Tuple[str, int]]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._best: List[int] = [NO_MATCH]
+        ordered: List[Tuple[str, int]] = []
+
+        for pattern, rank in patterns:
+            ordered.append((pattern, rank))
+            if not pattern:
+                continue
+            node = 0
+            for char in pattern:
+                nxt = self._goto[node].get(char)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[node][char] = nxt
+                    self._goto.append({})
+                    self._best.append(NO_MATCH)
+                node = nxt
+            self._best[node] = min(self._best[node], rank)
+
+        # Failure links, breadth first, folded into full transition tables so a scan is one
+        # dict lookup per character; a node's best rank includes everything its suffixes match
+        fail = [0] * len(self._goto)
+        self._delta: List[Dict[str, int]] = [dict(self._goto[0])] + [None] * (len(self._goto) - 1)
+        frontier = list(self._goto[0].values())
+        for node in frontier:
+            self._delta[node] = dict(self._delta[0], **self._goto[node])
+        while frontier:
+            next_frontier = []
+            for node in frontier:
+                for char, child in self._goto[node].items():
+                    fail[child] = self._delta[fail[node]].get(char, 0)
+                    self._best[child] = min(self._best[child], self._best[fail[child]])
+                    next_frontier.append(child)
+            for child in next_frontier:
+                self._delta[child] = dict(self._delta[fail[child]], **self._goto[child])
+            frontier = next_frontier
+
+        # Patterns concatenated in rank order: the first occurrence of a text is in the lowest-ranked pattern
+        ordered.sort(key=lambda item: item[1])
+        self._text = SEPARATOR.join(pattern for pattern, _ in ordered)
+        self._starts: List[int] = []
+        self._ranks: List[int] = []
+        offset = 0
+        for pattern, rank in ordered:
+            self._starts.append(offset)
+            self._ranks.append(rank)
+            offset += len(pattern) + 1
+
+    def first_contained(self, text: str) -> int:
+        delta, best = self._delta, self._best
+        node, found = 0, NO_MATCH
+        for char in text:
+            node = delta[node].get(char, 0)
+            if best[node] < found:
+                found = best[node]
+        return found
+
+    def first_containing(self, text: str) -> int:
+        if not self._ranks:
+            return NO_MATCH
+        position = self._text.find(text)
+        if position < 0:
+            return NO_MATCH
+        return self._ranks[bisect.bisect_right(self._starts, position) - 1]
+
+    def first_match(self, text: str, bidirectional: bool = True) -> int:
+        found = self.first_contained(text)
+        if bidirectional:
+            found = min(found, self.first_containing(text))
+        return found
+
+
+# ------------------------------------------------------------------
+# COMPILED MATCHER
+# ------------------------------------------------------------------
+
+class CompiledFertilizerMatcher:
+    """
+    Built once from fertilizer_data ({key: {'patterns', 'formula_patterns', ...}}) and the
+    fuzzy keyword table ({keyword: key}). match(name, formula) returns
+    (key, matched pattern, strategy) or None; on_resolve sees each pair once, on a cache miss.
+    """
+
+    def __init__(self,
+                 fertilizer_data: Dict[str, Dict[str, Any]],
+                 fuzzy_keywords: Dict[str, str],
+                 cache_size: int = 4096,
+                 on_resolve: Optional[Callable[[str, str, Optional[Tuple[str, str, str]]], Any]] = None):
+        self.on_resolve = on_resolve
+        self._name_hits: List[Tuple[str, str]] = []
+        self._formula_hits: List[Tuple[str, str]] = []
+        self._keyword_hits: List[Tuple[str, str]] = []
+
+        name_patterns, formula_patterns, keyword_patterns = [], [], []
+        for fert_key, fert_data in fertilizer_data.items():
+            for pattern in fert_data.get('patterns', []):
+                name_patterns.append((normalize_name(pattern), len(self._name_hits)))
+                self._name_hits.append((fert_key, pattern))
+            for pattern in fert_data.get('formula_patterns', []):
+                # Formula patterns are compared as written against the uppercased formula
+                formula_patterns.append((pattern, len(self._formula_hits)))
+                self._formula_hits.append((fert_key, pattern))
+        for keyword, fert_key in fuzzy_keywords.items():
+            if fert_key in fertilizer_data:
+                keyword_patterns.append((normalize_name(keyword), len(self._keyword_hits)))
+                self._keyword_hits.append((fert_key, keyword))
+
+        self._names = PatternAutomaton(name_patterns)
+        self._formulas = PatternAutomaton(formula_patterns)
+        self._keywords = PatternAutomaton(keyword_patterns)
+        self.match = lru_cache(maxsize=cache_size)(self._resolve)
+
+    def _resolve(self, name: str, formula: str = "") -> Optional[Tuple[str, str, str]]:
+        match = self._match(name, formula)
+        if self.on_resolve is not None:
+            self.on_resolve(name, formula, match)
+        return match
+
+    def _match(self, name: str, formula: str = "") -> Optional[Tuple[str, str, str]]:
+        normalized = normalize_name(name)
+        rank = self._names.first_match(normalized)
+        if rank != NO_MATCH:
+            return self._name_hits[rank] + ('name pattern',)
+
+        formula_upper = normalize_formula(formula)
+        if formula_upper:
+            rank = self._formulas.first_match(formula_upper)
+            if rank != NO_MATCH:
+                return self._formula_hits[rank] + ('formula pattern',)
+
+        rank = self._keywords.first_match(normalized, bidirectional=False)
+        if rank != NO_MATCH:
+            return self._keyword_hits[rank] + ('enhanced fuzzy matching',)
+        return None
+
+    def cache_info(self) -> Dict[str, int]:
+        info = self.match.cache_info()
+        return {'hits': info.hits, 'misses': info.misses, 'size': info.currsize, 'max_size': info.maxsize}
+
+
+def linear_scan_match(fertilizer_data: Dict[str, Dict[str, Any]],
+                      fuzzy_keywords: Dict[str, str],
+                      name: str, formula: str = "") -> Optional[Tuple[str, str, str]]:
+    """Reference matcher: the pattern-by-pattern scan the compiled matcher replaces
+    (expects name patterns and keywords already normalized)"""
+    normalized = normalize_name(name)
+    for fert_key, fert_data in fertilizer_data.items():
+        for pattern in fert_data.get('patterns', []):
+            if pattern in normalized or normalized in pattern:
+                return fert_key, pattern, 'name pattern'
+
+    formula_upper = normalize_formula(formula)
+    if formula_upper:
+        for fert_key, fert_data in fertilizer_data.items():
+            for pattern in fert_data.get('formula_patterns', []):
+                if pattern in formula_upper or formula_upper in pattern:
+                    return fert_key, pattern, 'formula pattern'
+
+    for keyword, fert_key in fuzzy_keywords.items():
+        if keyword in normalized and fert_key in fertilizer_data:
+            return fert_key, keyword, 'enhanced fuzzy matching'
+    return None
+
+
+# ------------------------------------------------------------------
+# BENCHMARK
+# ------------------------------------------------------------------
+
+def synthetic_catalog(fertilizer_data: Dict[str, Dict[str, Any]], size: int = 500) -> List[Tuple[str, str]]:
+    """(name, formula) products resembling a supplier catalog: known names with brand
+    prefixes, grades and accents, formula-only products and unknown items"""
+    brands = ['', 'Yara ', 'Haifa ', 'SQM ', 'Agro ', 'Técnico ']
+    suffixes = ['', ' 25 kg', ' grado técnico', ' soluble', ' Premium', ' (saco)']
+    entries = list(fertilizer_data.values())
+    catalog = []
+    for i in range(size):
+        entry = entries[i % len(entries)]
+        kind = i % 5
+        if kind == 3 and entry.get('formula_patterns'):
+            catalog.append((f"Producto {i}", entry['formula_patterns'][0]))
+        elif kind == 4:
+            catalog.append((f"Insumo desconocido {i}", ""))
+        else:
+            pattern = entry['patterns'][i % len(entry['patterns'])]
+            catalog.append((f"{brands[i % len(brands)]}{pattern.title()}{suffixes[i % len(suffixes)]}", ""))
+    return catalog
+
+
+def benchmark_matcher(fertilizer_data: Dict[str, Dict[str, Any]],
+                      fuzzy_keywords: Dict[str, str],
+                      catalog_size: int = 500,
+                      repeats: int = 3) -> Dict[str, Any]:
+    """Linear scan vs compiled matcher (cold and memoized) over a synthetic catalog"""
+    catalog = synthetic_catalog(fertilizer_data, catalog_size)
+    normalized_data = {key: dict(data, patterns=[normalize_name(p) for p in data.get('patterns', [])])
+                       for key, data in fertilizer_data.items()}
+    normalized_keywords = {normalize_name(k): v for k, v in fuzzy_keywords.items()}
+
+    start = time.perf_counter()
+    matcher = CompiledFertilizerMatcher(fertilizer_data, fuzzy_keywords)
+    build_seconds = time.perf_counter() - start
+
+    def timed(fn) -> Tuple[float, List]:
+        best, results = float('inf'), []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            results = [fn(name, formula) for name, formula in catalog]
+            best = min(best, time.perf_counter() - start)
+        return best, results
+
+    linear_seconds, expected = timed(lambda n, f: linear_scan_match(normalized_data, normalized_keywords, n, f))
+    compiled_seconds, actual = timed(matcher._match)
+    cached_seconds, _ = timed(matcher.match)
+
+    return {
+        'catalog_size': len(catalog),
+        'patterns': len(matcher._name_hits) + len(matcher._formula_hits) + len(matcher._keyword_hits),
+        'matched': sum(1 for r in actual if r is not None),
+        'mismatches': sum(1 for a, b in zip(actual, expected)
+                          if (a and (a[0], a[2])) != (b and (b[0], b[2]))),
+        'build_ms': round(build_seconds * 1000, 3),
+        'linear_scan_ms': round(linear_seconds * 1000, 3),
+        'compiled_ms': round(compiled_seconds * 1000, 3),
+        'memoized_ms': round(cached_seconds * 1000, 3),
+        'speedup_compiled': round(linear_seconds / compiled_seconds, 1) if compiled_seconds else None,
+        'speedup_memoized': round(linear_seconds / cached_seconds, 1) if cached_seconds else None
+    }
+
+
+if __name__ == "__main__":
+    from fertilizer_database import get_fertilizer_index
+
+    index = get_fertilizer_index()
+    for key, value in benchmark_matcher(index.fertilizer_data, index.fuzzy_keywords).items():
+        print(f"{key:>18}: {value}")
@@ -0,0 +1,146 @@
+# fertilizer_records.py
+"""
+Fertilizer Records Module
+Lightweight immutable fertilizers for the compute path. FertilizerRecord has the same
+attributes as the pydantic Fertilizer (name, percentage, ..., chemistry.formula,
+composition.cations / anions) so the optimizers use either, but it is a frozen slotted
+dataclass built without validation. Records are interned by (catalog id, product id,
+version): the same product in the same version is one shared object across requests.
+Pydantic models are only built at the API boundary (to_model / from_attributes).
+"""
+
+import os
+import threading
+from dataclasses import dataclass, replace
+from types import MappingProxyType
+from typing import Callable, Dict, Optional, Any, Hashable, Mapping, Tuple
+
+from lru_table import LRUTable
+
+
+@dataclass(frozen=True, slots=True)
+class CompositionRecord:
+    cations: Mapping[str, float]
+    anions: Mapping[str, float]
+
+    @classmethod
+    def of(cls, cations: Mapping[str, float], anions: Mapping[str, float]) -> "CompositionRecord":
+        return cls(MappingProxyType({k: float(v) for k, v in cations.items()}),
+                   MappingProxyType({k: float(v) for k, v in anions.items()}))
+
+    def __reduce__(self):
+        # mappingproxy does not pickle; rebuild from plain dicts
+        return CompositionRecord.of, (dict(self.cations), dict(self.anions))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'cations': dict(self.cations), 'anions': dict(self.anions)}
+
+
+@dataclass(frozen=True, slots=True)
+class ChemistryRecord:
+    formula: str
+    purity: float
+    solubility: float
+    is_ph_adjuster: bool
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'formula': self.formula, 'purity': self.purity,
+                'solubility': self.solubility, 'is_ph_adjuster': self.is_ph_adjuster}
+
+
+@dataclass(frozen=True, slots=True)
+class FertilizerRecord:
+    name: str
+    percentage: float
+    molecular_weight: float
+    salt_weight: float
+    density: Optional[float]
+    chemistry: ChemistryRecord
+    composition: CompositionRecord
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Same shape as Fertilizer.dict()"""
+        return {
+            'name': self.name,
+            'percentage': self.percentage,
+            'molecular_weight': self.molecular_weight,
+            'salt_weight': self.salt_weight,
+            'density': self.density,
+            'chemistry': self.chemistry.to_dict(),
+            'composition': self.composition.to_dict()
+        }
+
+    def to_model(self):
+        """Pydantic Fertilizer, for API responses and request models"""
+        from models import Fertilizer
+        return Fertilizer(**self.to_dict())
+
+    def renamed(self, name: str) -> "FertilizerRecord":
+        return replace(self, name=name)
+
+
+def make_fertilizer_record(name: str,
+                           percentage: float,
+                           molecular_weight: float,
+                           formula: str,
+                           cations: Mapping[str, float],
+                           anions: Mapping[str, float],
+                           purity: Optional[float] = None,
+                           density: Optional[float] = 1.0,
+                           solubility: float = 100.0,
+                           is_ph_adjuster: bool = False,
+                           salt_weight: Optional[float] = None) -> FertilizerRecord:
+    return FertilizerRecord(
+        name=name,
+        percentage=float(percentage),
+        molecular_weight=float(molecular_weight),
+        salt_weight=float(molecular_weight if salt_weight is None else salt_weight),
+        density=None if density is None else float(density),
+        chemistry=ChemistryRecord(formula=formula,
+                                  purity=float(percentage if purity is None else purity),
+                                  solubility=float(solubility),
+                                  is_ph_adjuster=bool(is_ph_adjuster)),
+        composition=CompositionRecord.of(cations, anions)
+    )
+
+
+# ------------------------------------------------------------------
+# INTERNING
+# ------------------------------------------------------------------
+
+class FertilizerInternTable:
+    """(catalog id, product id, version) -> shared FertilizerRecord, least recently used evicted"""
+
+    def __init__(self, max_entries: int = 20000):
+        self.max_entries = max_entries
+        self._records = LRUTable(max_entries)
+
+    def get_or_create(self, key: Tuple[Hashable, ...],
+                      build: Callable[[], Optional[FertilizerRecord]]) -> Optional[FertilizerRecord]:
+        """Interned record for key; build() runs (outside the lock) only when the key is new"""
+        return self._records.get_or_build(key, build)
+
+    def stats(self) -> Dict[str, Any]:
+        stats = self._records.stats()
+        return {'records': stats['entries'], 'max_entries': self.max_entries,
+                'hits': stats['hits'], 'misses': stats['misses']}
+
+
+_intern_table: Optional[FertilizerInternTable] = None
+_intern_lock = threading.Lock()
+
+
+def get_intern_table() -> FertilizerInternTable:
+    """Process-wide intern table (size from FERTILIZER_INTERN_MAX_ENTRIES)"""
+    global _intern_table
+    if _intern_table is None:
+        with _intern_lock:
+            if _intern_table is None:
+                _intern_table = FertilizerInternTable(
+                    max_entries=int(os.getenv("FERTILIZER_INTERN_MAX_ENTRIES", 20000)))
+    return _intern_table
+
+
+def intern_fertilizer(catalog_id: Hashable, product_id: Hashable, version: Hashable,
+                      build: Callable[[], Optional[FertilizerRecord]]) -> Optional[FertilizerRecord]:
+    return get_intern_table().get_or_create((catalog_id, product_id, version), build)
@@ -0,0 +1,175 @@
+# lazy_components.py
+"""
+Lazy Component Module
+Defers heavy imports (scipy, sklearn, pandas, pulp, reportlab) and component
+construction until first use or a background warmup, and keeps a startup report
+with import and initialization timings against a configurable budget
+"""
+
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Any
+
+
+class StartupReport:
+    """Import-time and initialization timings for the API process"""
+
+    def __init__(self, import_budget_seconds: float):
+        self.process_start = time.perf_counter()
+        self.import_budget_seconds = import_budget_seconds
+        self.phases: Dict[str, float] = {}
+        self.components: Dict[str, Dict[str, Any]] = {}
+        self.warmup: Dict[str, Any] = {'status': 'not_started'}
+        self._lock = threading.Lock()
+
+    def record_phase(self, name: str, seconds: float):
+        with self._lock:
+            self.phases[name] = seconds
+
+    def record_component(self, name: str, seconds: float, error: Optional[str] = None, trigger: str = "first_use"):
+        with self._lock:
+            self.components[name] = {
+                'initialized': error is None,
+                'init_seconds': round(seconds, 4),
+                'trigger': trigger,
+                'error': error
+            }
+
+    def check_import_budget(self, phase: str = "main_api_import") -> bool:
+        seconds = self.phases.get(phase, 0.0)
+        within = seconds <= self.import_budget_seconds
+        status = "OK" if within else "OVER BUDGET"
+        print(f"[STARTUP] {phase}: {seconds:.3f}s (budget {self.import_budget_seconds:.2f}s) {status}")
+        return within
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            main_import = self.phases.get('main_api_import', 0.0)
+            return {
+                'import_budget_seconds': self.import_budget_seconds,
+                'within_import_budget': main_import <= self.import_budget_seconds,
+                'phases_seconds': {k: round(v, 4) for k, v in self.phases.items()},
+                'components': dict(self.components),
+                'warmup': dict(self.warmup),
+                'uptime_seconds': round(time.perf_counter() - self.process_start, 2)
+            }
+
+
+STARTUP_REPORT = StartupReport(float(os.getenv("IMPORT_TIME_BUDGET_SECONDS", 1.0)))
+
+_registry: Dict[str, 'LazyComponent'] = {}
+
+
+class LazyComponent:
+    """
+    Proxy that builds its target on first attribute access. Construction is
+    thread-safe and happens at most once; call sites use the proxy like the real object.
+    """
+
+    def __init__(self, name: str, factory: Callable[[], Any]):
+        self._name = name
+        self._factory = factory
+        self._instance = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_initialized(self) -> bool:
+        return self._instance is not None
+
+    def get(self, trigger: str = "first_use") -> Any:
+        instance = self._instance
+        if instance is not None:
+            return instance
+
+        with self._lock:
+            if self._instance is None:
+                start = time.perf_counter()
+                try:
+                    self._instance = self._factory()
+                except Exception as e:
+                    STARTUP_REPORT.record_component(self._name, time.perf_counter() - start, str(e), trigger)
+                    print(f"[STARTUP] Failed to initialize {self._name}: {e}")
+                    raise
+                elapsed = time.perf_counter() - start
+                STARTUP_REPORT.record_component(self._name, elapsed, None, trigger)
+                print(f"[STARTUP] {self._name} initialized in {elapsed:.3f}s ({trigger})")
+            return self._instance
+
+    def __getattr__(self, attr: str) -> Any:
+        # Only called for attributes not found on the proxy itself
+        return getattr(self.get(), attr)
+
+    def __repr__(self) -> str:
+        state = "initialized" if self.is_initialized else "pending"
+        return f"<LazyComponent {self._name} ({state})>"
+
+
+def lazy_component(name: str, factory: Callable[[], Any]) -> LazyComponent:
+    """Create and register a lazily constructed component"""
+    component = LazyComponent(name, factory)
+    _registry[name] = component
+    return component
+
+
+def registered_components() -> List[str]:
+    return list(_registry.keys())
+
+
+def warm_up_components(names: Optional[List[str]] = None) -> Dict[str, bool]:
+    """Initialize registered components now; failures are reported, not raised"""
+    results = {}
+    for name in names or registered_components():
+        component = _registry.get(name)
+        if component is None:
+            results[name] = False
+            continue
+        try:
+            component.get(trigger="warmup")
+            results[name] = True
+        except Exception:
+            results[name] = False
+    return results
+
+
+def start_background_warmup(names: Optional[List[str]] = None,
+                            extra_steps: Optional[Callable[[], Dict[str, Any]]] = None) -> threading.Thread:
+    """
+    Initialize components on a daemon thread so the process can accept health checks first.
+    extra_steps returns per-step results and raises when a critical step fails. Only a
+    critical step failure marks the warmup failed; component failures are reported.
+    """
+
+    def run():
+        start = time.perf_counter()
+        STARTUP_REPORT.warmup = {'status': 'running'}
+        print(f"[STARTUP] Background warmup started")
+        results = warm_up_components(names)
+        error = None
+        steps = {}
+        if extra_steps is not None:
+            try:
+                steps = extra_steps() or {}
+            except Exception as e:
+                error = str(e)
+                steps = getattr(e, 'steps', {})
+                print(f"[STARTUP] Warmup step failed: {e}")
+        elapsed = time.perf_counter() - start
+        failed_components = [name for name, ok in results.items() if not ok]
+        if failed_components:
+            print(f"[STARTUP] Components failed to initialize (not gating readiness): "
+                  f"{', '.join(failed_components)}")
+        STARTUP_REPORT.warmup = {
+            'status': 'failed' if error else 'complete',
+            'seconds': round(elapsed, 3),
+            'components': results,
+            'failed_components': failed_components,
+            'steps': steps,
+            'error': error
+        }
+        print(f"[STARTUP] Background warmup finished in {elapsed:.2f}s "
+              f"({STARTUP_REPORT.warmup['status']})")
+
+    thread = threading.Thread(target=run, name="component-warmup", daemon=True)
+    thread.start()
+    return thread
@@ -26,6 +26,12 @@ except ImportError:
     print("[LP] SciPy not available")
 
 from nutrient_calculator import EnhancedFertilizerCalculator
+from element_registry import ANION_IONS, CATION_ELEMENTS, meq_factors
+from metrics import LP_SOLVE_SECONDS, observe_solution
+
+# meq/L per mg/L for the ionic balance: element-basis cations, ion-basis anions
+_CATION_MEQ_PER_MG = meq_factors(CATION_ELEMENTS)
+_ANION_MEQ_PER_MG = meq_factors(ANION_IONS)
 
 
 @dataclass
@@ -40,6 +46,10 @@ class LinearProgrammingResult:
     solver_time_seconds: float
     active_fertilizers: int
     total_dosage: float
+    nutrient_duals: Optional[Dict[str, float]] = None
+    hint: Optional[Dict[str, Any]] = None
+    # Dosages before tiny values are zeroed (achieved concentrations and deviations use these)
+    solved_dosages: Optional[Dict[str, float]] = None
 
 
 class LinearProgrammingOptimizer:
@@ -61,15 +71,22 @@ class LinearProgrammingOptimizer:
         self.max_total_dosage = 15.0      # g/L
         self.max_deviation_acceptable = 0.05  # 5% maximum acceptable deviation
 
+        # ML-hinted solves: hinted dosages below this are pruned from the reduced LP
+        self.hint_min_dosage = 0.01  # g/L
+
     def optimize_fertilizer_solution(self,
                                      fertilizers: List,
                                      target_concentrations: Dict[str, float],
                                      water_analysis: Dict[str, float],
                                      volume_liters: float = 1000,
                                      apply_safety_caps: bool = True,
-                                     strict_caps: bool = True) -> LinearProgrammingResult:
+                                     strict_caps: bool = True,
+                                     hint_dosages: Optional[Dict[str, float]] = None,
+                                     compare_full: bool = False) -> LinearProgrammingResult:
         """
-        Optimize fertilizer solution using linear programming to achieve 0% deviation
+        Optimize fertilizer solution using linear programming to achieve 0% deviation.
+        With hint_dosages (e.g. ML predictions) the LP is first solved over the hinted
+        fertilizers only; see _optimize_with_hint.
         """
         start_time = time.time()
 
@@ -78,7 +95,34 @@ class LinearProgrammingOptimizer:
         print(f"Targets: {len(target_concentrations)}")
         print(f"Solver priority: {'PuLP' if PULP_AVAILABLE else 'SciPy'}")
 
-        # Apply safety caps if requested
+        safe_targets = self.safe_targets(target_concentrations, apply_safety_caps, strict_caps)
+
+        if hint_dosages:
+            result = self._optimize_with_hint(
+                fertilizers, safe_targets, water_analysis, volume_liters, hint_dosages, compare_full)
+        else:
+            result, _ = self._solve(fertilizers, safe_targets, water_analysis, volume_liters)
+        if result is None:
+            raise RuntimeError("Linear programming optimization failed")
+
+        result.solver_time_seconds = time.time() - start_time
+        observe_solution("linear_programming", result.active_fertilizers, result.deviations_percent)
+
+        print(f"=== OPTIMIZATION COMPLETE ===")
+        print(f"Status: {result.optimization_status}")
+        print(f"Active fertilizers: {result.active_fertilizers}")
+        print(f"Total dosage: {result.total_dosage:.3f} g/L")
+        print(f"Solver time: {result.solver_time_seconds:.2f}s")
+        print(
+            f"Average deviation: {np.mean(list(result.deviations_percent.values())):.2f}%")
+
+        return result
+
+    def safe_targets(self,
+                     target_concentrations: Dict[str, float],
+                     apply_safety_caps: bool = True,
+                     strict_caps: bool = True) -> Dict[str, float]:
+        """Targets the LP actually solves for (after safety caps if requested)"""
         safe_targets = target_concentrations.copy()
         if apply_safety_caps:
             from nutrient_caps import apply_nutrient_caps_to_targets
@@ -87,35 +131,200 @@ class LinearProgrammingOptimizer:
             safe_targets = caps_result['capped_concentrations']
             print(
                 f"Safety caps applied: {caps_result['total_adjustments']} adjustments")
+        return safe_targets
+
+    def contribution_matrix(self, fertilizers: List, nutrients: List[str]) -> np.ndarray:
+        """(nutrients x fertilizers) mg/L contributed per g/L of each fertilizer"""
+        return np.array([[self._contribution_factor(f, nutrient) for f in fertilizers]
+                         for nutrient in nutrients], dtype=np.float64).reshape(len(nutrients), len(fertilizers))
+
+    def evaluate_dosages(self,
+                         fertilizers: List,
+                         targets: Dict[str, float],
+                         water: Dict[str, float],
+                         dosages: Dict[str, float],
+                         status: str = "Recipe") -> LinearProgrammingResult:
+        """Result for given dosages without solving (e.g. a rescaled stored recipe)"""
+        start = time.perf_counter()
+        achieved_concentrations = self._calculate_achieved_concentrations(dosages, water, fertilizers)
+        deviations_percent = {}
+        for nutrient, target_final in targets.items():
+            achieved_final = achieved_concentrations.get(nutrient, 0.0)
+            if target_final > 0:
+                deviations_percent[nutrient] = (achieved_final - target_final) / target_final * 100.0
+            else:
+                deviations_percent[nutrient] = 0.0 if achieved_final == 0 else 100.0
 
-        # Try PuLP first, then SciPy
+        # Same objective as the LP: weighted deviation of the fertilizer share plus total dosage
+        objective_value = self.objective_weights['dosage_minimization'] * sum(dosages.values())
+        for nutrient, total_target in targets.items():
+            fertilizer_target = max(0.0, total_target - water.get(nutrient, 0.0))
+            if fertilizer_target > 0:
+                supplied = achieved_concentrations.get(nutrient, 0.0) - water.get(nutrient, 0.0)
+                objective_value += (self.objective_weights['deviation_minimization'] / fertilizer_target
+                                    * abs(supplied - fertilizer_target))
+
+        cleaned_dosages = {f.name: (dosages.get(f.name, 0.0) if dosages.get(f.name, 0.0) >= 0.001 else 0.0)
+                           for f in fertilizers}
+        total_dosage = sum(cleaned_dosages.values())
+        return LinearProgrammingResult(
+            dosages_g_per_L=cleaned_dosages,
+            achieved_concentrations=achieved_concentrations,
+            deviations_percent=deviations_percent,
+            optimization_status=status,
+            objective_value=objective_value,
+            ionic_balance_error=self._calculate_ionic_balance_error(achieved_concentrations),
+            solver_time_seconds=time.perf_counter() - start,
+            active_fertilizers=len([d for d in cleaned_dosages.values() if d > 0]),
+            total_dosage=total_dosage,
+            solved_dosages=dict(dosages)
+        )
+
+    def _solve(self,
+               fertilizers: List,
+               targets: Dict[str, float],
+               water: Dict[str, float],
+               volume_liters: float,
+               initial_dosages: Optional[Dict[str, float]] = None) -> Tuple[Optional[LinearProgrammingResult], float]:
+        """Solve with PuLP first, then SciPy; returns (result or None, solve seconds)"""
+        solve_start = time.perf_counter()
         if PULP_AVAILABLE:
+            backend = "pulp"
             result = self._optimize_with_pulp(
-                fertilizers, safe_targets, water_analysis, volume_liters)
+                fertilizers, targets, water, volume_liters, initial_dosages)
         elif SCIPY_AVAILABLE:
+            backend = "scipy"
             result = self._optimize_with_scipy(
-                fertilizers, safe_targets, water_analysis, volume_liters)
+                fertilizers, targets, water, volume_liters, initial_dosages)
         else:
             raise ImportError(
                 "Neither PuLP nor SciPy available for linear programming")
 
-        result.solver_time_seconds = time.time() - start_time
+        seconds = time.perf_counter() - solve_start
+        LP_SOLVE_SECONDS.observe(seconds, backend=backend,
+                                 status=result.optimization_status if result is not None else "Failed")
+        return result, seconds
 
-        print(f"=== OPTIMIZATION COMPLETE ===")
-        print(f"Status: {result.optimization_status}")
-        print(f"Active fertilizers: {result.active_fertilizers}")
-        print(f"Total dosage: {result.total_dosage:.3f} g/L")
-        print(f"Solver time: {result.solver_time_seconds:.2f}s")
-        print(
-            f"Average deviation: {np.mean(list(result.deviations_percent.values())):.2f}%")
+    @staticmethod
+    def _contribution_factor(fert, nutrient: str) -> float:
+        """mg/L of a nutrient contributed by 1 g/L of a fertilizer"""
+        total_content = fert.composition.cations.get(nutrient, 0.0) + fert.composition.anions.get(nutrient, 0.0)
+        return total_content * fert.chemistry.purity * 0.1 if total_content > 0 else 0.0
+
+    def _hinted_fertilizers(self,
+                            fertilizers: List,
+                            targets: Dict[str, float],
+                            water: Dict[str, float],
+                            hint_dosages: Dict[str, float]) -> List:
+        """
+        Fertilizers the hint uses, plus the strongest supplier of any nutrient that
+        still needs fertilizer and that none of the hinted fertilizers supplies
+        """
+        selected = [f for f in fertilizers if hint_dosages.get(f.name, 0.0) >= self.hint_min_dosage]
+        selected_names = {f.name for f in selected}
+
+        for nutrient, total_target in targets.items():
+            if total_target - water.get(nutrient, 0.0) <= 0:
+                continue
+            if any(self._contribution_factor(f, nutrient) > 0 for f in selected):
+                continue
+            suppliers = [f for f in fertilizers
+                         if f.name not in selected_names and self._contribution_factor(f, nutrient) > 0]
+            if suppliers:
+                best = max(suppliers, key=lambda f: self._contribution_factor(f, nutrient))
+                selected.append(best)
+                selected_names.add(best.name)
+
+        return selected
+
+    def _pruned_columns_improving(self,
+                                  pruned: List,
+                                  duals: Dict[str, float]) -> List[str]:
+        """
+        Pruned fertilizers with a negative reduced cost under the reduced LP's duals;
+        if there are none, the reduced optimum is also optimal for the full column set
+        """
+        improving = []
+        for fert in pruned:
+            reduced_cost = self.objective_weights['dosage_minimization'] - duals.get('total_dosage', 0.0)
+            for nutrient, dual in duals.items():
+                if nutrient != 'total_dosage':
+                    reduced_cost -= self._contribution_factor(fert, nutrient) * dual
+            if reduced_cost < -1e-7:
+                improving.append(fert.name)
+        return improving
+
+    def _optimize_with_hint(self,
+                            fertilizers: List,
+                            targets: Dict[str, float],
+                            water: Dict[str, float],
+                            volume_liters: float,
+                            hint_dosages: Dict[str, float],
+                            compare_full: bool = False) -> Optional[LinearProgrammingResult]:
+        """
+        Solve over the hinted columns, warm-started from the hint. The full column set is
+        solved only if the reduced LP fails or can be improved by a pruned column (PuLP
+        pricing; SciPy has no duals, so it always compares), or when compare_full is set.
+        """
+        reduced = self._hinted_fertilizers(fertilizers, targets, water, hint_dosages)
+        reduced_names = {f.name for f in reduced}
+        pruned = [f for f in fertilizers if f.name not in reduced_names]
+        report = {
+            'full_columns': len(fertilizers),
+            'reduced_columns': len(reduced),
+            'hinted_fertilizers': sorted(reduced_names),
+            'hinted_solve_seconds': None,
+            'full_solve_seconds': None,
+            'fallback_reason': None,
+            'used': 'full'
+        }
+        print(f"[LP] ML hint: solving {len(reduced)}/{len(fertilizers)} columns first")
+
+        result = None
+        if pruned:
+            result, report['hinted_solve_seconds'] = self._solve(
+                reduced, targets, water, volume_liters, initial_dosages=hint_dosages)
+        if not pruned:
+            report['fallback_reason'] = 'nothing_pruned'
+        elif result is None:
+            report['fallback_reason'] = 'reduced_infeasible'
+        elif result.nutrient_duals is None:
+            report['fallback_reason'] = 'no_duals_to_price'
+        else:
+            improving = self._pruned_columns_improving(pruned, result.nutrient_duals)
+            if improving:
+                report['fallback_reason'] = 'pruned_columns_improve_objective'
+                report['improving_columns'] = improving
 
+        if report['fallback_reason'] is None and not compare_full:
+            report['used'] = 'reduced'
+        else:
+            full, report['full_solve_seconds'] = self._solve(fertilizers, targets, water, volume_liters)
+            if result is None or (full is not None and full.objective_value < result.objective_value - 1e-9):
+                result = full
+            else:
+                report['used'] = 'reduced'
+
+        for key in ('hinted_solve_seconds', 'full_solve_seconds'):
+            if report[key] is not None:
+                report[key] = round(report[key], 4)
+
+        if result is not None:
+            # Pruned fertilizers are reported with zero dosage
+            for fert in pruned:
+                result.dosages_g_per_L.setdefault(fert.name, 0.0)
+            result.hint = report
+        print(f"[LP] ML hint: used {report['used']} LP "
+              f"(hinted {report['hinted_solve_seconds']}, full {report['full_solve_seconds']}, "
+              f"fallback: {report['fallback_reason']})")
         return result
 
     def _optimize_with_pulp(self,
                             fertilizers: List,
                             targets: Dict[str, float],
                             water: Dict[str, float],
-                            volume_liters: float) -> LinearProgrammingResult:
+                            volume_liters: float,
+                            initial_dosages: Optional[Dict[str, float]] = None) -> LinearProgrammingResult:
         """
         Optimize using PuLP linear programming solver
         CORRECTED: Targets are fertilizer contribution goals, not final concentration goals
@@ -144,6 +353,9 @@ class LinearProgrammingOptimizer:
             var_name = f"dosage_{fert.name.replace(' ', '_').replace('(', '').replace(')', '')}"
             dosage_vars[fert.name] = lp.LpVariable(
                 var_name, lowBound=0, upBound=self.max_individual_dosage)
+            if initial_dosages is not None:
+                dosage_vars[fert.name].setInitialValue(
+                    min(max(initial_dosages.get(fert.name, 0.0), 0.0), self.max_individual_dosage))
 
         # Deviation variables for each nutrient (both positive and negative)
         deviation_vars_pos = {}
@@ -198,21 +410,22 @@ class LinearProgrammingOptimizer:
             # Balance equation with deviations
             # fertilizer_contribution = fertilizer_target + deviation_pos - deviation_neg
             prob += (fertilizer_contribution == fertilizer_target +
-                     deviation_vars_pos[nutrient] - deviation_vars_neg[nutrient])
+                     deviation_vars_pos[nutrient] - deviation_vars_neg[nutrient],
+                     f"balance_{nutrient.replace(' ', '_')}")
 
         # 2. Maximum dosage constraints
         for var in dosage_vars.values():
             prob += var <= self.max_individual_dosage
 
         # 3. Maximum total dosage constraint
-        prob += lp.lpSum(dosage_vars.values()) <= self.max_total_dosage
+        prob += (lp.lpSum(dosage_vars.values()) <= self.max_total_dosage, "total_dosage")
 
         # 4. Non-negativity constraints for deviations (already handled by lowBound=0)
 
         # Solve the problem
         try:
             print(f"[LP] Solving linear programming problem...")
-            prob.solve(lp.PULP_CBC_CMD(msg=0))
+            prob.solve(lp.PULP_CBC_CMD(msg=0, warmStart=initial_dosages is not None))
 
             if prob.status == lp.LpStatusOptimal:
                 print(f"[LP] PuLP optimization successful!")
@@ -264,6 +477,13 @@ class LinearProgrammingOptimizer:
                     [d for d in cleaned_dosages.values() if d > 0])
                 total_dosage = sum(cleaned_dosages.values())
 
+                # Constraint duals, used to price fertilizers left out of a reduced LP
+                nutrient_duals = {
+                    nutrient: prob.constraints[f"balance_{nutrient.replace(' ', '_')}"].pi or 0.0
+                    for nutrient in fertilizer_targets.keys()
+                }
+                nutrient_duals['total_dosage'] = prob.constraints["total_dosage"].pi or 0.0
+
                 return LinearProgrammingResult(
                     dosages_g_per_L=cleaned_dosages,
                     achieved_concentrations=achieved_concentrations,
@@ -273,7 +493,9 @@ class LinearProgrammingOptimizer:
                     ionic_balance_error=ionic_balance_error,
                     solver_time_seconds=0.0,  # Will be set by caller
                     active_fertilizers=active_fertilizers,
-                    total_dosage=total_dosage
+                    total_dosage=total_dosage,
+                    nutrient_duals=nutrient_duals,
+                    solved_dosages=dosages
                 )
 
             else:
@@ -287,7 +509,8 @@ class LinearProgrammingOptimizer:
                              fertilizers: List,
                              targets: Dict[str, float],
                              water: Dict[str, float],
-                             volume_liters: float) -> LinearProgrammingResult:
+                             volume_liters: float,
+                             initial_dosages: Optional[Dict[str, float]] = None) -> LinearProgrammingResult:
         """
         Optimize using SciPy optimization
         FIXED: Now optimizes for fertilizer contribution only, not total target
@@ -368,8 +591,10 @@ class LinearProgrammingOptimizer:
             np.ones(n_fertilizers), 0, self.max_total_dosage
         )
 
-        # Initial guess (small amounts of each fertilizer)
+        # Initial guess (small amounts of each fertilizer, or the hinted dosages)
         x0 = np.full(n_fertilizers, 0.1)
+        if initial_dosages is not None:
+            x0 = np.clip([initial_dosages.get(f.name, 0.0) for f in fertilizers], 0.0, self.max_individual_dosage)
 
         # Solve optimization
         try:
@@ -434,7 +659,8 @@ class LinearProgrammingOptimizer:
                     ionic_balance_error=ionic_balance_error,
                     solver_time_seconds=0.0,  # Will be set by caller
                     active_fertilizers=active_fertilizers,
-                    total_dosage=total_dosage
+                    total_dosage=total_dosage,
+                    solved_dosages=dosages
                 )
 
             else:
@@ -480,21 +706,11 @@ class LinearProgrammingOptimizer:
 
     def _calculate_ionic_balance_error(self, concentrations: Dict[str, float]) -> float:
         """Calculate ionic balance error in %"""
-        cation_elements = ['Ca', 'K', 'Mg',
-                           'Na', 'NH4', 'Fe', 'Mn', 'Zn', 'Cu']
-        anion_elements = ['NO3', 'H2PO4', 'SO4', 'Cl', 'HCO3']
-
         try:
-            cation_meq = sum(
-                self.nutrient_calc.convert_mg_to_meq_direct(
-                    concentrations.get(elem, 0), elem)
-                for elem in cation_elements
-            )
-            anion_meq = sum(
-                self.nutrient_calc.convert_mg_to_meq_direct(
-                    concentrations.get(elem, 0), elem)
-                for elem in anion_elements
-            )
+            cation_meq = float(np.dot([concentrations.get(elem, 0) for elem in CATION_ELEMENTS],
+                                      _CATION_MEQ_PER_MG))
+            anion_meq = float(np.dot([concentrations.get(elem, 0) for elem in ANION_IONS],
+                                     _ANION_MEQ_PER_MG))
 
             if cation_meq > 0 or anion_meq > 0:
                 balance_error = abs(cation_meq - anion_meq) / \
@@ -0,0 +1,67 @@
+# lru_table.py
+"""
+LRU Table Module
+Thread-safe bounded mapping shared by the process-wide caches (interned fertilizer
+records, mapped Swagger fertilizers, per-catalog price indexes). Values are built
+outside the lock on a miss; when two threads build the same key, the first one stored wins.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Any, Hashable
+
+
+class LRUTable:
+    """Key -> value, least recently used evicted beyond max_entries"""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_build(self, key: Hashable, build: Callable[[], Optional[Any]]) -> Optional[Any]:
+        """Stored value for key; build() runs (outside the lock) only on a miss. None is not stored."""
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+            self.misses += 1
+
+        value = build()
+        if value is None:
+            return None
+        with self._lock:
+            # Another thread may have built the same key meanwhile; keep the first one
+            value = self._entries.setdefault(key, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+    def drop(self, predicate: Callable[[Hashable], bool]) -> int:
+        """Remove every key matching predicate; returns how many were removed"""
+        with self._lock:
+            stale_keys = [key for key in self._entries if predicate(key)]
+            for key in stale_keys:
+                del self._entries[key]
+        return len(stale_keys)
+
+    def clear(self) -> int:
+        with self._lock:
+            removed = len(self._entries)
+            self._entries.clear()
+        return removed
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {'entries': len(self._entries), 'max_entries': self.max_entries,
+                    'hits': self.hits, 'misses': self.misses,
+                    'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0}
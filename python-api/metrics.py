@@ -0,0 +1,245 @@
+# metrics.py
+"""
+In-Process Metrics Module
+Minimal Prometheus-compatible collectors (counters, gauges, histograms) rendered in the
+text exposition format by the /metrics endpoint. No external service required.
+"""
+
+import functools
+import math
+import threading
+import time
+from typing import Dict, List, Optional, Tuple, Any
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+DEFAULT_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _label_key(labels: Dict[str, Any]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(key: LabelKey, extra: Optional[Dict[str, str]] = None) -> str:
+    pairs = list(key) + sorted((extra or {}).items())
+    if not pairs:
+        return ""
+    escaped = ['%s="%s"' % (k, v.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+               for k, v in pairs]
+    return "{" + ",".join(escaped) + "}"
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+
+class _Metric:
+    metric_type = "untyped"
+
+    def __init__(self, name: str, documentation: str):
+        self.name = name
+        self.documentation = documentation
+        self._lock = threading.Lock()
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.metric_type}"]
+
+
+class Counter(_Metric):
+    """Monotonically increasing counter"""
+    metric_type = "counter"
+
+    def __init__(self, name: str, documentation: str):
+        super().__init__(name, documentation)
+        self._values: Dict[LabelKey, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(_label_key(labels), 0.0)
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(key)} {_format_value(value)}")
+        return lines
+
+
+class Gauge(_Metric):
+    """Value that can go up and down"""
+    metric_type = "gauge"
+
+    def __init__(self, name: str, documentation: str):
+        super().__init__(name, documentation)
+        self._values: Dict[LabelKey, float] = {}
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[_label_key(labels)] = float(value)
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+
+    def value(self, **labels) -> float:
+        return self._values.get(_label_key(labels), 0.0)
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(key)} {_format_value(value)}")
+        return lines
+
+
+class Histogram(_Metric):
+    """Cumulative histogram with fixed bucket upper bounds"""
+    metric_type = "histogram"
+
+    def __init__(self, name: str, documentation: str, buckets=DEFAULT_LATENCY_BUCKETS):
+        super().__init__(name, documentation)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._series: Dict[LabelKey, Dict[str, Any]] = {}
+
+    def observe(self, value: float, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = {'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+                self._series[key] = series
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series['counts'][i] += 1
+                    break
+            series['sum'] += value
+            series['count'] += 1
+
+    def time(self, **labels):
+        """Context manager observing elapsed seconds"""
+        return _Timer(self, labels)
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, series['counts']):
+                    cumulative += count
+                    le = "+Inf" if math.isinf(bound) else repr(float(bound))
+                    lines.append(f"{self.name}_bucket{_format_labels(key, {'le': le})} {cumulative}")
+                lines.append(f"{self.name}_sum{_format_labels(key)} {_format_value(series['sum'])}")
+                lines.append(f"{self.name}_count{_format_labels(key)} {series['count']}")
+        return lines
+
+
+class _Timer:
+    def __init__(self, histogram: Histogram, labels: Dict[str, Any]):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+        return False
+
+
+class MetricsRegistry:
+    """Holds every collector and renders the exposition text"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, documentation: str) -> Counter:
+        return self._register(Counter(name, documentation))
+
+    def gauge(self, name: str, documentation: str) -> Gauge:
+        return self._register(Gauge(name, documentation))
+
+    def histogram(self, name: str, documentation: str, buckets=DEFAULT_LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, buckets))
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# ==============================================================================
+# SHARED REGISTRY AND COLLECTORS
+# ==============================================================================
+
+REGISTRY = MetricsRegistry()
+
+HTTP_REQUEST_SECONDS = REGISTRY.histogram(
+    "fertilizer_http_request_duration_seconds", "HTTP request latency by route and status")
+INFLIGHT_REQUESTS = REGISTRY.gauge(
+    "fertilizer_inflight_requests", "Requests currently being processed (worker queue depth)")
+UPSTREAM_REQUEST_SECONDS = REGISTRY.histogram(
+    "fertilizer_upstream_request_duration_seconds", "Swagger backend call latency by operation and outcome")
+LP_SOLVE_SECONDS = REGISTRY.histogram(
+    "fertilizer_lp_solve_duration_seconds", "Linear programming solve time by backend and status")
+PDF_RENDER_SECONDS = REGISTRY.histogram(
+    "fertilizer_pdf_render_duration_seconds", "PDF report render time by outcome")
+CACHE_REQUESTS = REGISTRY.counter(
+    "fertilizer_cache_requests_total", "Cache lookups by cache name and result (hit/miss)")
+ACTIVE_FERTILIZERS = REGISTRY.histogram(
+    "fertilizer_active_fertilizers", "Active fertilizers per optimized solution",
+    buckets=(1, 2, 3, 4, 5, 6, 8, 10, 12, 15, 20, 30))
+NUTRIENT_DEVIATION_PERCENT = REGISTRY.histogram(
+    "fertilizer_nutrient_deviation_percent", "Absolute deviation from target per nutrient",
+    buckets=(0.1, 0.5, 1.0, 2.0, 5.0, 10.0, 15.0, 25.0, 50.0, 100.0))
+
+
+def observe_solution(method: str, active_fertilizers: int, deviations_percent: Dict[str, float]):
+    """Record the shape of an optimized solution"""
+    ACTIVE_FERTILIZERS.observe(active_fertilizers, method=method)
+    for nutrient, deviation in deviations_percent.items():
+        try:
+            NUTRIENT_DEVIATION_PERCENT.observe(abs(float(deviation)), method=method, nutrient=nutrient)
+        except (TypeError, ValueError):
+            continue
+
+
+def track_upstream(operation: str):
+    """Decorator timing an async upstream call, labelled ok/error"""
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            outcome = "ok"
+            try:
+                return await func(*args, **kwargs)
+            except Exception:
+                outcome = "error"
+                raise
+            finally:
+                UPSTREAM_REQUEST_SECONDS.observe(
+                    time.perf_counter() - start, operation=operation, outcome=outcome)
+        return wrapper
+    return decorator
@@ -0,0 +1,208 @@
+# ml_features.py
+"""
+ML Feature Module
+Vectorized featurizer shared by training (ml_optimizer, auto-train.py) and serving.
+Targets and water analyses are packed into structured NumPy arrays once, and both
+feature schemas are computed for the whole batch with column operations
+"""
+
+import numpy as np
+from typing import Dict, List, Optional, Sequence, Any
+
+import element_registry
+
+# Enhanced schema elements (auto-train.py models)
+MACRO_ELEMENTS = list(element_registry.MACRO_ELEMENTS)
+MICRO_ELEMENTS = list(element_registry.MICRO_ELEMENTS)
+ENHANCED_ELEMENTS = MACRO_ELEMENTS + MICRO_ELEMENTS
+
+# Standard schema elements (ml_optimizer models)
+STANDARD_ELEMENTS = ENHANCED_ELEMENTS + ['Cl']
+
+# Ionic groups used for the standard schema sums
+CATION_ELEMENTS = list(element_registry.CATION_ELEMENTS)
+ANION_ELEMENTS = list(element_registry.ANION_ELEMENTS)
+
+# Every element a feature can read
+FEATURE_ELEMENTS = list(dict.fromkeys(STANDARD_ELEMENTS + CATION_ELEMENTS + ANION_ELEMENTS))
+
+CROP_ENCODING = {
+    'leafy_greens': [1, 0, 0],
+    'fruiting_crops': [0, 1, 0],
+    'herbs': [0, 0, 1]
+}
+WATER_ENCODING = {
+    'soft': [1, 0, 0],
+    'medium': [0, 1, 0],
+    'hard': [0, 0, 1]
+}
+DEFAULT_CROP_TYPE = 'leafy_greens'
+DEFAULT_WATER_TYPE = 'medium'
+
+STANDARD_FEATURE_NAMES = (
+    [f'target_{e}' for e in STANDARD_ELEMENTS] +
+    [f'water_{e}' for e in STANDARD_ELEMENTS] +
+    ['target_cation_sum', 'target_anion_sum', 'target_ionic_ratio',
+     'water_cation_sum', 'water_anion_sum',
+     'remaining_cation_demand', 'remaining_anion_demand', 'ionic_balance_priority',
+     'target_EC', 'target_pH', 'volume_factor', 'cost_priority', 'precision_requirement']
+)
+
+ENHANCED_FEATURE_NAMES = (
+    [f'target_{e}' for e in ENHANCED_ELEMENTS] +
+    [f'water_{e}' for e in ENHANCED_ELEMENTS] +
+    [f'remaining_{e}' for e in ENHANCED_ELEMENTS] +
+    ['k_ca_ratio', 'ca_mg_ratio', 'n_k_ratio', 'fe_mn_ratio', 'fe_zn_ratio', 'mn_zn_ratio',
+     'total_macro', 'total_micro', 'micro_intensity'] +
+    [f'crop_{c}' for c in CROP_ENCODING] +
+    [f'water_type_{w}' for w in WATER_ENCODING]
+)
+
+# Normalization scales for the enhanced schema (macro / micro)
+_TARGET_SCALE = np.array([300.0] * len(MACRO_ELEMENTS) + [5.0] * len(MICRO_ELEMENTS))
+_WATER_SCALE = np.array([100.0] * len(MACRO_ELEMENTS) + [1.0] * len(MICRO_ELEMENTS))
+
+
+def nutrient_array(records: Sequence[Dict[str, float]]) -> np.ndarray:
+    """
+    Pack nutrient dicts into a structured array with one float field per element.
+    Absent elements are NaN so "missing" and "zero" stay distinguishable; feature
+    columns read them as 0, exactly like dict.get(element, 0).
+    """
+    elements = list(FEATURE_ELEMENTS)
+    known = set(elements)
+    for record in records:
+        for element in record:
+            if element not in known:
+                known.add(element)
+                elements.append(element)
+
+    array = np.full(len(records), np.nan, dtype=[(element, 'f8') for element in elements])
+    for row, record in enumerate(records):
+        for element, value in record.items():
+            array[row][element] = value
+    return array
+
+
+def as_nutrient_array(values: Any) -> np.ndarray:
+    """Accept a structured array, one dict or a sequence of dicts"""
+    if isinstance(values, np.ndarray) and values.dtype.names:
+        return values
+    if isinstance(values, dict):
+        return nutrient_array([values])
+    return nutrient_array(list(values))
+
+
+def element_matrix(array: np.ndarray, elements: Sequence[str]) -> np.ndarray:
+    """(rows x elements) float matrix; missing fields and NaN read as 0"""
+    names = array.dtype.names
+    columns = [array[e] if e in names else np.zeros(len(array)) for e in elements]
+    if not columns:
+        return np.zeros((len(array), 0))
+    return np.nan_to_num(np.column_stack(columns), nan=0.0)
+
+
+def _row_sum(matrix: np.ndarray) -> np.ndarray:
+    """Left-to-right row sum (same float rounding as the built-in sum over a dict)"""
+    total = np.zeros(matrix.shape[0])
+    for j in range(matrix.shape[1]):
+        total = total + matrix[:, j]
+    return total
+
+
+def _row_max(array: np.ndarray, default: float) -> np.ndarray:
+    """Largest value present in each row (default for rows with no values at all)"""
+    values = np.column_stack([array[name] for name in array.dtype.names])
+    present = ~np.isnan(values)
+    row_max = np.max(np.where(present, values, -np.inf), axis=1)
+    return np.where(present.any(axis=1), row_max, default)
+
+
+def standard_features(targets: Any, water: Any, constraints: Optional[Dict] = None) -> np.ndarray:
+    """39-column standard schema (STANDARD_FEATURE_NAMES) for every row"""
+    targets = as_nutrient_array(targets)
+    water = as_nutrient_array(water)
+    n_rows = len(targets)
+
+    target_values = element_matrix(targets, STANDARD_ELEMENTS)
+    water_values = element_matrix(water, STANDARD_ELEMENTS)
+
+    target_cation_sum = _row_sum(element_matrix(targets, CATION_ELEMENTS))
+    target_anion_sum = _row_sum(element_matrix(targets, ANION_ELEMENTS))
+    water_cation_sum = _row_sum(element_matrix(water, CATION_ELEMENTS))
+    water_anion_sum = _row_sum(element_matrix(water, ANION_ELEMENTS))
+
+    constraints = constraints or {}
+    column = lambda value: np.full(n_rows, float(value))
+
+    return np.column_stack([
+        target_values,
+        water_values,
+        target_cation_sum,
+        target_anion_sum,
+        target_cation_sum / np.maximum(target_anion_sum, 1.0),
+        water_cation_sum,
+        water_anion_sum,
+        np.maximum(0, target_cation_sum - water_cation_sum),
+        np.maximum(0, target_anion_sum - water_anion_sum),
+        column(constraints.get('ionic_balance_priority', 1.0)),
+        column(constraints.get('target_EC', 2.0)),
+        column(constraints.get('target_pH', 6.0)),
+        column(1.0),
+        column(constraints.get('cost_priority', 0.5)),
+        np.minimum(0.1, _row_max(targets, 100.0) * 0.05 / 100)
+    ]).astype(np.float64)
+
+
+def _encode(kinds: Optional[Sequence[str]], encoding: Dict[str, List[int]], default: str, n_rows: int) -> np.ndarray:
+    fallback = encoding[default]
+    if kinds is None:
+        return np.tile(fallback, (n_rows, 1)).astype(np.float64)
+    return np.array([encoding.get(kind, fallback) for kind in kinds], dtype=np.float64)
+
+
+def enhanced_features(targets: Any, water: Any,
+                      crop_types: Optional[Sequence[str]] = None,
+                      water_types: Optional[Sequence[str]] = None) -> np.ndarray:
+    """51-column enhanced schema (ENHANCED_FEATURE_NAMES) for every row"""
+    targets = as_nutrient_array(targets)
+    water = as_nutrient_array(water)
+    n_rows = len(targets)
+
+    target_values = element_matrix(targets, ENHANCED_ELEMENTS)
+    water_values = element_matrix(water, ENHANCED_ELEMENTS)
+    remaining = np.maximum(0, target_values - water_values)
+
+    t = {e: target_values[:, j] for j, e in enumerate(ENHANCED_ELEMENTS)}
+    total_macro = _row_sum(target_values[:, :len(MACRO_ELEMENTS)]) / 1000.0
+    total_micro = _row_sum(target_values[:, len(MACRO_ELEMENTS):]) / 10.0
+
+    return np.column_stack([
+        target_values / _TARGET_SCALE,
+        water_values / _WATER_SCALE,
+        remaining / _TARGET_SCALE,
+        # Macro ratios
+        t['K'] / np.maximum(t['Ca'], 1) / 2.0,
+        t['Ca'] / np.maximum(t['Mg'], 1) / 5.0,
+        t['N'] / np.maximum(t['K'], 1) / 1.5,
+        # Micronutrient ratios
+        t['Fe'] / np.maximum(t['Mn'], 0.1) / 10.0,
+        t['Fe'] / np.maximum(t['Zn'], 0.1) / 20.0,
+        t['Mn'] / np.maximum(t['Zn'], 0.1) / 3.0,
+        # Total demands
+        total_macro,
+        total_micro,
+        total_micro / np.maximum(total_macro, 0.1),
+        _encode(crop_types, CROP_ENCODING, DEFAULT_CROP_TYPE, n_rows),
+        _encode(water_types, WATER_ENCODING, DEFAULT_WATER_TYPE, n_rows)
+    ]).astype(np.float64)
+
+
+def enhanced_features_from_scenarios(scenarios: Sequence[Dict[str, Any]]) -> np.ndarray:
+    """Enhanced schema for auto-train.py scenarios (targets, water, crop_type, water_type)"""
+    return enhanced_features(
+        nutrient_array([s['targets'] for s in scenarios]),
+        nutrient_array([s['water'] for s in scenarios]),
+        crop_types=[s.get('crop_type', DEFAULT_CROP_TYPE) for s in scenarios],
+        water_types=[s.get('water_type', DEFAULT_WATER_TYPE) for s in scenarios]
+    )
@@ -0,0 +1,288 @@
+# ml_models.py
+"""
+ML Model Factory Module
+Dosage model construction shared by ml_optimizer and auto-train.py. Forests, extra-trees
+and Ridge are fitted natively multi-output (one ensemble for all fertilizers); only
+estimators that cannot predict several outputs are wrapped in MultiOutputRegressor.
+Includes a benchmark of fit time, predict latency, artifact size and accuracy.
+"""
+
+import io
+import time
+from typing import Callable, Dict, List, Optional, Any
+
+import numpy as np
+
+try:
+    from sklearn.ensemble import (
+        RandomForestRegressor, ExtraTreesRegressor, GradientBoostingRegressor, HistGradientBoostingRegressor
+    )
+    from sklearn.linear_model import Ridge
+    from sklearn.metrics import mean_absolute_error, r2_score
+    from sklearn.model_selection import train_test_split
+    from sklearn.multioutput import MultiOutputRegressor
+    SKLEARN_AVAILABLE = True
+except ImportError:
+    SKLEARN_AVAILABLE = False
+
+try:
+    # Optional: XGBoost >= 2.0 grows one shared tree for all outputs (multi_output_tree)
+    from xgboost import XGBRegressor
+    XGBOOST_AVAILABLE = True
+except ImportError:
+    XGBOOST_AVAILABLE = False
+
+# Short names (MLModelConfig.model_type) -> estimator names (auto-train.py)
+MODEL_ALIASES = {
+    'RandomForest': 'RandomForestRegressor',
+    'ExtraTrees': 'ExtraTreesRegressor',
+    'GradientBoosting': 'GradientBoostingRegressor',
+    'HistGradientBoosting': 'HistGradientBoostingRegressor',
+    'XGBoost': 'XGBRegressor'
+}
+
+# Estimators that fit every output in a single model
+NATIVE_MULTI_OUTPUT_MODELS = ['RandomForestRegressor', 'ExtraTreesRegressor', 'Ridge', 'XGBRegressor']
+
+BENCHMARK_MODELS = [
+    'RandomForestRegressor', 'ExtraTreesRegressor', 'HistGradientBoostingRegressor',
+    'GradientBoostingRegressor', 'Ridge'
+]
+
+
+def canonical_model_name(model_name: str) -> str:
+    return MODEL_ALIASES.get(model_name, model_name)
+
+
+def create_base_model(model_name: str,
+                      n_estimators: int = 100,
+                      max_depth: Optional[int] = None,
+                      learning_rate: float = 0.1,
+                      random_state: int = 42,
+                      n_jobs: int = 1,
+                      **params):
+    """Unwrapped estimator for a model name; unknown names fall back to Ridge"""
+    model_name = canonical_model_name(model_name)
+
+    if model_name == 'RandomForestRegressor':
+        return RandomForestRegressor(n_estimators=n_estimators, max_depth=max_depth,
+                                     random_state=random_state, n_jobs=n_jobs, **params)
+    if model_name == 'ExtraTreesRegressor':
+        return ExtraTreesRegressor(n_estimators=n_estimators, max_depth=max_depth,
+                                   random_state=random_state, n_jobs=n_jobs, **params)
+    if model_name == 'GradientBoostingRegressor':
+        return GradientBoostingRegressor(n_estimators=n_estimators, max_depth=max_depth,
+                                         learning_rate=learning_rate, random_state=random_state, **params)
+    if model_name == 'HistGradientBoostingRegressor':
+        return HistGradientBoostingRegressor(max_iter=n_estimators, max_depth=max_depth,
+                                             learning_rate=learning_rate, random_state=random_state, **params)
+    if model_name == 'XGBRegressor':
+        if not XGBOOST_AVAILABLE:
+            print(f"[ML] XGBoost not installed, using HistGradientBoostingRegressor per output")
+            return create_base_model('HistGradientBoostingRegressor', n_estimators, max_depth,
+                                     learning_rate, random_state, n_jobs)
+        return XGBRegressor(n_estimators=n_estimators, max_depth=max_depth or 6, learning_rate=learning_rate,
+                            tree_method='hist', multi_strategy='multi_output_tree',
+                            random_state=random_state, n_jobs=n_jobs, **params)
+    return Ridge(alpha=params.get('alpha', 1.0), random_state=random_state)
+
+
+def as_multi_output(base_model):
+    """Return the estimator itself if it is natively multi-output, otherwise wrap it"""
+    if type(base_model).__name__ in NATIVE_MULTI_OUTPUT_MODELS:
+        return base_model
+    return MultiOutputRegressor(base_model)
+
+
+def create_dosage_model(model_name: str, **params):
+    """Multi-output dosage model (one prediction column per fertilizer)"""
+    return as_multi_output(create_base_model(model_name, **params))
+
+
+def is_native_multi_output(model) -> bool:
+    return not isinstance(model, MultiOutputRegressor)
+
+
+def feature_importances(model) -> Optional[np.ndarray]:
+    """Feature importances of a fitted model (averaged over outputs for wrapped models)"""
+    if isinstance(model, MultiOutputRegressor):
+        if not hasattr(model.estimators_[0], 'feature_importances_'):
+            return None
+        return np.mean([estimator.feature_importances_ for estimator in model.estimators_], axis=0)
+    return getattr(model, 'feature_importances_', None)
+
+
+def artifact_size_bytes(model) -> int:
+    """Size of the model as an uncompressed joblib artifact (what the registry stores)"""
+    import joblib
+    buffer = io.BytesIO()
+    joblib.dump(model, buffer)
+    return buffer.getbuffer().nbytes
+
+
+def benchmark_models(X: np.ndarray,
+                     y: np.ndarray,
+                     model_names: Optional[List[str]] = None,
+                     model_params: Optional[Dict[str, Dict[str, Any]]] = None,
+                     test_size: float = 0.2,
+                     latency_repeats: int = 50,
+                     random_state: int = 42,
+                     compare_wrapped: bool = False) -> List[Dict[str, Any]]:
+    """
+    Fit each model on the same split and report fit time, single-row and batch
+    predict latency, artifact size and test accuracy. compare_wrapped also fits
+    natively multi-output models inside MultiOutputRegressor (the previous setup).
+    """
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=test_size, random_state=random_state)
+    candidates = []
+    for model_name in model_names or BENCHMARK_MODELS:
+        base_model = create_base_model(model_name, random_state=random_state,
+                                       **(model_params or {}).get(model_name, {}))
+        candidates.append((canonical_model_name(model_name), as_multi_output(base_model)))
+        if compare_wrapped and is_native_multi_output(candidates[-1][1]):
+            candidates.append((f"{canonical_model_name(model_name)} (wrapped)", MultiOutputRegressor(base_model)))
+
+    results = []
+    for label, model in candidates:
+        start = time.perf_counter()
+        model.fit(X_train, y_train)
+        fit_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        y_pred = np.asarray(model.predict(X_test)).reshape(y_test.shape)
+        batch_seconds = time.perf_counter() - start
+
+        row = X_test[:1]
+        model.predict(row)
+        row_times = []
+        for _ in range(latency_repeats):
+            start = time.perf_counter()
+            model.predict(row)
+            row_times.append(time.perf_counter() - start)
+
+        result = {
+            'model': label,
+            'native_multi_output': is_native_multi_output(model),
+            'fitted_estimators': len(model.estimators_) if isinstance(model, MultiOutputRegressor) else 1,
+            'fit_seconds': round(fit_seconds, 3),
+            'predict_row_ms': round(float(np.median(row_times)) * 1000, 3),
+            'predict_batch_ms': round(batch_seconds * 1000, 3),
+            'artifact_kb': round(artifact_size_bytes(model) / 1024, 1),
+            'test_mae': float(mean_absolute_error(y_test.flatten(), y_pred.flatten())),
+            'test_r2': float(r2_score(y_test, y_pred, multioutput='uniform_average'))
+        }
+        results.append(result)
+        print(f"[ML] {result['model']:<40} fit {result['fit_seconds']:>7.2f}s  "
+              f"row {result['predict_row_ms']:>7.2f}ms  batch {result['predict_batch_ms']:>8.1f}ms  "
+              f"{result['artifact_kb']:>9.0f} KB  R² {result['test_r2']:.4f}  MAE {result['test_mae']:.4f}")
+
+    return results
+
+
+def fit_with_progress(model, X: np.ndarray, y: np.ndarray,
+                      progress: Optional[Callable[[int, int], None]] = None,
+                      chunk: int = 10):
+    """
+    Fit a dosage model, reporting (estimators fitted, estimators total) as it goes.
+    Forests grow in warm-started chunks of trees; wrapped GradientBoosting reports each
+    boosting stage of each output; other models report once when done.
+    """
+    if progress is None:
+        return model.fit(X, y)
+
+    if isinstance(model, (RandomForestRegressor, ExtraTreesRegressor)):
+        total = model.n_estimators
+        model.set_params(warm_start=True)
+        for n_trees in range(min(chunk, total), total + chunk, chunk):
+            model.set_params(n_estimators=min(n_trees, total))
+            model.fit(X, y)
+            progress(min(n_trees, total), total)
+        model.set_params(warm_start=False)
+        return model
+
+    if isinstance(model, MultiOutputRegressor) and isinstance(model.estimator, GradientBoostingRegressor):
+        n_outputs = y.shape[1] if y.ndim > 1 else 1
+        stages = model.estimator.n_estimators
+        total = n_outputs * stages
+        fitted = [0]
+
+        def monitor(stage, estimator, local_vars):
+            fitted[0] += 1
+            if fitted[0] % chunk == 0 or fitted[0] == total:
+                progress(fitted[0], total)
+            return False
+
+        return model.fit(X, y, monitor=monitor)
+
+    model.fit(X, y)
+    progress(1, 1)
+    return model
+
+
+# Name fragments that mark micronutrient fertilizers (auto-train.py schema)
+MICRO_FERTILIZER_KEYWORDS = ('hierro', 'manganeso', 'zinc', 'cobre', 'borico', 'molibdato')
+
+
+def is_micro_fertilizer(name: str) -> bool:
+    name = name.lower()
+    return any(keyword in name for keyword in MICRO_FERTILIZER_KEYWORDS)
+
+
+def micro_fertilizer_mask(fertilizer_names: List[str]) -> np.ndarray:
+    """Boolean column mask of micronutrient fertilizers (compute once per output layout)"""
+    return np.array([is_micro_fertilizer(name) for name in fertilizer_names], dtype=bool)
+
+
+def per_output_r2(y_true: np.ndarray, y_pred: np.ndarray) -> np.ndarray:
+    """R² of each output column (constant columns score 1.0 if predicted exactly, else 0.0, like sklearn)"""
+    ss_res = np.sum((y_true - y_pred) ** 2, axis=0)
+    ss_tot = np.sum((y_true - y_true.mean(axis=0)) ** 2, axis=0)
+    r2 = np.where(ss_res == 0, 1.0, 0.0)
+    varying = ss_tot > 0
+    r2[varying] = 1.0 - ss_res[varying] / ss_tot[varying]
+    return r2
+
+
+def dosage_metrics(y_true: np.ndarray,
+                   y_pred: np.ndarray,
+                   fertilizer_names: List[str],
+                   micro_mask: Optional[np.ndarray] = None,
+                   micro_threshold: float = 0.0001,
+                   macro_threshold: float = 0.001) -> Dict[str, Any]:
+    """
+    Overall, micro/macro and per-fertilizer MAE, R² and max relative deviation (%) over
+    the whole test set. Deviation only counts cells whose true dosage exceeds the
+    column's threshold (micronutrient fertilizers are dosed far lower).
+    """
+    y_true = np.asarray(y_true, dtype=np.float64)
+    y_pred = np.asarray(y_pred, dtype=np.float64).reshape(y_true.shape)
+    if micro_mask is None:
+        micro_mask = micro_fertilizer_mask(fertilizer_names)
+
+    abs_error = np.abs(y_pred - y_true)
+    mae = abs_error.mean(axis=0)
+    r2 = per_output_r2(y_true, y_pred)
+
+    counted = y_true > np.where(micro_mask, micro_threshold, macro_threshold)
+    relative = np.zeros_like(abs_error)
+    np.divide(abs_error, y_true, out=relative, where=counted)
+    max_deviation = relative.max(axis=0, initial=0.0) * 100
+
+    def group(mask: np.ndarray) -> Optional[Dict[str, float]]:
+        if not mask.any():
+            return None
+        return {'mae': float(abs_error[:, mask].mean()), 'r2': float(r2[mask].mean()),
+                'max_deviation': float(max_deviation[mask].max()), 'fertilizers': int(mask.sum())}
+
+    return {
+        'mae': float(abs_error.mean()),
+        'r2': float(r2.mean()),
+        'max_deviation': float(max_deviation.max(initial=0.0)),
+        'micro': group(micro_mask),
+        'macro': group(~micro_mask),
+        'per_fertilizer': {
+            name: {'mae': float(mae[j]), 'r2': float(r2[j]), 'max_deviation': float(max_deviation[j]),
+                   'micro': bool(micro_mask[j])}
+            for j, name in enumerate(fertilizer_names)
+        }
+    }
@@ -5,10 +5,11 @@ FIXED ML OPTIMIZER - Compatible model loading and saving
 
 import numpy as np
 import pandas as pd
-from typing import Dict, List, Tuple, Optional, Any
+from typing import Callable, Dict, List, Tuple, Optional, Any
 from dataclasses import dataclass
 import pickle
 import os
+import threading
 from datetime import datetime
 
 # ML Imports with error handling
@@ -31,6 +32,16 @@ except ImportError:
 
 from models import MLModelConfig
 from nutrient_calculator import EnhancedFertilizerCalculator
+from element_registry import BALANCE_SPECIES, meq_factors, mg_to_meq
+from ml_features import (
+    CATION_ELEMENTS, ANION_ELEMENTS, STANDARD_FEATURE_NAMES,
+    nutrient_array, as_nutrient_array, standard_features, enhanced_features
+)
+from ml_models import create_dosage_model, feature_importances, fit_with_progress
+from model_registry import get_model_registry, ModelRegistry
+from training_data import (
+    STANDARD_PROFILE, GreedyChemistryLabeler, dicts_to_matrix, generate_training_scenarios
+)
 
 # Custom unpickler to handle missing classes from auto-train.py
 class CompatibilityUnpickler(pickle.Unpickler):
@@ -66,63 +77,12 @@ class CompatibilityUnpickler(pickle.Unpickler):
             return EnhancedTrainingConfig
         return super().find_class(module, name)
 
-@dataclass
-class MLFeatureVector:
-    """Comprehensive feature vector for ML optimization"""
-    # Target concentrations (13 features)
-    target_N: float = 0.0
-    target_P: float = 0.0
-    target_K: float = 0.0
-    target_Ca: float = 0.0
-    target_Mg: float = 0.0
-    target_S: float = 0.0
-    target_Fe: float = 0.0
-    target_Mn: float = 0.0
-    target_Zn: float = 0.0
-    target_Cu: float = 0.0
-    target_B: float = 0.0
-    target_Mo: float = 0.0
-    target_Cl: float = 0.0
-    
-    # Water analysis (13 features)
-    water_N: float = 0.0
-    water_P: float = 0.0
-    water_K: float = 0.0
-    water_Ca: float = 0.0
-    water_Mg: float = 0.0
-    water_S: float = 0.0
-    water_Fe: float = 0.0
-    water_Mn: float = 0.0
-    water_Zn: float = 0.0
-    water_Cu: float = 0.0
-    water_B: float = 0.0
-    water_Mo: float = 0.0
-    water_Cl: float = 0.0
-    
-    # Ionic balance requirements (8 features)
-    target_cation_sum: float = 0.0
-    target_anion_sum: float = 0.0
-    target_ionic_ratio: float = 1.0
-    water_cation_sum: float = 0.0
-    water_anion_sum: float = 0.0
-    remaining_cation_demand: float = 0.0
-    remaining_anion_demand: float = 0.0
-    ionic_balance_priority: float = 1.0
-    
-    # Solution constraints (5 features)
-    target_EC: float = 2.0
-    target_pH: float = 6.0
-    volume_factor: float = 1.0
-    cost_priority: float = 0.5
-    precision_requirement: float = 0.1
-
-
 class ProfessionalMLFertilizerOptimizer:
     """
     Professional ML-based fertilizer optimizer with robust model loading
     """
     
-    def __init__(self, config: MLModelConfig = None):
+    def __init__(self, config: MLModelConfig = None, auto_load: bool = True):
         if not SKLEARN_AVAILABLE:
             raise ImportError("scikit-learn is required for ML optimization. Install with: pip install scikit-learn")
         
@@ -151,11 +111,16 @@ class ProfessionalMLFertilizerOptimizer:
         self.nutrient_calc = EnhancedFertilizerCalculator()
         
         # Element definitions for ionic calculations
-        self.cation_elements = ['Ca', 'K', 'Mg', 'Na', 'NH4', 'Fe', 'Mn', 'Zn', 'Cu']
-        self.anion_elements = ['N', 'S', 'Cl', 'P', 'HCO3', 'B', 'Mo']
+        self.cation_elements = list(CATION_ELEMENTS)
+        self.anion_elements = list(ANION_ELEMENTS)
         
         # Model persistence with better error handling
         self.model_save_path = os.path.join(os.path.dirname(__file__), "saved_models", "ml_optimizer_model.pkl")
+        self._load_lock = threading.Lock()
+        
+        # Registry version currently loaded, and the outcome of the last registration
+        self.registry_version = None
+        self.last_registration = {}
         
         print(f"[ML] Professional ML Fertilizer Optimizer initialized")
         print(f"   Model type: {self.config.model_type}")
@@ -163,124 +128,21 @@ class ProfessionalMLFertilizerOptimizer:
         print(f"   Max iterations: {self.config.max_iterations}")
         
         # Try to load existing model with better error handling
-        self._try_load_existing_model()
+        if auto_load:
+            self._try_load_existing_model()
 
     def extract_comprehensive_features(self, targets: Dict[str, float], 
                                      water: Dict[str, float],
                                      fertilizers: Optional[List] = None,
                                      constraints: Optional[Dict] = None) -> np.ndarray:
         """
-        Extract comprehensive feature vector from real API data
+        Extract comprehensive feature vector from real API data (standard schema, one row)
         """
-        
-        # Initialize feature vector
-        features = MLFeatureVector()
-        
-        # Extract target concentrations
-        standard_elements = ['N', 'P', 'K', 'Ca', 'Mg', 'S', 'Fe', 'Mn', 'Zn', 'Cu', 'B', 'Mo', 'Cl']
-        
-        for element in standard_elements:
-            target_val = targets.get(element, 0.0)
-            water_val = water.get(element, 0.0)
-            
-            setattr(features, f'target_{element}', float(target_val))
-            setattr(features, f'water_{element}', float(water_val))
-        
-        # Calculate ionic balance features
-        features.target_cation_sum = sum(targets.get(elem, 0) for elem in self.cation_elements)
-        features.target_anion_sum = sum(targets.get(elem, 0) for elem in self.anion_elements)
-        features.target_ionic_ratio = features.target_cation_sum / max(features.target_anion_sum, 1.0)
-        
-        features.water_cation_sum = sum(water.get(elem, 0) for elem in self.cation_elements)
-        features.water_anion_sum = sum(water.get(elem, 0) for elem in self.anion_elements)
-        
-        features.remaining_cation_demand = max(0, features.target_cation_sum - features.water_cation_sum)
-        features.remaining_anion_demand = max(0, features.target_anion_sum - features.water_anion_sum)
-        
-        # Set solution constraints
-        if constraints:
-            features.target_EC = constraints.get('target_EC', 2.0)
-            features.target_pH = constraints.get('target_pH', 6.0)
-            features.cost_priority = constraints.get('cost_priority', 0.5)
-            features.ionic_balance_priority = constraints.get('ionic_balance_priority', 1.0)
-        
-        # Calculate precision requirement based on nutrient levels
-        max_target = max(targets.values()) if targets else 100
-        features.precision_requirement = min(0.1, max_target * 0.05 / 100)
-        
-        # Convert to numpy array
-        feature_vector = []
-        for field in features.__dataclass_fields__:
-            feature_vector.append(getattr(features, field))
-        
-        return np.array(feature_vector, dtype=np.float64)
+        return standard_features(targets, water, constraints)[0]
     
     def _extract_enhanced_features_for_prediction(self, targets: Dict[str, float], water: Dict[str, float]) -> np.ndarray:
-        """Extract enhanced features compatible with auto-train.py models"""
-        
-        # Element lists matching auto-train.py
-        macro_elements = ['N', 'P', 'K', 'Ca', 'Mg', 'S']
-        micro_elements = ['Fe', 'Mn', 'Zn', 'Cu', 'B', 'Mo']
-        all_elements = macro_elements + micro_elements
-        
-        features = []
-        
-        # 1. Target concentrations (macro + micro)
-        for element in all_elements:
-            target = targets.get(element, 0)
-            if element in macro_elements:
-                normalized = target / 300.0  # Macro: 0-300 mg/L
-            else:
-                normalized = target / 5.0    # Micro: 0-5 mg/L
-            features.append(normalized)
-        
-        # 2. Water concentrations (macro + micro)
-        for element in all_elements:
-            water_val = water.get(element, 0)
-            if element in macro_elements:
-                normalized = water_val / 100.0   # Water macro: 0-100 mg/L
-            else:
-                normalized = water_val / 1.0     # Water micro: 0-1 mg/L
-            features.append(normalized)
-        
-        # 3. Remaining needs (target - water)
-        for element in all_elements:
-            target_val = targets.get(element, 0)
-            water_val = water.get(element, 0)
-            remaining = max(0, target_val - water_val)
-            if element in macro_elements:
-                normalized = remaining / 300.0
-            else:
-                normalized = remaining / 5.0
-            features.append(normalized)
-        
-        # 4. Nutrient ratios (enhanced with micronutrient ratios)
-        # Traditional macro ratios
-        k_ca_ratio = targets.get('K', 0) / max(targets.get('Ca', 1), 1) / 2.0
-        ca_mg_ratio = targets.get('Ca', 0) / max(targets.get('Mg', 1), 1) / 5.0
-        n_k_ratio = targets.get('N', 0) / max(targets.get('K', 1), 1) / 1.5
-        features.extend([k_ca_ratio, ca_mg_ratio, n_k_ratio])
-        
-        # Micronutrient ratios
-        fe_mn_ratio = targets.get('Fe', 0) / max(targets.get('Mn', 0.1), 0.1) / 10.0
-        fe_zn_ratio = targets.get('Fe', 0) / max(targets.get('Zn', 0.1), 0.1) / 20.0
-        mn_zn_ratio = targets.get('Mn', 0) / max(targets.get('Zn', 0.1), 0.1) / 3.0
-        features.extend([fe_mn_ratio, fe_zn_ratio, mn_zn_ratio])
-        
-        # 5. Total nutrient demands
-        total_macro = sum(targets.get(elem, 0) for elem in macro_elements) / 1000.0
-        total_micro = sum(targets.get(elem, 0) for elem in micro_elements) / 10.0
-        micro_intensity = total_micro / max(total_macro, 0.1)
-        features.extend([total_macro, total_micro, micro_intensity])
-        
-        # 6. Crop and water type encoding (defaults for prediction)
-        # Default to leafy_greens and medium water
-        crop_features = [1, 0, 0]  # leafy_greens
-        water_features = [0, 1, 0]  # medium water
-        features.extend(crop_features)
-        features.extend(water_features)
-        
-        return np.array(features)
+        """Extract enhanced features compatible with auto-train.py models (default crop/water type)"""
+        return enhanced_features(targets, water)[0]
     
     def _map_model_to_actual_fertilizers(self, actual_fertilizers: List) -> Dict[str, Any]:
         """Map model fertilizer names to actual fertilizer objects"""
@@ -339,28 +201,39 @@ class ProfessionalMLFertilizerOptimizer:
         return mapping
 
     def train_model(self, training_data: List[Dict[str, Any]], 
-                    fertilizers: List = None) -> Dict[str, Any]:
+                    fertilizers: List = None,
+                    progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+                    defer_promotion: bool = False) -> Dict[str, Any]:
         """
         Train ML model - wrapper for train_advanced_model for API compatibility
         """
         if fertilizers is None:
             # Extract fertilizers from training data if not provided
-            from fertilizer_database import EnhancedFertilizerDatabase
-            db = EnhancedFertilizerDatabase()
+            from fertilizer_database import get_fertilizer_database
+            db = get_fertilizer_database()
             fertilizers = []
             for name in ['nitrato de calcio', 'nitrato de potasio', 'fosfato monopotasico', 'sulfato de magnesio']:
                 fert = db.create_fertilizer_from_database(name)
                 if fert:
                     fertilizers.append(fert)
         
-        return self.train_advanced_model(fertilizers, training_data)
+        return self.train_advanced_model(fertilizers, training_data, progress=progress,
+                                         defer_promotion=defer_promotion)
 
     def train_advanced_model(self, fertilizers: List, 
                            training_scenarios: List[Dict[str, Any]],
-                           validation_split: float = 0.2) -> Dict[str, Any]:
+                           validation_split: float = 0.2,
+                           register: bool = True,
+                           progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+                           defer_promotion: bool = False) -> Dict[str, Any]:
         """
-        Train advanced ML model using real fertilizer data and scenarios
+        Train advanced ML model using real fertilizer data and scenarios.
+        fertilizers may be fertilizer objects or plain names; register=False leaves
+        the registry untouched (the caller decides whether to promote), defer_promotion=True
+        registers without promoting and marks a better model 'promotion_pending'.
+        progress receives {'stage', 'estimators_fitted', 'estimators_total'} updates.
         """
+        report = progress or (lambda update: None)
         if not SKLEARN_AVAILABLE:
             raise RuntimeError("scikit-learn not available for training")
         
@@ -368,40 +241,24 @@ class ProfessionalMLFertilizerOptimizer:
         print(f"   Fertilizers: {len(fertilizers)}")
         print(f"   Training scenarios: {len(training_scenarios)}")
         
-        # Prepare training data
-        X_features = []
-        y_dosages = []
-        y_balance_scores = []
-        
         # Extract fertilizer names for consistent ordering
-        self.fertilizer_names = [f.name for f in fertilizers]
+        self.fertilizer_names = [getattr(f, 'name', f) for f in fertilizers]
         print(f"   Target fertilizers: {self.fertilizer_names}")
         
-        # Process each training scenario
-        for i, scenario in enumerate(training_scenarios):
-            if i % 500 == 0:
-                print(f"   Processing scenario {i+1}/{len(training_scenarios)}...")
-            
-            targets = scenario['targets']
-            water = scenario['water']
-            optimal_dosages = scenario['optimal_dosages']
-            balance_quality = scenario.get('balance_quality', 0.5)
-            
-            # Extract features
-            features = self.extract_comprehensive_features(targets, water, fertilizers)
-            X_features.append(features)
-            
-            # Convert dosages to ordered array
-            dosage_array = []
-            for fert_name in self.fertilizer_names:
-                dosage = optimal_dosages.get(fert_name, 0.0)
-                dosage_array.append(dosage)
-            
-            y_dosages.append(dosage_array)
-            y_balance_scores.append(balance_quality)
+        # Extract features for all scenarios at once
+        X = standard_features(
+            nutrient_array([scenario['targets'] for scenario in training_scenarios]),
+            nutrient_array([scenario['water'] for scenario in training_scenarios])
+        )
+        
+        # Convert dosages to ordered arrays
+        y_dosages = [
+            [scenario['optimal_dosages'].get(fert_name, 0.0) for fert_name in self.fertilizer_names]
+            for scenario in training_scenarios
+        ]
+        y_balance_scores = [scenario.get('balance_quality', 0.5) for scenario in training_scenarios]
         
         # Convert to numpy arrays
-        X = np.array(X_features, dtype=np.float64)
         y_dosages = np.array(y_dosages, dtype=np.float64)
         y_balance = np.array(y_balance_scores, dtype=np.float64)
         
@@ -425,29 +282,38 @@ class ProfessionalMLFertilizerOptimizer:
         
         # Train primary dosage prediction model
         print(f"   Training primary dosage model ({self.config.model_type})...")
+        report({'stage': 'fitting_primary_model'})
         
-        if self.config.model_type == "GradientBoosting":
-            base_model = GradientBoostingRegressor(
+        # Forests / extra-trees / Ridge are natively multi-output; boosting is wrapped per fertilizer
+        if self.config.model_type in ("GradientBoosting", "HistGradientBoosting", "XGBoost"):
+            self.primary_model = create_dosage_model(
+                self.config.model_type,
                 n_estimators=self.config.n_estimators,
                 max_depth=self.config.max_depth,
                 learning_rate=self.config.learning_rate,
                 random_state=42
             )
-        elif self.config.model_type == "RandomForest":
-            base_model = RandomForestRegressor(
+        elif self.config.model_type in ("RandomForest", "ExtraTrees"):
+            self.primary_model = create_dosage_model(
+                self.config.model_type,
                 n_estimators=self.config.n_estimators,
                 max_depth=self.config.max_depth,
                 random_state=42,
                 n_jobs=-1
             )
         else:
-            base_model = Ridge(alpha=1.0)
+            self.primary_model = create_dosage_model("Ridge")
         
-        self.primary_model = MultiOutputRegressor(base_model)
-        self.primary_model.fit(X_train, y_dos_train)
+        fit_with_progress(
+            self.primary_model, X_train, y_dos_train,
+            (lambda fitted, total: report({'stage': 'fitting_primary_model',
+                                           'estimators_fitted': fitted, 'estimators_total': total}))
+            if progress else None
+        )
         
         # Train ionic balance optimization model
         print(f"   Training ionic balance model...")
+        report({'stage': 'fitting_balance_model'})
         self.balance_model = GradientBoostingRegressor(
             n_estimators=100,
             max_depth=8,
@@ -488,13 +354,9 @@ class ProfessionalMLFertilizerOptimizer:
         }
         
         # Feature importance analysis
-        if hasattr(self.primary_model.estimators_[0], 'feature_importances_'):
-            feature_importance = np.mean([
-                estimator.feature_importances_ 
-                for estimator in self.primary_model.estimators_
-            ], axis=0)
-            
-            self.feature_names = [f"feature_{i}" for i in range(X.shape[1])]
+        feature_importance = feature_importances(self.primary_model)
+        if feature_importance is not None:
+            self.feature_names = list(STANDARD_FEATURE_NAMES)
             top_features = sorted(zip(self.feature_names, feature_importance), 
                                 key=lambda x: x[1], reverse=True)[:10]
             
@@ -510,7 +372,8 @@ class ProfessionalMLFertilizerOptimizer:
         print(f"   Balance prediction MAE: {test_mae_balance:.4f}")
         
         # Save model if it's better than existing one
-        self._try_save_if_improved()
+        if register:
+            self._try_save_if_improved(defer_promotion)
         
         return self.training_metrics
 
@@ -522,8 +385,7 @@ class ProfessionalMLFertilizerOptimizer:
         Advanced ML-based optimization with ionic balance consideration
         """
         # Try to load model if not trained
-        if not self.is_trained:
-            self._try_load_existing_model()
+        self.ensure_model_loaded()
             
         if not self.is_trained:
             raise RuntimeError("[ERROR] ML model not trained. Call train_advanced_model() first.")
@@ -635,6 +497,245 @@ class ProfessionalMLFertilizerOptimizer:
         
         return final_dosages
 
+    def optimize_with_ml_batch(self, scenarios: List[Tuple[Dict[str, float], Dict[str, float]]],
+                               fertilizers: List,
+                               constraints: Optional[Dict] = None,
+                               refine_balance: bool = False) -> List[Dict[str, Any]]:
+        """
+        Screen many (targets, water) scenarios against one fertilizer catalog.
+        Features are stacked into one matrix so each model is called once for the
+        whole batch; constraints and validation run on the dosage matrix. Invalid
+        scenarios are reported per row instead of raising.
+        """
+        self.ensure_model_loaded()
+
+        if not self.is_trained:
+            raise RuntimeError("[ERROR] ML model not trained. Call train_advanced_model() first.")
+
+        if not scenarios:
+            return []
+
+        enhanced = 'micronutrient_accuracy' in self.training_metrics
+        n_scenarios = len(scenarios)
+        print(f"[ML] Batch ML optimization: {n_scenarios} scenarios, {len(fertilizers)} fertilizers")
+
+        # One feature matrix and one predict call per model for the whole batch
+        features = self._batch_features(
+            nutrient_array([targets for targets, _ in scenarios]),
+            nutrient_array([water for _, water in scenarios]),
+            constraints
+        )
+        raw_dosages = np.asarray(self.primary_model.predict(features), dtype=np.float64).reshape(n_scenarios, -1)
+        if self.balance_model is not None:
+            balance_scores = np.asarray(self.balance_model.predict(features), dtype=np.float64).reshape(-1)
+        else:
+            balance_scores = np.full(n_scenarios, 0.8)
+
+        # Model output columns -> catalog fertilizer names (last mapping wins, as in optimize_with_ml)
+        column_for_name: Dict[str, int] = {}
+        if enhanced:
+            fertilizer_mapping = self._map_model_to_actual_fertilizers(fertilizers)
+            for i, model_fert_name in enumerate(self.fertilizer_names[:raw_dosages.shape[1]]):
+                if model_fert_name in fertilizer_mapping:
+                    actual_fert = fertilizer_mapping[model_fert_name]
+                    column_for_name[getattr(actual_fert, 'name', str(actual_fert))] = i
+        else:
+            for i, fert_name in enumerate(self.fertilizer_names[:raw_dosages.shape[1]]):
+                column_for_name[fert_name] = i
+
+        dosage_names = list(column_for_name.keys())
+        dosages = np.maximum(raw_dosages[:, list(column_for_name.values())], 0.0)
+
+        # Optional per-row balance refinement, only for rows predicted to be poorly balanced
+        refined = np.zeros(n_scenarios, dtype=bool)
+        if refine_balance and self.balance_model is not None:
+            for row in np.flatnonzero(balance_scores < 0.7):
+                targets, water = scenarios[row]
+                row_dosages = dict(zip(dosage_names, dosages[row]))
+                optimized = self._optimize_ionic_balance(row_dosages, targets, water, fertilizers)
+                dosages[row] = [optimized.get(name, 0.0) for name in dosage_names]
+                refined[row] = True
+
+        dosages = self._apply_solution_constraints_batch(dosages, dosage_names, constraints)
+        validation = self._validate_ml_solution_batch(dosages, dosage_names, scenarios, fertilizers, enhanced)
+
+        results = []
+        for row in range(n_scenarios):
+            row_dosages = {name: float(dosages[row, j]) for j, name in enumerate(dosage_names)}
+            results.append({
+                'index': row,
+                'valid': bool(validation['valid'][row]),
+                'dosages_g_per_L': row_dosages,
+                'total_dosage': float(validation['total_dosage'][row]),
+                'active_fertilizers': int(validation['active_fertilizers'][row]),
+                'predicted_balance_score': float(balance_scores[row]),
+                'balance_refined': bool(refined[row]),
+                'quality_score': float(validation['quality_score'][row]),
+                'target_quality': float(validation['target_quality'][row]),
+                'balance_quality': float(validation['balance_quality'][row]),
+                'ionic_balance_error_percent': float(validation['balance_error'][row] * 100),
+                'achieved_concentrations': validation['achieved'][row],
+                'errors': validation['errors'][row],
+                'warnings': validation['warnings'][row]
+            })
+
+        valid_count = int(validation['valid'].sum())
+        print(f"[ML] Batch ML optimization finished: {valid_count}/{n_scenarios} valid solutions")
+        return results
+
+    def _batch_features(self, targets_array: np.ndarray, water_array: np.ndarray,
+                        constraints: Optional[Dict] = None) -> np.ndarray:
+        """Scaled feature matrix in this model's schema (enhanced or standard)"""
+        if 'micronutrient_accuracy' in self.training_metrics:
+            features = enhanced_features(targets_array, water_array)
+        else:
+            features = standard_features(targets_array, water_array, constraints)
+        if self.scaler is not None:
+            features = self.scaler.transform(features)
+        return features
+
+    def predict_dosage_matrix(self, targets: Any, water: Any, fertilizer_names: List[str]) -> np.ndarray:
+        """
+        Raw (unconstrained, clipped at 0) predicted dosages for many scenarios, with one
+        column per requested fertilizer name; fertilizers the model does not know predict 0
+        """
+        targets_array = as_nutrient_array(targets)
+        features = self._batch_features(targets_array, as_nutrient_array(water))
+        raw = np.asarray(self.primary_model.predict(features), dtype=np.float64).reshape(len(targets_array), -1)
+        column = {name: j for j, name in enumerate(self.fertilizer_names[:raw.shape[1]])}
+        matrix = np.zeros((len(targets_array), len(fertilizer_names)))
+        for i, name in enumerate(fertilizer_names):
+            if name in column:
+                matrix[:, i] = np.maximum(raw[:, column[name]], 0.0)
+        return matrix
+
+    def _composition_matrix(self, dosage_names: List[str], fertilizers: List,
+                            elements: List[str]) -> np.ndarray:
+        """mg/L of each element contributed by 1 g/L of each fertilizer (rows follow dosage_names)"""
+        fert_map = {f.name: f for f in fertilizers}
+        element_index = {element: j for j, element in enumerate(elements)}
+        matrix = np.zeros((len(dosage_names), len(elements)))
+
+        for i, name in enumerate(dosage_names):
+            fertilizer = fert_map.get(name)
+            if fertilizer is None:
+                continue
+            for content in (fertilizer.composition.cations, fertilizer.composition.anions):
+                for element, content_percent in content.items():
+                    if content_percent > 0 and element in element_index:
+                        # Same formula as calculate_element_contribution for 1000 mg/L of product
+                        matrix[i, element_index[element]] += self.nutrient_calc.calculate_element_contribution(
+                            1000.0, content_percent, fertilizer.percentage
+                        )
+        return matrix
+
+    def _apply_solution_constraints_batch(self, dosages: np.ndarray, dosage_names: List[str],
+                                          constraints: Optional[Dict] = None) -> np.ndarray:
+        """Vectorized _apply_solution_constraints over a (scenarios x fertilizers) matrix"""
+        constrained = np.where(dosages < 0.001, 0.0, dosages)
+        constrained = np.minimum(constrained, 5.0)
+
+        totals = constrained.sum(axis=1)
+        scale = np.where(totals > 15.0, 15.0 / np.maximum(totals, 1e-12), 1.0)
+        constrained = constrained * scale[:, None]
+
+        if constraints and 'required_fertilizers' in constraints:
+            required = [j for j, name in enumerate(dosage_names) if name in constraints['required_fertilizers']]
+            if required:
+                constrained[:, required] = np.maximum(constrained[:, required], 0.1)
+
+        return constrained
+
+    def _validate_ml_solution_batch(self, dosages: np.ndarray, dosage_names: List[str],
+                                    scenarios: List[Tuple[Dict[str, float], Dict[str, float]]],
+                                    fertilizers: List, enhanced: bool) -> Dict[str, Any]:
+        """Vectorized _validate_ml_solution: same checks and quality score, one row per scenario"""
+        n_scenarios = dosages.shape[0]
+
+        elements = list(dict.fromkeys(
+            [e for targets, _ in scenarios for e in targets] +
+            [e for _, water in scenarios for e in water] +
+            self.cation_elements + self.anion_elements
+        ))
+        element_index = {element: j for j, element in enumerate(elements)}
+
+        targets_matrix = np.zeros((n_scenarios, len(elements)))
+        water_matrix = np.zeros((n_scenarios, len(elements)))
+        for row, (targets, water) in enumerate(scenarios):
+            for element, value in targets.items():
+                targets_matrix[row, element_index[element]] = value
+            for element, value in water.items():
+                water_matrix[row, element_index[element]] = value
+
+        achieved = water_matrix + dosages @ self._composition_matrix(dosage_names, fertilizers, elements)
+
+        total_dosage = dosages.sum(axis=1)
+        active = (dosages > 0.001).sum(axis=1)
+        basic_ok = (total_dosage > 0) & (total_dosage <= 20) & (active > 0)
+
+        # Target quality: 1 - mean relative deviation over nutrients with a positive target
+        has_target = targets_matrix > 0
+        deviation = np.abs(achieved - targets_matrix) / np.where(has_target, targets_matrix, 1.0)
+        deviation = np.where(has_target, deviation, 0.0)
+        target_count = has_target.sum(axis=1)
+        target_quality = np.where(
+            target_count > 0,
+            np.maximum(0.0, 1.0 - deviation.sum(axis=1) / np.maximum(target_count, 1)),
+            0.5
+        )
+
+        # Ionic balance in meq/L
+        cation_meq = achieved @ meq_factors(elements, self.cation_elements, BALANCE_SPECIES)
+        anion_meq = achieved @ meq_factors(elements, self.anion_elements, BALANCE_SPECIES)
+        balance_defined = (cation_meq > 0) & (anion_meq > 0)
+        balance_error = np.where(
+            balance_defined,
+            np.abs(cation_meq - anion_meq) / np.maximum(np.maximum(cation_meq, anion_meq), 1e-12),
+            1.0
+        )
+        balance_quality = np.where(balance_defined, np.maximum(0.0, 1.0 - balance_error), 0.0)
+
+        quality_score = np.where(basic_ok, target_quality * 0.7 + balance_quality * 0.3, 0.0)
+        if enhanced:
+            # Enhanced models were validated during training; only basic sanity applies
+            valid = basic_ok.copy()
+        else:
+            valid = basic_ok & (quality_score >= 0.3)
+
+        errors: List[List[str]] = [[] for _ in range(n_scenarios)]
+        warnings: List[List[str]] = [[] for _ in range(n_scenarios)]
+        achieved_rows: List[Dict[str, float]] = []
+        for row in range(n_scenarios):
+            if total_dosage[row] <= 0:
+                errors[row].append("Zero total dosage")
+            elif total_dosage[row] > 20:
+                errors[row].append(f"Excessive total dosage: {total_dosage[row]:.2f} g/L")
+            elif active[row] == 0:
+                errors[row].append("No active fertilizers")
+            else:
+                if not balance_defined[row] and not enhanced:
+                    errors[row].append("Invalid ionic balance calculation")
+                if not valid[row]:
+                    errors[row].append(f"Poor solution quality: {quality_score[row]:.3f}")
+                for j in np.flatnonzero(has_target[row] & (deviation[row] > 0.5)):
+                    warnings[row].append(f"{elements[j]}: {deviation[row, j] * 100:.1f}% deviation")
+
+            targets, _ = scenarios[row]
+            achieved_rows.append({element: float(achieved[row, element_index[element]]) for element in targets})
+
+        return {
+            'valid': valid,
+            'total_dosage': total_dosage,
+            'active_fertilizers': active,
+            'target_quality': np.where(basic_ok, target_quality, 0.0),
+            'balance_quality': np.where(basic_ok, balance_quality, 0.0),
+            'balance_error': balance_error,
+            'quality_score': quality_score,
+            'achieved': achieved_rows,
+            'errors': errors,
+            'warnings': warnings
+        }
+
     def _optimize_ionic_balance(self, initial_dosages: Dict[str, float],
                                targets: Dict[str, float], 
                                water: Dict[str, float],
@@ -669,10 +770,10 @@ class ProfessionalMLFertilizerOptimizer:
             
             if cation_sum > 0 and anion_sum > 0:
                 # Convert to meq/L for proper ionic balance
-                cation_meq = sum(self.nutrient_calc.convert_mg_to_meq_direct(achieved.get(elem, 0), elem) 
-                               for elem in self.cation_elements)
-                anion_meq = sum(self.nutrient_calc.convert_mg_to_meq_direct(achieved.get(elem, 0), elem) 
-                              for elem in self.anion_elements)
+                cation_meq = float(mg_to_meq([achieved.get(elem, 0) for elem in self.cation_elements],
+                                             self.cation_elements, BALANCE_SPECIES).sum())
+                anion_meq = float(mg_to_meq([achieved.get(elem, 0) for elem in self.anion_elements],
+                                            self.anion_elements, BALANCE_SPECIES).sum())
                 
                 balance_error = abs(cation_meq - anion_meq) / max(cation_meq, anion_meq, 1.0)
             else:
@@ -890,10 +991,10 @@ class ProfessionalMLFertilizerOptimizer:
         
         # Calculate ionic balance quality (skip for enhanced models without composition data)
         if achieved:
-            cation_meq = sum(self.nutrient_calc.convert_mg_to_meq_direct(achieved.get(elem, 0), elem) 
-                            for elem in self.cation_elements)
-            anion_meq = sum(self.nutrient_calc.convert_mg_to_meq_direct(achieved.get(elem, 0), elem) 
-                           for elem in self.anion_elements)
+            cation_meq = float(mg_to_meq([achieved.get(elem, 0) for elem in self.cation_elements],
+                                         self.cation_elements, BALANCE_SPECIES).sum())
+            anion_meq = float(mg_to_meq([achieved.get(elem, 0) for elem in self.anion_elements],
+                                        self.anion_elements, BALANCE_SPECIES).sum())
             
             if cation_meq > 0 and anion_meq > 0:
                 balance_error = abs(cation_meq - anion_meq) / max(cation_meq, anion_meq)
@@ -945,90 +1046,19 @@ class ProfessionalMLFertilizerOptimizer:
         return validation_result
 
     def generate_real_training_data(self, fertilizers: List, 
-                                  num_scenarios: int = 5000) -> List[Dict[str, Any]]:
+                                  num_scenarios: int = 5000,
+                                  workers: Optional[int] = None,
+                                  seed: Optional[int] = None) -> List[Dict[str, Any]]:
         """
-        Generate realistic training scenarios based on actual fertilizer compositions
+        Generate realistic training scenarios based on actual fertilizer compositions.
+        Scenarios are sampled and labeled as arrays, in parallel shards for large counts.
         """
         print(f"[ML] Generating {num_scenarios} realistic training scenarios...")
         
-        training_scenarios = []
-        
-        # Define realistic ranges for different crop types and growth phases
-        crop_scenarios = {
-            'leafy_greens': {
-                'N': (120, 180), 'P': (30, 50), 'K': (180, 250), 'Ca': (150, 200), 
-                'Mg': (40, 60), 'S': (60, 100), 'Fe': (1.5, 3.0), 'Mn': (0.3, 0.8)
-            },
-            'fruiting_crops': {
-                'N': (140, 220), 'P': (35, 65), 'K': (200, 350), 'Ca': (160, 220), 
-                'Mg': (45, 70), 'S': (70, 120), 'Fe': (2.0, 4.0), 'Mn': (0.4, 1.0)
-            },
-            'herbs': {
-                'N': (100, 150), 'P': (25, 45), 'K': (150, 220), 'Ca': (120, 180), 
-                'Mg': (30, 50), 'S': (50, 90), 'Fe': (1.0, 2.5), 'Mn': (0.2, 0.6)
-            }
-        }
-        
-        water_types = {
-            'soft': {'Ca': (5, 25), 'Mg': (2, 10), 'K': (1, 8), 'N': (0, 5), 'HCO3': (20, 80)},
-            'medium': {'Ca': (20, 60), 'Mg': (8, 25), 'K': (3, 15), 'N': (1, 10), 'HCO3': (60, 150)},
-            'hard': {'Ca': (50, 120), 'Mg': (20, 50), 'K': (5, 25), 'N': (2, 20), 'HCO3': (100, 250)}
-        }
-        
-        for i in range(num_scenarios):
-            if i % 1000 == 0:
-                print(f"   Generated {i}/{num_scenarios} scenarios...")
-            
-            # Randomly select crop type and water type
-            crop_type = np.random.choice(list(crop_scenarios.keys()))
-            water_type = np.random.choice(list(water_types.keys()))
-            
-            # Generate target concentrations
-            targets = {}
-            crop_ranges = crop_scenarios[crop_type]
-            for element, (min_val, max_val) in crop_ranges.items():
-                targets[element] = np.random.uniform(min_val, max_val)
-            
-            # Add micronutrients if not specified
-            if 'Zn' not in targets:
-                targets['Zn'] = np.random.uniform(0.1, 0.5)
-            if 'Cu' not in targets:
-                targets['Cu'] = np.random.uniform(0.05, 0.2)
-            if 'B' not in targets:
-                targets['B'] = np.random.uniform(0.2, 0.8)
-            if 'Mo' not in targets:
-                targets['Mo'] = np.random.uniform(0.01, 0.1)
-            
-            # Generate water analysis
-            water = {}
-            water_ranges = water_types[water_type]
-            for element, (min_val, max_val) in water_ranges.items():
-                water[element] = np.random.uniform(min_val, max_val)
-            
-            # Fill in missing elements with small random values
-            all_elements = ['N', 'P', 'K', 'Ca', 'Mg', 'S', 'Fe', 'Mn', 'Zn', 'Cu', 'B', 'Mo', 'Cl', 'HCO3']
-            for element in all_elements:
-                if element not in water:
-                    water[element] = np.random.uniform(0, 2)
-                if element not in targets:
-                    targets[element] = np.random.uniform(1, 10)
-            
-            # Calculate optimal dosages using deterministic chemistry
-            optimal_dosages = self._calculate_optimal_dosages_chemistry(targets, water, fertilizers)
-            
-            # Evaluate balance quality
-            balance_quality = self._evaluate_solution_balance_quality(optimal_dosages, targets, water, fertilizers)
-            
-            scenario = {
-                'targets': targets,
-                'water': water,
-                'optimal_dosages': optimal_dosages,
-                'balance_quality': balance_quality,
-                'crop_type': crop_type,
-                'water_type': water_type
-            }
-            
-            training_scenarios.append(scenario)
+        labeler = GreedyChemistryLabeler(fertilizers, STANDARD_PROFILE.elements)
+        training_scenarios = generate_training_scenarios(
+            STANDARD_PROFILE, labeler, num_scenarios, workers=workers, seed=seed
+        )
         
         print(f"[SUCCESS] Generated {len(training_scenarios)} realistic training scenarios")
         
@@ -1041,117 +1071,25 @@ class ProfessionalMLFertilizerOptimizer:
                                            water: Dict[str, float], 
                                            fertilizers: List) -> Dict[str, float]:
         """
-        Calculate chemically optimal dosages using stoichiometric principles
+        Calculate chemically optimal dosages using stoichiometric principles (one scenario)
         """
-        dosages = {}
-        
-        # Calculate remaining nutrients after water contribution
-        remaining = {}
-        for element, target in targets.items():
-            remaining[element] = max(0, target - water.get(element, 0))
-        
-        # Create fertilizer composition map
-        fert_compositions = {}
-        for fert in fertilizers:
-            total_composition = {}
-            total_composition.update(fert.composition.cations)
-            total_composition.update(fert.composition.anions)
-            fert_compositions[fert.name] = total_composition
-        
-        # Priority order for nutrient supply
-        nutrient_priority = ['P', 'Ca', 'K', 'Mg', 'S', 'N', 'Fe', 'Mn', 'Zn', 'Cu', 'B', 'Mo']
-        
-        for nutrient in nutrient_priority:
-            need = remaining.get(nutrient, 0)
-            if need <= 0:
-                continue
-            
-            # Find best fertilizer source for this nutrient
-            best_fert = None
-            best_efficiency = 0
-            
-            for fert in fertilizers:
-                if fert.name in dosages and dosages[fert.name] > 3.0:
-                    continue  # Skip if already using too much of this fertilizer
-                
-                content = fert_compositions.get(fert.name, {}).get(nutrient, 0)
-                if content > 0:
-                    # Calculate efficiency (content per unit cost, avoiding single-element fertilizers)
-                    total_useful_content = sum(
-                        fert_compositions[fert.name].get(elem, 0) 
-                        for elem in remaining.keys() 
-                        if remaining[elem] > 0
-                    )
-                    efficiency = total_useful_content / max(content, 1)
-                    
-                    if efficiency > best_efficiency:
-                        best_efficiency = efficiency
-                        best_fert = fert
-            
-            if best_fert:
-                # Calculate required dosage
-                content_percent = fert_compositions[best_fert.name].get(nutrient, 0)
-                if content_percent > 0:
-                    required_dosage_mg_l = need / (content_percent / 100.0) * (100.0 / best_fert.percentage)
-                    additional_dosage_g_l = required_dosage_mg_l / 1000.0
-                    
-                    # Add to existing dosage
-                    dosages[best_fert.name] = dosages.get(best_fert.name, 0) + additional_dosage_g_l
-                    
-                    # Update remaining nutrients for all elements in this fertilizer
-                    for element, content in fert_compositions[best_fert.name].items():
-                        if content > 0:
-                            contribution = self.nutrient_calc.calculate_element_contribution(
-                                required_dosage_mg_l, content, best_fert.percentage
-                            )
-                            remaining[element] = max(0, remaining.get(element, 0) - contribution)
-        
-        # Clean up dosages
-        for name in list(dosages.keys()):
-            if dosages[name] < 0.001:
-                dosages[name] = 0.0
-            elif dosages[name] > 8.0:  # Cap excessive dosages
-                dosages[name] = 8.0
-        
-        return dosages
+        elements = list(dict.fromkeys(list(targets) + list(water)))
+        labeler = GreedyChemistryLabeler(fertilizers, elements)
+        dosages = labeler.dosages(dicts_to_matrix([targets], elements), dicts_to_matrix([water], elements))[0]
+        return {name: float(d) for name, d in zip(labeler.fertilizer_names, dosages) if d > 0}
 
     def _evaluate_solution_balance_quality(self, dosages: Dict[str, float],
                                          targets: Dict[str, float],
                                          water: Dict[str, float],
                                          fertilizers: List) -> float:
         """
-        Evaluate the ionic balance quality of a solution
+        Evaluate the ionic balance quality of a solution (one scenario)
         """
-        achieved = self._calculate_achieved_concentrations(dosages, water, fertilizers)
-        
-        # Calculate target achievement score
-        target_score = 0
-        target_count = 0
-        for element, target in targets.items():
-            if target > 0:
-                achieved_val = achieved.get(element, 0)
-                accuracy = 1 - min(abs(achieved_val - target) / target, 1.0)
-                target_score += accuracy
-                target_count += 1
-        
-        target_quality = target_score / max(target_count, 1)
-        
-        # Calculate ionic balance score
-        cation_meq = sum(self.nutrient_calc.convert_mg_to_meq_direct(achieved.get(elem, 0), elem) 
-                        for elem in self.cation_elements)
-        anion_meq = sum(self.nutrient_calc.convert_mg_to_meq_direct(achieved.get(elem, 0), elem) 
-                       for elem in self.anion_elements)
-        
-        if cation_meq > 0 and anion_meq > 0:
-            balance_error = abs(cation_meq - anion_meq) / max(cation_meq, anion_meq)
-            balance_quality = max(0, 1 - balance_error)
-        else:
-            balance_quality = 0
-        
-        # Combined quality score
-        overall_quality = target_quality * 0.6 + balance_quality * 0.4
-        
-        return max(0, min(1, overall_quality))
+        elements = list(dict.fromkeys(list(targets) + list(water)))
+        labeler = GreedyChemistryLabeler(fertilizers, elements)
+        dosage_row = np.array([[dosages.get(name, 0.0) for name in labeler.fertilizer_names]])
+        return float(labeler.quality(
+            dicts_to_matrix([targets], elements), dicts_to_matrix([water], elements), dosage_row)[0])
 
     def _analyze_training_data_quality(self, training_scenarios: List[Dict]) -> None:
         """
@@ -1269,10 +1207,10 @@ class ProfessionalMLFertilizerOptimizer:
                     micro_elements = micronutrient_features['micro_elements']
                     
                     # Map to cations and anions (simplified mapping)
-                    self.cation_elements = [e for e in macro_elements if e in ['Ca', 'K', 'Mg', 'Na', 'NH4']] + \
-                                         [e for e in micro_elements if e in ['Fe', 'Mn', 'Zn', 'Cu']]
-                    self.anion_elements = [e for e in macro_elements if e in ['N', 'P', 'S', 'Cl', 'HCO3']] + \
-                                        [e for e in micro_elements if e in ['B', 'Mo']]
+                    self.cation_elements = [e for e in macro_elements if e in CATION_ELEMENTS] + \
+                                         [e for e in micro_elements if e in CATION_ELEMENTS]
+                    self.anion_elements = [e for e in macro_elements if e in ANION_ELEMENTS] + \
+                                        [e for e in micro_elements if e in ANION_ELEMENTS]
                 
             else:
                 print(f"[ML] Loading standard model format...")
@@ -1310,14 +1248,26 @@ class ProfessionalMLFertilizerOptimizer:
             self.fertilizer_names = []
             raise RuntimeError(f"Model loading failed: {e}")
 
+    def ensure_model_loaded(self) -> bool:
+        """Load the saved model once, even when several requests race for it"""
+        if not self.is_trained:
+            with self._load_lock:
+                if not self.is_trained:
+                    self._try_load_existing_model()
+        return self.is_trained
+
     def _try_load_existing_model(self) -> None:
-        """Try to load existing saved model if available with robust error handling"""
+        """Load the registry's active model; a legacy pickle is imported into the registry once"""
         try:
-            if os.path.exists(self.model_save_path):
-                print(f"[ML] Found existing model, attempting to load...")
+            registry = get_model_registry()
+            if registry.active_version():
+                self.load_from_registry(registry)
+            elif os.path.exists(self.model_save_path):
+                print(f"[ML] Found legacy model file, importing into registry...")
                 self.load_model(self.model_save_path)
+                self.register_in_registry(registry, source="legacy_pickle", promote=True)
             else:
-                print(f"[ML] No existing model found at {self.model_save_path}")
+                print(f"[ML] No existing model found in registry or at {self.model_save_path}")
         except Exception as e:
             print(f"[ML] Could not load existing model: {e}")
             print(f"   Will train new model when needed")
@@ -1327,34 +1277,89 @@ class ProfessionalMLFertilizerOptimizer:
             self.scaler = None
             self.is_trained = False
 
-    def _try_save_if_improved(self) -> None:
-        """Save model if it's better than existing one or no existing model"""
+    def load_from_registry(self, registry: Optional[ModelRegistry] = None, version: Optional[str] = None) -> None:
+        """Load a registry version (default: active); arrays are memory-mapped from the artifact"""
+        registry = registry or get_model_registry()
+        components, metadata = registry.load(version)
+        
+        if components.get('primary_model') is None:
+            raise ValueError(f"Primary model is None in registry version {metadata['version']}")
+        
+        self.primary_model = components['primary_model']
+        self.balance_model = components.get('balance_model')
+        self.scaler = components.get('scaler')
+        if metadata.get('config'):
+            self.config = MLModelConfig(**metadata['config'])
+        self.fertilizer_names = list(metadata.get('fertilizer_names', []))
+        self.feature_names = list(metadata.get('feature_names', []))
+        self.training_metrics = dict(metadata.get('training_metrics', {}))
+        self.cation_elements = list(metadata.get('cation_elements', self.cation_elements))
+        self.anion_elements = list(metadata.get('anion_elements', self.anion_elements))
+        self.is_trained = True
+        self.registry_version = metadata['version']
+        
+        print(f"[SUCCESS] ML model {self.registry_version} loaded from registry")
+        print(f"   Schema: {metadata.get('schema', 'standard')}, source: {metadata.get('source', 'unknown')}")
+        print(f"   Fertilizers: {len(self.fertilizer_names)}")
+        print(f"   Test R²: {self.training_metrics.get('dosage_test_r2', 0):.4f}")
+
+    def register_in_registry(self, registry: Optional[ModelRegistry] = None,
+                             source: str = "train_model", promote: bool = False) -> Dict[str, Any]:
+        """Store the trained model as a new registry version, optionally making it active"""
+        if not self.is_trained:
+            raise RuntimeError("No trained model to register")
+        
+        registry = registry or get_model_registry()
+        components = {
+            'primary_model': self.primary_model,
+            'balance_model': self.balance_model,
+            'scaler': self.scaler
+        }
+        metadata = {
+            'source': source,
+            'schema': 'enhanced' if 'micronutrient_accuracy' in self.training_metrics else 'standard',
+            'model_type': self.config.model_type,
+            'config': self.config.dict(),
+            'fertilizer_names': list(self.fertilizer_names),
+            'feature_names': list(self.feature_names),
+            'training_metrics': dict(self.training_metrics),
+            'cation_elements': list(self.cation_elements),
+            'anion_elements': list(self.anion_elements)
+        }
+        version = registry.register(components, metadata)
+        if promote:
+            registry.promote(version)
+            self.registry_version = version
+        self.last_registration = {'version': version, 'promoted': bool(promote)}
+        return self.last_registration
+
+    def _try_save_if_improved(self, defer_promotion: bool = False) -> None:
+        """
+        Register the model; promote it only if it beats the active model's R² (read from the index).
+        With defer_promotion the caller promotes a better model later (training job manager).
+        """
         try:
+            registry = get_model_registry()
             current_r2 = self.training_metrics.get('dosage_test_r2', 0)
+            active = registry.active_metadata()
             
-            # If no existing model, save current one
-            if not os.path.exists(self.model_save_path):
-                print(f"[ML] No existing model found, saving current model...")
-                self.save_model(self.model_save_path)
-                return
+            if active is None:
+                print(f"[ML] No active model in registry, promoting current model...")
+                promote = True
+            else:
+                existing_r2 = active.get('training_metrics', {}).get('dosage_test_r2', 0)
+                promote = current_r2 > existing_r2
+                verdict = "better" if promote else "not better"
+                print(f"[ML] Current model {verdict} (R²: {current_r2:.4f} vs {existing_r2:.4f} "
+                      f"for {active['version']})")
             
-            # Try to load existing model metrics to compare
-            try:
-                with open(self.model_save_path, 'rb') as f:
-                    existing_data = pickle.load(f)
-                existing_r2 = existing_data.get('training_metrics', {}).get('dosage_test_r2', 0)
-                
-                # Save if current model is better
-                if current_r2 > existing_r2:
-                    print(f"[ML] Current model better (R²: {current_r2:.4f} vs {existing_r2:.4f}), saving...")
-                    self.save_model(self.model_save_path)
-                else:
-                    print(f"[ML] Current model not better (R²: {current_r2:.4f} vs {existing_r2:.4f}), not saving")
-                    
-            except Exception as e:
-                print(f"[ML] Could not load existing model for comparison: {e}")
-                print(f"   Saving current model anyway...")
-                self.save_model(self.model_save_path)
+            result = self.register_in_registry(registry, source="train_model",
+                                               promote=promote and not defer_promotion)
+            if promote and defer_promotion:
+                result['promotion_pending'] = True
+                print(f"[ML] Registered {result['version']}, promotion pending")
+            elif not promote:
+                print(f"[ML] Registered {result['version']} without promoting")
                 
         except Exception as e:
             print(f"[ML] Error during model saving: {e}")
@@ -1388,8 +1393,8 @@ if __name__ == "__main__":
         optimizer = create_ml_optimizer()
         
         # Create test fertilizers
-        from fertilizer_database import EnhancedFertilizerDatabase
-        db = EnhancedFertilizerDatabase()
+        from fertilizer_database import get_fertilizer_database
+        db = get_fertilizer_database()
         
         test_fertilizers = []
         for name in ['nitrato de calcio', 'nitrato de potasio', 'fosfato monopotasico']:
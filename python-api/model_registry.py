@@ -0,0 +1,264 @@
+# model_registry.py
+"""
+ML Model Registry Module
+Versioned model store: each version is an uncompressed joblib artifact (memory-mappable)
+plus a JSON metadata entry in a shared index, with atomic promote and rollback of the
+active version. Metrics and schema are read from the index without loading any model.
+Index updates hold an exclusive file lock, so the API process, training-job children and
+the auto-train CLI can register and promote concurrently without losing updates. Each
+registration prunes all but the newest keep_versions versions, never the active version
+or one on the rollback history.
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import threading
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, List, Optional, Any, Iterator, Tuple
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+ARTIFACT_NAME = "model.joblib"
+INDEX_NAME = "index.json"
+LOCK_NAME = ".index.lock"
+
+
+class ModelNotFound(KeyError):
+    """Raised for an unknown model version"""
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    return str(value)
+
+
+def _lock_file(lock_file):
+    """Block until this process holds the exclusive lock on an open file"""
+    if fcntl is not None:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        return
+    while True:
+        try:
+            lock_file.seek(0)
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+            return
+        except OSError:
+            # LK_LOCK gives up after ~10 s; keep waiting for the other writer
+            continue
+
+
+def _unlock_file(lock_file):
+    if fcntl is not None:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+    else:
+        lock_file.seek(0)
+        msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class ModelRegistry:
+    """
+    Directory layout:
+        <root>/index.json                 {"active": version, "history": [...], "versions": {version: metadata}}
+        <root>/versions/<version>/model.joblib
+    Every index update is written to a temp file and renamed, so readers never see a partial index,
+    and runs its read-modify-write under <root>/.index.lock, so concurrent writers never lose one.
+    """
+
+    def __init__(self, root_dir: str, keep_versions: int = 20):
+        self.root_dir = root_dir
+        self.keep_versions = keep_versions
+        self.versions_dir = os.path.join(root_dir, "versions")
+        self.index_path = os.path.join(root_dir, INDEX_NAME)
+        self.lock_path = os.path.join(root_dir, LOCK_NAME)
+        self._lock = threading.Lock()
+        os.makedirs(self.versions_dir, exist_ok=True)
+
+    # ------------------------------------------------------------------
+    # INDEX
+    # ------------------------------------------------------------------
+
+    def _read_index(self) -> Dict[str, Any]:
+        if not os.path.exists(self.index_path):
+            return {'active': None, 'history': [], 'versions': {}}
+        with open(self.index_path) as f:
+            return json.load(f)
+
+    def _write_index(self, index: Dict[str, Any]):
+        fd, tmp_path = tempfile.mkstemp(prefix=".index_", suffix=".json", dir=self.root_dir)
+        with os.fdopen(fd, "w") as f:
+            json.dump(index, f, indent=2, default=_json_default)
+        os.replace(tmp_path, self.index_path)
+
+    @contextmanager
+    def _locked_index(self) -> Iterator[Dict[str, Any]]:
+        """Current index, read under the thread and cross-process locks held until the block exits"""
+        with self._lock:
+            with open(self.lock_path, "a+") as lock_file:
+                _lock_file(lock_file)
+                try:
+                    yield self._read_index()
+                finally:
+                    _unlock_file(lock_file)
+
+    # ------------------------------------------------------------------
+    # QUERIES
+    # ------------------------------------------------------------------
+
+    def active_version(self) -> Optional[str]:
+        return self._read_index().get('active')
+
+    def get(self, version: str) -> Dict[str, Any]:
+        metadata = self._read_index()['versions'].get(version)
+        if metadata is None:
+            raise ModelNotFound(version)
+        return metadata
+
+    def active_metadata(self) -> Optional[Dict[str, Any]]:
+        index = self._read_index()
+        active = index.get('active')
+        return index['versions'].get(active) if active else None
+
+    def list_versions(self) -> List[Dict[str, Any]]:
+        """All versions, newest first, flagged with whether they are active"""
+        index = self._read_index()
+        versions = sorted(index['versions'].values(), key=lambda m: m.get('created_at', ''), reverse=True)
+        return [dict(metadata, active=metadata['version'] == index.get('active')) for metadata in versions]
+
+    def previous_version(self) -> Optional[str]:
+        history = self._read_index().get('history', [])
+        return history[-1] if history else None
+
+    # ------------------------------------------------------------------
+    # REGISTER / LOAD
+    # ------------------------------------------------------------------
+
+    def register(self, components: Dict[str, Any], metadata: Dict[str, Any]) -> str:
+        """Store model components under a new version; returns the version id"""
+        import joblib
+
+        version = f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+        staging_dir = tempfile.mkdtemp(prefix=".staging_", dir=self.root_dir)
+        try:
+            artifact_path = os.path.join(staging_dir, ARTIFACT_NAME)
+            # Uncompressed so large arrays can be memory-mapped on load
+            joblib.dump(components, artifact_path)
+            size_bytes = os.path.getsize(artifact_path)
+            os.replace(staging_dir, os.path.join(self.versions_dir, version))
+        except Exception:
+            shutil.rmtree(staging_dir, ignore_errors=True)
+            raise
+
+        entry = dict(metadata)
+        entry.update({
+            'version': version,
+            'created_at': datetime.now().isoformat(),
+            'artifact': os.path.join("versions", version, ARTIFACT_NAME),
+            'artifact_size_bytes': size_bytes
+        })
+        with self._locked_index() as index:
+            index['versions'][version] = entry
+            self._write_index(index)
+
+        print(f"[REGISTRY] Registered model {version} ({size_bytes / 1024:.0f} KB)")
+        self.prune()
+        return version
+
+    def prune(self) -> List[str]:
+        """
+        Delete all but the newest keep_versions versions (0 keeps everything); the active
+        version and every version on the rollback history are always kept
+        """
+        if not self.keep_versions:
+            return []
+        with self._locked_index() as index:
+            newest_first = sorted(index['versions'].values(), key=lambda m: m.get('created_at', ''), reverse=True)
+            kept = {m['version'] for m in newest_first[:self.keep_versions]}
+            kept.add(index.get('active'))
+            kept.update(index.get('history', []))
+            removed = [m['version'] for m in newest_first if m['version'] not in kept]
+            if not removed:
+                return []
+            for version in removed:
+                del index['versions'][version]
+            self._write_index(index)
+
+        # Out of the index first, so no reader resolves a version whose artifact is going away
+        for version in removed:
+            shutil.rmtree(os.path.join(self.versions_dir, version), ignore_errors=True)
+        print(f"[REGISTRY] Pruned {len(removed)} old versions (keeping the newest {self.keep_versions})")
+        return removed
+
+    def load(self, version: Optional[str] = None, mmap: bool = True) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """Load (components, metadata) for a version (default: active)"""
+        import joblib
+
+        version = version or self.active_version()
+        if version is None:
+            raise ModelNotFound("no active model")
+        metadata = self.get(version)
+        artifact_path = os.path.join(self.root_dir, metadata['artifact'])
+        components = joblib.load(artifact_path, mmap_mode='r' if mmap else None)
+        return components, metadata
+
+    # ------------------------------------------------------------------
+    # PROMOTE / ROLLBACK
+    # ------------------------------------------------------------------
+
+    def promote(self, version: str) -> Dict[str, Optional[str]]:
+        """Make a version active; the previously active version goes onto the rollback history"""
+        with self._locked_index() as index:
+            if version not in index['versions']:
+                raise ModelNotFound(version)
+            previous = index.get('active')
+            if previous == version:
+                return {'active': version, 'previous': previous}
+            if previous:
+                index['history'].append(previous)
+            index['active'] = version
+            self._write_index(index)
+        print(f"[REGISTRY] Promoted {version} (previous: {previous})")
+        return {'active': version, 'previous': previous}
+
+    def rollback(self) -> Dict[str, Optional[str]]:
+        """Re-activate the version that was active before the current one"""
+        with self._locked_index() as index:
+            if not index.get('history'):
+                raise ModelNotFound("no previous version to roll back to")
+            previous = index['history'].pop()
+            current = index.get('active')
+            index['active'] = previous
+            self._write_index(index)
+        print(f"[REGISTRY] Rolled back {current} -> {previous}")
+        return {'active': previous, 'previous': current}
+
+
+_registry: Optional[ModelRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_model_registry() -> ModelRegistry:
+    """
+    Process-wide registry rooted at MODEL_REGISTRY_DIR (default saved_models/registry),
+    keeping MODEL_REGISTRY_KEEP_VERSIONS versions (default 20, 0 keeps all)
+    """
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                default_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "saved_models", "registry")
+                _registry = ModelRegistry(os.getenv("MODEL_REGISTRY_DIR", default_dir),
+                                          keep_versions=int(os.getenv("MODEL_REGISTRY_KEEP_VERSIONS", 20)))
+    return _registry
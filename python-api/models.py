@@ -4,7 +4,7 @@ from typing import Dict, List, Optional, Any
 # LINEAR PROGRAMMING MODELS - ADD TO models.py
 # ==============================================================================
 
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 from typing import Dict, List, Optional, Any
 import numpy as np
 from dataclasses import dataclass
@@ -96,17 +96,24 @@ class CalculationSettings(BaseModel):
     crop_phase: str = "General"  # Crop growth phase (e.g., "Vegetative", "Flowering")
 
 class FertilizerComposition(BaseModel):
+    # from_attributes: request models also accept fertilizer_records.FertilizerRecord objects
+    model_config = ConfigDict(from_attributes=True)
+
     cations: Dict[str, float]
     anions: Dict[str, float]
 
 
 class FertilizerChemistry(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
     formula: str
     purity: float
     solubility: float
     is_ph_adjuster: bool
 
 class Fertilizer(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
     name: str
     percentage: float
     molecular_weight: float
@@ -142,6 +149,8 @@ class CalculationStatus(BaseModel):
 # =============================================================================
 
 class FertilizerComposition(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
     cations: Dict[str, float]
     anions: Dict[str, float]
     
@@ -150,6 +159,8 @@ class FertilizerComposition(BaseModel):
         return self.dict()
 
 class FertilizerChemistry(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
     formula: str
     purity: float  
     solubility: float
@@ -160,6 +171,8 @@ class FertilizerChemistry(BaseModel):
         return self.dict()
 
 class Fertilizer(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
     name: str
     percentage: float
     molecular_weight: float
@@ -205,7 +218,7 @@ class CalculationStatus(BaseModel):
 
 class MLModelConfig(BaseModel):
     """Configuration for ML model training and optimization"""
-    model_type: str = "RandomForest"  # Options: "RandomForest", "XGBoost"
+    model_type: str = "RandomForest"  # Options: "RandomForest", "ExtraTrees", "HistGradientBoosting", "GradientBoosting", "XGBoost", "Ridge"
     max_iterations: int = 100
     tolerance: float = 1e-6
     feature_scaling: bool = True
@@ -215,6 +228,20 @@ class MLModelConfig(BaseModel):
     random_state: int = 42
 
 
+class MLBatchScenario(BaseModel):
+    """One nutrient scenario screened by the batch ML endpoint"""
+    target_concentrations: Dict[str, float]
+    water_analysis: Dict[str, float] = {}
+
+
+class MLBatchRequest(BaseModel):
+    """Many scenarios screened against one fertilizer catalog in a single model pass"""
+    fertilizers: List[Fertilizer]
+    scenarios: List[MLBatchScenario]
+    constraints: Optional[Dict[str, Any]] = None
+    refine_balance: bool = False  # Run per-row ionic balance refinement for poorly balanced rows
+
+
 @dataclass
 class LinearProgrammingResultConstrained:
     """Result from linear programming optimization with constraint support"""
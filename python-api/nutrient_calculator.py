@@ -8,13 +8,17 @@ from typing import Dict, List, Any, Optional
 import numpy as np
 from datetime import datetime
 
+from element_registry import (
+    BALANCE_SPECIES, COMPOSITION_ELEMENTS, MICRO_ELEMENTS, MMOL_SPECIES, mg_to_meq, mg_to_mmol, mmol_to_meq
+)
+
 class EnhancedFertilizerCalculator:
     """Enhanced calculator with complete micronutrient support"""
     
     def __init__(self):
         # Import the enhanced database
-        from fertilizer_database import EnhancedFertilizerDatabase
-        self.fertilizer_db = EnhancedFertilizerDatabase()
+        from fertilizer_database import get_fertilizer_database
+        self.fertilizer_db = get_fertilizer_database()
         
         # Import other components
         from verification_analyzer import SolutionVerifier, CostAnalyzer
@@ -35,7 +39,7 @@ class EnhancedFertilizerCalculator:
         """
         print(f"[MICRO] Analyzing micronutrient coverage...")
         
-        micronutrients = ['Fe', 'Mn', 'Zn', 'Cu', 'B', 'Mo']
+        micronutrients = list(MICRO_ELEMENTS)
         
         coverage_analysis = {
             'micronutrients_needed': {},
@@ -101,10 +105,7 @@ class EnhancedFertilizerCalculator:
                                   fertilizer, dosage_mg_l: float):
         """Update remaining nutrients after adding a fertilizer"""
         
-        all_elements = ['Ca', 'K', 'Mg', 'Na', 'NH4', 'N', 'S', 'Cl', 'P', 'HCO3', 
-                       'Fe', 'Mn', 'Zn', 'Cu', 'B', 'Mo']
-        
-        for element in all_elements:
+        for element in COMPOSITION_ELEMENTS:
             cation_content = fertilizer.composition.cations.get(element, 0)
             anion_content = fertilizer.composition.anions.get(element, 0)
             total_content = cation_content + anion_content
@@ -128,66 +129,24 @@ class EnhancedFertilizerCalculator:
     
     def convert_mg_to_mmol(self, mg_l: float, element: str) -> float:
         """Convert mg/L to mmol/L using atomic weights"""
-        atomic_weights = {
-            'Ca': 40.08, 'K': 39.10, 'Mg': 24.31, 'Na': 22.99, 'NH4': 18.04,
-            'N': 14.01, 'S': 32.06, 'Cl': 35.45, 'P': 30.97, 'HCO3': 61.02,
-            'Fe': 55.85, 'Mn': 54.94, 'Zn': 65.38, 'Cu': 63.55, 'B': 10.81, 'Mo': 95.95
-        }
-        
-        if element in atomic_weights and atomic_weights[element] > 0:
-            mmol_l = mg_l / atomic_weights[element]
-            return mmol_l
-        else:
+        if element not in MMOL_SPECIES:
             print(f"[WARNING] Unknown element {element} for mmol conversion")
             return 0.0
+        return mg_to_mmol(mg_l, element)
 
     def convert_mmol_to_meq(self, mmol_l: float, element: str) -> float:
         """Convert mmol/L to meq/L using charge states"""
-        charges = {
-            'Ca': 2, 'K': 1, 'Mg': 2, 'Na': 1, 'NH4': 1,
-            'N': 1, 'S': 2, 'Cl': 1, 'P': 1, 'HCO3': 1,
-            'Fe': 2, 'Mn': 2, 'Zn': 2, 'Cu': 2, 'B': 3, 'Mo': 6
-        }
-        
-        if element in charges:
-            meq_l = mmol_l * charges[element]
-            return meq_l
-        else:
+        if element not in MMOL_SPECIES:
             print(f"[WARNING] Unknown element {element} for meq conversion")
             return 0.0
+        return mmol_to_meq(mmol_l, element)
         
     def convert_mg_to_meq_direct(self, mg_l: float, element: str) -> float:
         """
         Direct conversion from mg/L to meq/L for ionic balance calculations
         Used by linear programming optimizer for precise ionic balance
         """
-        
-        # Molecular weights and valences for conversion
-        element_properties = {
-            'Ca': {'mw': 40.08, 'valence': 2},
-            'K': {'mw': 39.10, 'valence': 1}, 
-            'Mg': {'mw': 24.31, 'valence': 2},
-            'Na': {'mw': 22.99, 'valence': 1},
-            'NH4': {'mw': 18.04, 'valence': 1},
-            'Fe': {'mw': 55.85, 'valence': 2},
-            'Mn': {'mw': 54.94, 'valence': 2},
-            'Zn': {'mw': 65.38, 'valence': 2},
-            'Cu': {'mw': 63.55, 'valence': 2},
-            'NO3': {'mw': 62.00, 'valence': 1},
-            'H2PO4': {'mw': 96.99, 'valence': 1},
-            'SO4': {'mw': 96.06, 'valence': 2},
-            'Cl': {'mw': 35.45, 'valence': 1},
-            'HCO3': {'mw': 61.02, 'valence': 1}
-        }
-        
-        if element not in element_properties:
-            return 0.0
-        
-        props = element_properties[element]
-        mmol_l = mg_l / props['mw']
-        meq_l = mmol_l * props['valence']
-        
-        return meq_l
+        return mg_to_meq(mg_l, element, BALANCE_SPECIES)
 
     def analyze_micronutrient_coverage(self, fertilizers: List, targets: Dict[str, float], 
                                       water: Dict[str, float]) -> Dict[str, Any]:
@@ -196,7 +155,7 @@ class EnhancedFertilizerCalculator:
         """
         print(f"\nANALYZING MICRONUTRIENT COVERAGE")
         
-        micronutrients = ['Fe', 'Mn', 'Zn', 'Cu', 'B', 'Mo']
+        micronutrients = list(MICRO_ELEMENTS)
         coverage_analysis = {
             'micronutrients_needed': {},
             'available_sources': {},
@@ -328,7 +287,7 @@ class EnhancedFertilizerCalculator:
         """
         print(f"[MICRO] Validating micronutrient solution...")
         
-        micronutrients = ['Fe', 'Mn', 'Zn', 'Cu', 'B', 'Mo']
+        micronutrients = list(MICRO_ELEMENTS)
         
         # Define optimal ranges for micronutrients (mg/L)
         optimal_ranges = {
@@ -397,7 +356,7 @@ class EnhancedFertilizerCalculator:
         """
         print(f"\n[SUCCESS] VALIDATING MICRONUTRIENT SOLUTION")
         
-        micronutrients = ['Fe', 'Mn', 'Zn', 'Cu', 'B', 'Mo']
+        micronutrients = list(MICRO_ELEMENTS)
         validation_results = {
             'micronutrient_status': {},
             'safety_warnings': [],
@@ -594,7 +553,7 @@ class EnhancedFertilizerCalculator:
         
         # Step 3: Micronutrients
         print(f"\n[CALC] STEP 2: MICRONUTRIENTS")
-        micronutrients = ['Fe', 'Mn', 'Zn', 'Cu', 'B', 'Mo']
+        micronutrients = list(MICRO_ELEMENTS)
         
         for micro in micronutrients:
             if remaining_nutrients.get(micro, 0) > 0:
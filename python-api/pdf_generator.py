@@ -6,10 +6,16 @@ Professional PDF report generation with Excel-like tables including all micronut
 
 from datetime import datetime
 import os
+import numpy as np
 from typing import Dict, List, Any, Optional
 
 # Import fertilizer database
-from fertilizer_database import EnhancedFertilizerDatabase
+from fertilizer_database import get_fertilizer_database
+from request_context import get_current_context
+from element_registry import (
+    CATION_ELEMENTS, ANION_ELEMENTS, COMPOSITION_ELEMENTS,
+    MACRO_ELEMENTS, MICRO_ELEMENTS, OTHER_ELEMENTS, report_factors
+)
 
 # PDF generation imports
 try:
@@ -25,6 +31,13 @@ except ImportError:
     REPORTLAB_AVAILABLE = False
 
 
+# Summary table columns (ion columns carry their charge suffix)
+SUMMARY_ELEMENTS = ('Ca', 'K', 'Mg', 'Na', 'NH4', 'NO3-', 'N', 'SO4=', 'S', 'Cl-', 'H2PO4-', 'P', 'HCO3-',
+                    'Fe', 'Mn', 'Zn', 'Cu', 'B', 'Mo')
+# Standard atomic weights and meq valences of those columns, from the element registry
+SUMMARY_MOLAR_MASS, SUMMARY_VALENCE = report_factors(tuple(e.rstrip('-=') for e in SUMMARY_ELEMENTS))
+
+
 class EnhancedPDFReportGenerator:
     """Enhanced PDF Report Generator with complete micronutrient support"""
 
@@ -47,12 +60,12 @@ class EnhancedPDFReportGenerator:
             self.styles = None
 
         # Enhanced element lists including micronutrients
-        self.macro_elements = ['N', 'P', 'K', 'Ca', 'Mg', 'S']
-        self.micro_elements = ['Fe', 'Mn', 'Zn', 'Cu', 'B', 'Mo']
+        self.macro_elements = list(MACRO_ELEMENTS)
+        self.micro_elements = list(MICRO_ELEMENTS)
         self.all_elements = self.macro_elements + self.micro_elements
 
         # Additional elements for complete coverage
-        self.other_elements = ['Na', 'NH4', 'Cl', 'HCO3']
+        self.other_elements = list(OTHER_ELEMENTS)
         self.complete_elements = self.all_elements + self.other_elements
 
     def generate_enhanced_pdf(self, calculation_data: Dict[str, Any], filename: str = None) -> str:
@@ -573,26 +586,6 @@ class EnhancedPDFReportGenerator:
 
         return elements
 
-    def _get_molecular_weight(self, element: str) -> float:
-        """Get molecular weight for an element"""
-        molecular_weights = {
-            'Ca': 40.08, 'K': 39.10, 'Mg': 24.31, 'Na': 22.99, 'NH4': 18.04,
-            'N': 14.01, 'S': 32.07, 'Cl': 35.45, 'P': 30.97, 'HCO3': 61.02,
-            'Fe': 55.85, 'Mn': 54.94, 'Zn': 65.38, 'Cu': 63.55, 'B': 10.81,
-            'Mo': 95.94
-        }
-        return molecular_weights.get(element, 0)
-    
-    def _get_valence(self, element: str) -> int:
-        """Get valence for an element"""
-        valences = {
-            'Ca': 2, 'K': 1, 'Mg': 2, 'Na': 1, 'NH4': 1,
-            'N': 1, 'S': 2, 'Cl': 1, 'P': 1, 'HCO3': 1,
-            'Fe': 2, 'Mn': 2, 'Zn': 2, 'Cu': 2, 'B': 3,
-            'Mo': 6
-        }
-        return valences.get(element, 0)
-
     def _create_enhanced_summary_rows(self, calculation_data: Dict) -> List[List]:
         """Create enhanced summary rows with FIXED data access patterns"""
         summary_rows = []
@@ -611,18 +604,7 @@ class EnhancedPDFReportGenerator:
         print(f"Found achieved_concentrations: {len(achieved_concentrations)} nutrients")
 
         # Enhanced element list including micronutrients
-        elements_for_summary = ['Ca', 'K', 'Mg', 'Na', 'NH4', 'NO3-', 'N', 'SO4=', 'S', 'Cl-', 'H2PO4-', 'P', 'HCO3-', 'Fe', 'Mn', 'Zn', 'Cu', 'B', 'Mo']
-
-        # Initialize arrays for summary rows
-        aporte_de_iones_mg_l = []
-        aporte_de_iones_mmol_l = []
-        aporte_de_iones_meq_l = []
-        iones_en_el_agua_mg_l = []
-        iones_en_el_agua_mmol_l = []
-        iones_en_el_agua_meq_l = []
-        iones_en_sonu_final_mg_l = []
-        iones_en_sonu_final_mmol_l = []
-        iones_en_sonu_final_meq_l = []
+        elements_for_summary = SUMMARY_ELEMENTS
 
         # Get fertilizer database for composition lookup
         fertilizer_db = calculation_data.get('fertilizer_database', {})
@@ -634,11 +616,14 @@ class EnhancedPDFReportGenerator:
         # Try to get water data from multiple possible locations
         water_analysis = {}
         
-        # Option 1: From integration metadata or calc results
+        # Option 1: From calc results, the calculation data, or the request context
+        request_context = get_current_context()
         if 'water_analysis' in calc_results:
             water_analysis = calc_results['water_analysis']
-        elif hasattr(self, '_current_water_analysis'):
-            water_analysis = self._current_water_analysis
+        elif calculation_data.get('water_analysis'):
+            water_analysis = calculation_data['water_analysis']
+        elif request_context is not None and request_context.water_analysis:
+            water_analysis = request_context.water_analysis
         else:
             # Default water analysis values (fallback)
             water_analysis = {
@@ -650,65 +635,49 @@ class EnhancedPDFReportGenerator:
 
         print(f"Water analysis: {len(water_analysis)} parameters")
 
+        # Map element names to water analysis keys
+        water_key_mapping = {
+            'Ca': 'ca', 'K': 'k', 'Mg': 'mg', 'Na': 'na', 'NH4': 'nh4', 'N': 'nO3',
+            'S': 'sO4', 'Cl': 'cl', 'P': 'p', 'HCO3': 'hco3', 'Fe': 'fe', 'Mn': 'mn',
+            'Zn': 'zn', 'Cu': 'cu', 'B': 'b', 'Mo': 'mo'
+        }
+
+        contribution_mg = []
+        water_mg = []
+        final_mg = []
         for element in elements_for_summary:
             print(f"Processing element: {element}")
             
             # === FERTILIZER CONTRIBUTIONS ===
             contribution_mg_l = fertilizer_contributions.get(element, 0)
-            
-            # Calculate mmol/L and meq/L for fertilizer contributions
-            molecular_weight = self._get_molecular_weight(element)
-            if molecular_weight > 0:
-                contribution_mmol_l = contribution_mg_l / molecular_weight
-                contribution_meq_l = contribution_mmol_l * self._get_valence(element)
-            else:
-                contribution_mmol_l = contribution_meq_l = 0
-
-            aporte_de_iones_mg_l.append(round(contribution_mg_l, 3))
-            aporte_de_iones_mmol_l.append(round(contribution_mmol_l, 3))
-            aporte_de_iones_meq_l.append(round(contribution_meq_l, 3))
 
             # === WATER CONTRIBUTIONS ===
-            # Map element names to water analysis keys
-            water_key_mapping = {
-                'Ca': 'ca', 'K': 'k', 'Mg': 'mg', 'Na': 'na', 'NH4': 'nh4', 'N': 'nO3',
-                'S': 'sO4', 'Cl': 'cl', 'P': 'p', 'HCO3': 'hco3', 'Fe': 'fe', 'Mn': 'mn',
-                'Zn': 'zn', 'Cu': 'cu', 'B': 'b', 'Mo': 'mo'
-            }
-            
             water_key = water_key_mapping.get(element, element.lower())
             water_mg_l = water_analysis.get(water_key, water_analysis.get(element, 0))
 
-            # Calculate mmol/L and meq/L for water
-            if molecular_weight > 0:
-                water_mmol_l = water_mg_l / molecular_weight
-                water_meq_l = water_mmol_l * self._get_valence(element)
-            else:
-                water_mmol_l = water_meq_l = 0
-
-            iones_en_el_agua_mg_l.append(round(water_mg_l, 3))
-            iones_en_el_agua_mmol_l.append(round(water_mmol_l, 3))
-            iones_en_el_agua_meq_l.append(round(water_meq_l, 3))
-
             # === FINAL SOLUTION ===
             # Use achieved concentrations or calculate as water + fertilizer
             final_mg_l = achieved_concentrations.get(element, water_mg_l + contribution_mg_l)
 
-            # Calculate mmol/L and meq/L for final solution
-            if molecular_weight > 0:
-                final_mmol_l = final_mg_l / molecular_weight
-                final_meq_l = final_mmol_l * self._get_valence(element)
-            else:
-                final_mmol_l = final_meq_l = 0
-
-            iones_en_sonu_final_mg_l.append(round(final_mg_l, 3))
-            iones_en_sonu_final_mmol_l.append(round(final_mmol_l, 3))
-            iones_en_sonu_final_meq_l.append(round(final_meq_l, 3))
+            contribution_mg.append(contribution_mg_l)
+            water_mg.append(water_mg_l)
+            final_mg.append(final_mg_l)
 
             # Debug output for non-zero values
             if contribution_mg_l > 0 or water_mg_l > 0 or final_mg_l > 0:
                 print(f"  {element}: fertilizer={contribution_mg_l:.3f}, water={water_mg_l:.3f}, final={final_mg_l:.3f}")
 
+        # mmol/L and meq/L of the three rows at once: (rows x elements)
+        mg_rows = np.array([contribution_mg, water_mg, final_mg], dtype=float)
+        mmol_rows = mg_rows / SUMMARY_MOLAR_MASS
+        meq_rows = mmol_rows * SUMMARY_VALENCE
+        aporte_de_iones_mg_l, iones_en_el_agua_mg_l, iones_en_sonu_final_mg_l = (
+            [round(value, 3) for value in row] for row in mg_rows.tolist())
+        aporte_de_iones_mmol_l, iones_en_el_agua_mmol_l, iones_en_sonu_final_mmol_l = (
+            [round(value, 3) for value in row] for row in mmol_rows.tolist())
+        aporte_de_iones_meq_l, iones_en_el_agua_meq_l, iones_en_sonu_final_meq_l = (
+            [round(value, 3) for value in row] for row in meq_rows.tolist())
+
         # Filling columns for molecular weight columns (x values)
         filling = ['x', 'x', 'x', 'x', 'x', 'x']
         
@@ -744,8 +713,7 @@ class EnhancedPDFReportGenerator:
         contributions = {}
         
         # Initialize all elements to 0
-        elements = ['Ca', 'K', 'Mg', 'Na', 'NH4', 'NO3-', 'N', 'SO4=', 'S', 'Cl-', 'H2PO4-', 'P', 'HCO3-', 'Fe', 'Mn', 'Zn', 'Cu', 'B', 'Mo']
-        for element in elements:
+        for element in SUMMARY_ELEMENTS:
             contributions[element] = 0.0
         
         print(f"Calculating fertilizer contributions for {len(fertilizer_dosages)} fertilizers")
@@ -781,26 +749,6 @@ class EnhancedPDFReportGenerator:
         
         return contributions
 
-    def _get_molecular_weight(self, element: str) -> float:
-        """Get molecular weight for elements"""
-        molecular_weights = {
-            'Ca': 40.078, 'K': 39.098, 'Mg': 24.305, 'Na': 22.990, 'NH4': 18.038,
-            'NO3-': 62.004, 'N': 14.007, 'SO4=': 96.06, 'S': 32.065, 'Cl-': 35.453,
-            'H2PO4-': 96.987, 'P': 30.974, 'HCO3-': 61.017, 'Fe': 55.845, 'Mn': 54.938,
-            'Zn': 65.38, 'Cu': 63.546, 'B': 10.811, 'Mo': 95.96
-        }
-        return molecular_weights.get(element, 1.0)
-
-    def _get_valence(self, element: str) -> int:
-        """Get valence for elements"""
-        valences = {
-            'Ca': 2, 'K': 1, 'Mg': 2, 'Na': 1, 'NH4': 1,
-            'NO3-': -1, 'N': 0, 'SO4=': -2, 'S': 0, 'Cl-': -1,
-            'H2PO4-': -1, 'P': 0, 'HCO3-': -1, 'Fe': 2, 'Mn': 2,
-            'Zn': 2, 'Cu': 2, 'B': 3, 'Mo': 6
-        }
-        return abs(valences.get(element, 0))  # Return absolute value for meq calculation
-
     def _evaluate_status(self, parameter, deviation):
         deviation_percent = abs(deviation * 100)
 
@@ -818,8 +766,7 @@ class EnhancedPDFReportGenerator:
         if not REPORTLAB_AVAILABLE:
             return
 
-        all_elements = ['Ca', 'K', 'Mg', 'Na', 'NH4', 'N', 'S',
-                        'Cl', 'P', 'HCO3', 'Fe', 'Mn', 'Zn', 'Cu', 'B', 'Mo']
+        all_elements = COMPOSITION_ELEMENTS
         # Map header names to their column indices
         header_row = table._cellvalues[0]
         col_indices = {name: idx for idx, name in enumerate(header_row)}
@@ -1121,8 +1068,7 @@ class EnhancedPDFReportGenerator:
         """Find enhanced fertilizer composition in database"""
         try:
             # Use the proper database method to find fertilizer composition
-            enhanced_db = EnhancedFertilizerDatabase()
-            composition_data = enhanced_db.find_fertilizer_composition(
+            composition_data = get_fertilizer_database().find_fertilizer_composition(
                 fert_name, "")
 
             if composition_data:
@@ -1302,10 +1248,8 @@ class EnhancedPDFReportGenerator:
         else:
             # Default composition
             molecular_weight = 100
-            cations = {elem: 0 for elem in [
-                'Ca', 'K', 'Mg', 'Na', 'NH4', 'Fe', 'Mn', 'Zn', 'Cu']}
-            anions = {elem: 0 for elem in [
-                'N', 'S', 'Cl', 'P', 'HCO3', 'B', 'Mo']}
+            cations = {elem: 0 for elem in CATION_ELEMENTS}
+            anions = {elem: 0 for elem in ANION_ELEMENTS}
             print(f"        Using default composition")
 
         dosage_mg_l = dosage_g_l * 1000
@@ -1840,10 +1784,6 @@ class EnhancedPDFReportGenerator:
                 }
             }
             
-            # Store current context for PDF generation
-            self._current_water_analysis = water_analysis
-            self._current_targets = target_concentrations
-            
             # Generate standard calculation tables
             story.append(Paragraph("DETAILED CALCULATION TABLES", section_style))
             
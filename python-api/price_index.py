@@ -0,0 +1,203 @@
+# price_index.py
+"""
+Price Index Module
+Matches fertilizer names to FertilizerInput prices. The index is built once per catalog
+(same names and prices -> same index) with normalized keys, a synonym table loaded from
+data/price_synonyms.json and a trigram index for names that match nothing exactly.
+Decisions are cached per name and carry their provenance (match type, priced input, score).
+"""
+
+import json
+import os
+import re
+import threading
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Any, Set, Tuple
+
+from fertilizer_matcher import normalize_name
+from lru_table import LRUTable
+
+DEFAULT_SYNONYMS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "price_synonyms.json")
+STOPWORDS = frozenset({'de', 'del', 'la', 'las', 'el', 'los', 'y', 'e', 'of', 'the', 'and'})
+
+
+@dataclass(frozen=True)
+class PriceMatch:
+    price: Optional[float]
+    match_type: str
+    matched_input: Optional[str] = None
+    score: float = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'price': self.price, 'match_type': self.match_type,
+                'matched_input': self.matched_input, 'score': round(self.score, 3)}
+
+
+NO_PRICE = PriceMatch(None, "no_match")
+
+
+def name_tokens(normalized: str) -> Set[str]:
+    return {t for t in re.findall(r"\w+", normalized) if t not in STOPWORDS}
+
+
+def name_trigrams(normalized: str) -> Set[str]:
+    padded = f"  {normalized} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def load_synonyms(path: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Synonym groups [{'product', 'aliases'}] with normalized names"""
+    path = path or os.getenv("PRICE_SYNONYMS_PATH", DEFAULT_SYNONYMS_PATH)
+    with open(path, encoding="utf-8") as f:
+        document = json.load(f)
+    return [{'product': normalize_name(group['product']),
+             'aliases': [normalize_name(alias) for alias in group['aliases']]}
+            for group in document.get('groups', [])]
+
+
+class PriceIndex:
+    """
+    Prices of one catalog's FertilizerInputs. match(name) tries, in order: the exact name,
+    the normalized name (case and accents ignored), the longest synonym alias contained in
+    the name, then the most similar input by token-set / trigram similarity.
+    """
+
+    def __init__(self,
+                 fertilizer_inputs: List[Dict[str, Any]],
+                 synonym_groups: List[Dict[str, Any]],
+                 min_similarity: float = 0.7):
+        self.min_similarity = min_similarity
+        self.exact: Dict[str, float] = {}
+        self.normalized: Dict[str, Tuple[float, str]] = {}
+        self.aliases: Dict[str, Tuple[float, str]] = {}
+        self._inputs: List[Tuple[str, float, Set[str], int]] = []
+        self._trigram_postings: Dict[str, List[int]] = {}
+        self._decisions: Dict[str, PriceMatch] = {}
+
+        for input_data in fertilizer_inputs:
+            name = (input_data.get('name') or '').strip()
+            price = input_data.get('price')
+            if not name or price is None or price <= 0:
+                continue
+            price = float(price)
+            self.exact[name] = price
+            normalized = normalize_name(name)
+            self.normalized.setdefault(normalized, (price, name))
+
+            # First synonym group whose product appears in the name prices all its aliases (cheapest wins)
+            for group in synonym_groups:
+                if group['product'] in normalized:
+                    for alias in group['aliases']:
+                        if alias not in self.aliases or price < self.aliases[alias][0]:
+                            self.aliases[alias] = (price, name)
+                    break
+
+            trigrams = name_trigrams(normalized)
+            position = len(self._inputs)
+            self._inputs.append((name, price, name_tokens(normalized), len(trigrams)))
+            for trigram in trigrams:
+                self._trigram_postings.setdefault(trigram, []).append(position)
+
+        # Longest alias first, so the first contained alias is the most specific one
+        self._alias_order = sorted(self.aliases, key=len, reverse=True)
+
+    def match(self, fertilizer_name: str) -> PriceMatch:
+        decision = self._decisions.get(fertilizer_name)
+        if decision is None:
+            decision = self._decide(fertilizer_name)
+            self._decisions[fertilizer_name] = decision
+        return decision
+
+    def _decide(self, fertilizer_name: str) -> PriceMatch:
+        if fertilizer_name in self.exact:
+            return PriceMatch(self.exact[fertilizer_name], "exact_match", fertilizer_name, 1.0)
+
+        normalized = normalize_name(fertilizer_name)
+        if normalized in self.normalized:
+            price, source = self.normalized[normalized]
+            return PriceMatch(price, "case_insensitive_match", source, 1.0)
+
+        for alias in self._alias_order:
+            if alias in normalized:
+                price, source = self.aliases[alias]
+                return PriceMatch(price, f"keyword_match:{alias}", source, 1.0)
+
+        return self._similar(normalized)
+
+    def _similar(self, normalized: str) -> PriceMatch:
+        trigrams = name_trigrams(normalized)
+        shared = Counter(position for trigram in trigrams
+                         for position in self._trigram_postings.get(trigram, ()))
+        if not shared:
+            return NO_PRICE
+
+        tokens = name_tokens(normalized)
+        best: Optional[Tuple[float, int]] = None
+        for position, common in shared.items():
+            name, price, input_tokens, trigram_count = self._inputs[position]
+            trigram_similarity = common / (len(trigrams) + trigram_count - common)
+            token_similarity = (2 * len(tokens & input_tokens) / (len(tokens) + len(input_tokens))
+                                if tokens and input_tokens else 0.0)
+            score = max(trigram_similarity, token_similarity)
+            if best is None or score > best[0] or (score == best[0] and position < best[1]):
+                best = (score, position)
+
+        score, position = best
+        if score < self.min_similarity:
+            return NO_PRICE
+        name, price, _, _ = self._inputs[position]
+        return PriceMatch(price, "fuzzy_match", name, score)
+
+    def stats(self) -> Dict[str, Any]:
+        return {'inputs': len(self._inputs), 'exact_mappings': len(self.exact),
+                'keyword_mappings': len(self.aliases), 'cached_decisions': len(self._decisions)}
+
+
+# ------------------------------------------------------------------
+# PER-CATALOG CACHE
+# ------------------------------------------------------------------
+
+class PriceIndexCache:
+    """Indexes keyed by the catalog's (name, price) pairs, least recently used evicted"""
+
+    def __init__(self, max_catalogs: int = 32, min_similarity: float = 0.7,
+                 synonyms_path: Optional[str] = None):
+        self.max_catalogs = max_catalogs
+        self.min_similarity = min_similarity
+        self.synonym_groups = load_synonyms(synonyms_path)
+        self._indexes = LRUTable(max_catalogs)
+
+    def get(self, fertilizer_inputs: List[Dict[str, Any]]) -> PriceIndex:
+        key = tuple((str(i.get('name') or ''), i.get('price')) for i in fertilizer_inputs)
+        return self._indexes.get_or_build(key, lambda: self._build(fertilizer_inputs))
+
+    def _build(self, fertilizer_inputs: List[Dict[str, Any]]) -> PriceIndex:
+        index = PriceIndex(fertilizer_inputs, self.synonym_groups, self.min_similarity)
+        print(f"[PRICE] Price index built: {len(index.exact)} priced inputs, "
+              f"{len(index.aliases)} synonym keys")
+        return index
+
+    def stats(self) -> Dict[str, Any]:
+        return dict(self._indexes.stats(), min_similarity=self.min_similarity)
+
+
+_cache: Optional[PriceIndexCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_price_index_cache() -> PriceIndexCache:
+    """Process-wide cache (PRICE_INDEX_MAX_CATALOGS, PRICE_MATCH_MIN_SIMILARITY, PRICE_SYNONYMS_PATH)"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = PriceIndexCache(
+                    max_catalogs=int(os.getenv("PRICE_INDEX_MAX_CATALOGS", 32)),
+                    min_similarity=float(os.getenv("PRICE_MATCH_MIN_SIMILARITY", 0.7)))
+    return _cache
+
+
+def get_price_index(fertilizer_inputs: List[Dict[str, Any]]) -> PriceIndex:
+    """Shared per-catalog index of these FertilizerInputs"""
+    return get_price_index_cache().get(fertilizer_inputs)
@@ -0,0 +1,285 @@
+# recipe_index.py
+"""
+Recipe Index Module
+Nearest-neighbour retrieval over past LP solutions, one KD-tree per fertilizer catalog.
+A request close to a solved recipe gets that recipe rescaled to its own targets; if the
+predicted deviation is within tolerance of what the LP achieved for the neighbour, it is
+the answer, otherwise it warm-starts the LP.
+New solutions arrive from the solution log's writer thread and are indexed incrementally;
+recipes of segments the log's retention deletes are dropped, so the index never holds
+more than the log keeps on disk.
+"""
+
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Any
+
+import numpy as np
+
+from ml_features import FEATURE_ELEMENTS
+
+RECIPE_ELEMENTS = list(FEATURE_ELEMENTS)
+
+
+def recipe_vector(targets: Dict[str, float], water: Dict[str, float]) -> np.ndarray:
+    """Raw (targets, water) vector over RECIPE_ELEMENTS"""
+    return np.array([targets.get(e, 0.0) for e in RECIPE_ELEMENTS] +
+                    [water.get(e, 0.0) for e in RECIPE_ELEMENTS], dtype=np.float64)
+
+
+class CatalogRecipes:
+    """
+    Solved recipes of one catalog. Vectors are standardized with the statistics of the
+    last tree build; recipes added since then sit in a small tail searched by brute
+    force until the tail is large enough to be worth a rebuild.
+    """
+
+    def __init__(self, min_rebuild: int = 32, rebuild_fraction: float = 0.1, max_tail: int = 2000):
+        self.min_rebuild = min_rebuild
+        self.rebuild_fraction = rebuild_fraction
+        self.max_tail = max_tail
+        self.vectors: List[np.ndarray] = []
+        self.dosages: List[Dict[str, float]] = []
+        self.deviations: List[Dict[str, float]] = []
+        self.record_ids: List[str] = []
+        self.segments: List[Optional[str]] = []
+        self._known_ids = set()
+        self.rebuilds = 0
+        self._reset_tree()
+
+    def _reset_tree(self):
+        self._tree = None
+        self._indexed = 0
+        self._mean = None
+        self._scale = None
+        self._tail = np.zeros((0, 2 * len(RECIPE_ELEMENTS)))
+
+    def __len__(self) -> int:
+        return len(self.vectors)
+
+    def add(self, vector: np.ndarray, dosages: Dict[str, float], deviations: Dict[str, float],
+            record_id: str, segment: Optional[str] = None):
+        if record_id in self._known_ids:
+            # Written while the log was being loaded: seen by both the loader and the listener
+            return
+        self._known_ids.add(record_id)
+        self.vectors.append(vector)
+        self.dosages.append(dosages)
+        self.deviations.append(deviations)
+        self.record_ids.append(record_id)
+        self.segments.append(segment)
+        tail_size = len(self.vectors) - self._indexed
+        if tail_size >= min(self.max_tail, max(self.min_rebuild, self.rebuild_fraction * self._indexed)):
+            self.rebuild()
+        elif self._mean is not None:
+            self._tail = np.vstack([self._tail, self._normalize(vector[None, :])])
+
+    def remove_segments(self, segments: set) -> int:
+        """Drop the recipes logged in the given segments; returns how many were dropped"""
+        keep = [i for i, segment in enumerate(self.segments) if segment not in segments]
+        removed = len(self.vectors) - len(keep)
+        if not removed:
+            return 0
+        for name in ('vectors', 'dosages', 'deviations', 'record_ids', 'segments'):
+            values = getattr(self, name)
+            setattr(self, name, [values[i] for i in keep])
+        self._known_ids = set(self.record_ids)
+        self._reset_tree()
+        if len(self.vectors) >= self.min_rebuild:
+            self.rebuild()
+        return removed
+
+    def rebuild(self):
+        from sklearn.neighbors import KDTree
+
+        data = np.vstack(self.vectors)
+        self._mean = data.mean(axis=0)
+        std = data.std(axis=0)
+        self._scale = np.where(std > 1e-9, std, 1.0)
+        self._tree = KDTree(self._normalize(data))
+        self._indexed = len(data)
+        self._tail = np.zeros((0, data.shape[1]))
+        self.rebuilds += 1
+
+    def _normalize(self, data: np.ndarray) -> np.ndarray:
+        return (data - self._mean) / self._scale
+
+    def nearest(self, vector: np.ndarray) -> Optional[Dict[str, Any]]:
+        """Closest stored recipe as {'index', 'distance'} (standardized Euclidean distance)"""
+        if not self.vectors:
+            return None
+        if self._tree is None:
+            # Fewer recipes than one rebuild batch: brute force on raw vectors
+            distances = np.linalg.norm(np.vstack(self.vectors) - vector, axis=1)
+            best = int(np.argmin(distances))
+            return {'index': best, 'distance': float(distances[best])}
+
+        query = self._normalize(vector[None, :])
+        distance, index = self._tree.query(query, k=1)
+        best, best_distance = int(index[0, 0]), float(distance[0, 0])
+        if len(self._tail):
+            tail_distances = np.linalg.norm(self._tail - query, axis=1)
+            tail_best = int(np.argmin(tail_distances))
+            if tail_distances[tail_best] < best_distance:
+                best, best_distance = self._indexed + tail_best, float(tail_distances[tail_best])
+        return {'index': best, 'distance': best_distance}
+
+
+class RecipeIndex:
+    """Catalog hash -> CatalogRecipes, fed from a SolutionLog"""
+
+    def __init__(self, solution_log=None, tolerance_percent: float = 2.0,
+                 min_rebuild: int = 32, rebuild_fraction: float = 0.1):
+        self.solution_log = solution_log
+        self.tolerance_percent = tolerance_percent
+        self.min_rebuild = min_rebuild
+        self.rebuild_fraction = rebuild_fraction
+        self.lookups = 0
+        self.instant_answers = 0
+        self._catalogs: Dict[str, CatalogRecipes] = {}
+        self._lock = threading.RLock()
+        self._loaded = solution_log is None
+        if solution_log is not None:
+            solution_log.add_listener(self.add_record)
+            solution_log.add_retention_listener(self.remove_segments)
+
+    # ------------------------------------------------------------------
+    # INDEXING
+    # ------------------------------------------------------------------
+
+    def add_record(self, record: Dict[str, Any], segment: Optional[str] = None):
+        """Index one logged solution (called on the solution log writer thread)"""
+        if record.get('status') != 'Optimal' or not record.get('dosages') or not record.get('catalog_hash'):
+            return
+        with self._lock:
+            catalog = self._catalogs.get(record['catalog_hash'])
+            if catalog is None:
+                catalog = self._catalogs[record['catalog_hash']] = CatalogRecipes(
+                    self.min_rebuild, self.rebuild_fraction)
+            catalog.add(recipe_vector(record['targets'], record['water']), record['dosages'],
+                        record.get('deviations_percent') or {}, record['record_id'], segment)
+
+    def remove_segments(self, segments: List[str]):
+        """Forget the recipes of solution log segments deleted by retention"""
+        segments = set(segments)
+        with self._lock:
+            removed = 0
+            for key in list(self._catalogs):
+                removed += self._catalogs[key].remove_segments(segments)
+                if not len(self._catalogs[key]):
+                    del self._catalogs[key]
+        if removed:
+            print(f"[RECIPES] Dropped {removed} recipes of {len(segments)} expired log segments")
+
+    def ensure_loaded(self):
+        """Index every solution already on disk (once, on first use)"""
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            start = time.perf_counter()
+            count = 0
+            for segment, records in self.solution_log.iter_segments():
+                for record in records:
+                    self.add_record(record, segment)
+                    count += 1
+            self._loaded = True
+        print(f"[RECIPES] Indexed {count} logged solutions across {len(self._catalogs)} catalogs "
+              f"({time.perf_counter() - start:.2f}s)")
+
+    # ------------------------------------------------------------------
+    # LOOKUP
+    # ------------------------------------------------------------------
+
+    def lookup(self,
+               catalog_hash: str,
+               fertilizer_names: List[str],
+               nutrients: List[str],
+               contribution: np.ndarray,
+               targets: Dict[str, float],
+               water: Dict[str, float],
+               fit_targets: Optional[Dict[str, float]] = None) -> Optional[Dict[str, Any]]:
+        """
+        Nearest recipe of the catalog rescaled to these targets. contribution is the
+        (nutrients x fertilizers) mg/L per g/L matrix of the request's fertilizers.
+        The single scale factor minimizes the squared relative deviation over the
+        targeted nutrients (fit_targets, e.g. after safety caps; default targets);
+        predicted deviations follow from the same linear model. The recipe is accepted as
+        is when its worst deviation exceeds the neighbour's own (the LP optimum for an almost
+        identical request) by at most tolerance_percent points.
+        """
+        start = time.perf_counter()
+        self.ensure_loaded()
+        with self._lock:
+            catalog = self._catalogs.get(catalog_hash)
+            match = catalog.nearest(recipe_vector(targets, water)) if catalog is not None else None
+            if match is None:
+                return None
+            neighbour_dosages = catalog.dosages[match['index']]
+            neighbour_deviations = catalog.deviations[match['index']]
+            record_id = catalog.record_ids[match['index']]
+            candidates = len(catalog)
+        self.lookups += 1
+
+        dosages = np.array([neighbour_dosages.get(name, 0.0) for name in fertilizer_names])
+        fit_targets = fit_targets if fit_targets is not None else targets
+        target = np.array([fit_targets.get(n, 0.0) for n in nutrients])
+        base = np.array([water.get(n, 0.0) for n in nutrients])
+        supplied = contribution @ dosages
+
+        targeted = target > 0
+        weight = np.zeros_like(target)
+        weight[targeted] = 1.0 / target[targeted] ** 2
+        denominator = float(np.sum(weight * supplied ** 2))
+        scale = max(0.0, float(np.sum(weight * supplied * (target - base))) / denominator) if denominator > 0 else 1.0
+
+        achieved = base + scale * supplied
+        deviations = np.zeros_like(target)
+        deviations[targeted] = (achieved[targeted] - target[targeted]) / target[targeted] * 100.0
+        predicted_max = float(np.max(np.abs(deviations))) if targeted.any() else 0.0
+        neighbour_max = max([abs(neighbour_deviations.get(n, 0.0))
+                             for n, t in zip(nutrients, targeted) if t] or [0.0])
+        within = predicted_max <= neighbour_max + self.tolerance_percent
+        if within:
+            self.instant_answers += 1
+
+        return {
+            'dosages': {name: float(d * scale) for name, d in zip(fertilizer_names, dosages) if d > 0},
+            'scale': scale,
+            'distance': match['distance'],
+            'neighbour_record_id': record_id,
+            'candidates': candidates,
+            'predicted_deviations_percent': {n: float(d) for n, d, t in zip(nutrients, deviations, targeted) if t},
+            'predicted_max_deviation_percent': predicted_max,
+            'neighbour_max_deviation_percent': neighbour_max,
+            'tolerance_percent': self.tolerance_percent,
+            'within_tolerance': within,
+            'lookup_seconds': round(time.perf_counter() - start, 6)
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            catalogs = {h[:12]: {'recipes': len(c), 'rebuilds': c.rebuilds} for h, c in self._catalogs.items()}
+        return {
+            'loaded': self._loaded,
+            'catalogs': len(catalogs),
+            'recipes': sum(c['recipes'] for c in catalogs.values()),
+            'tolerance_percent': self.tolerance_percent,
+            'lookups': self.lookups,
+            'instant_answers': self.instant_answers,
+            'per_catalog': catalogs
+        }
+
+
+def create_recipe_index_from_env(solution_log) -> Optional[RecipeIndex]:
+    """Build the index from RECIPE_INDEX_* environment variables (None without a solution log)"""
+    if solution_log is None or os.getenv("RECIPE_INDEX_ENABLED", "true").lower() in ("0", "false", "no"):
+        return None
+    return RecipeIndex(
+        solution_log,
+        tolerance_percent=float(os.getenv("RECIPE_INDEX_TOLERANCE_PERCENT", 2.0)),
+        min_rebuild=int(os.getenv("RECIPE_INDEX_MIN_REBUILD", 32)),
+        rebuild_fraction=float(os.getenv("RECIPE_INDEX_REBUILD_FRACTION", 0.1))
+    )
@@ -0,0 +1,97 @@
+# request_context.py
+"""
+Request Context Module
+Request-scoped mutable state for calculations plus a lock-protected holder for
+shared components that must be replaced (never mutated) while requests are in flight
+"""
+
+import contextvars
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Any, Generic, TypeVar
+
+T = TypeVar('T')
+
+_current_context: contextvars.ContextVar = contextvars.ContextVar('calculation_context', default=None)
+
+
+@dataclass
+class CalculationContext:
+    """
+    Mutable state belonging to exactly one calculation. Shared components (optimizer,
+    verifier, PDF generator) receive what they need from here instead of storing it on self.
+    """
+    request_id: str = field(default_factory=lambda: uuid.uuid4().hex[:12])
+    started_at: float = field(default_factory=time.time)
+    water_analysis: Dict[str, float] = field(default_factory=dict)
+    water_analysis_original: Dict[str, float] = field(default_factory=dict)
+    target_concentrations: Dict[str, float] = field(default_factory=dict)
+    volume_liters: float = 1000.0
+    method: str = "linear_programming"
+    warnings: List[str] = field(default_factory=list)
+    timings: Dict[str, float] = field(default_factory=dict)
+
+    @contextmanager
+    def timed(self, stage: str):
+        """Accumulate wall time for a named stage of this calculation"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[stage] = self.timings.get(stage, 0.0) + time.perf_counter() - start
+
+    def elapsed_seconds(self) -> float:
+        return time.time() - self.started_at
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            'request_id': self.request_id,
+            'method': self.method,
+            'elapsed_seconds': round(self.elapsed_seconds(), 4),
+            'timings': {stage: round(seconds, 4) for stage, seconds in self.timings.items()},
+            'warnings': list(self.warnings)
+        }
+
+
+@contextmanager
+def calculation_context(**values):
+    """Bind a new CalculationContext to the current task/thread for the duration of the block"""
+    context = CalculationContext(**values)
+    token = _current_context.set(context)
+    try:
+        yield context
+    finally:
+        _current_context.reset(token)
+
+
+def get_current_context() -> Optional[CalculationContext]:
+    """Context bound to the running calculation, or None outside of one"""
+    return _current_context.get()
+
+
+class ComponentHolder(Generic[T]):
+    """
+    Holds a shared component that is only ever replaced as a whole. Readers grab the
+    current instance once and keep using it even if a swap happens mid-request.
+    """
+
+    def __init__(self, component: T):
+        self._component = component
+        self._lock = threading.RLock()
+
+    def get(self) -> T:
+        return self._component
+
+    def swap(self, component: T) -> T:
+        """Install a fully prepared component; returns the previous one"""
+        with self._lock:
+            previous = self._component
+            self._component = component
+            return previous
+
+    @property
+    def lock(self) -> threading.RLock:
+        return self._lock
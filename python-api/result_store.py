@@ -0,0 +1,258 @@
+# result_store.py
+"""
+Persistent Result Store Module
+Stores finished calculations in SQLite keyed by a canonical fingerprint of the inputs,
+so repeated requests (page refresh, PDF re-download) return immediately
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Any, Optional, Iterable, Iterator
+
+from metrics import CACHE_REQUESTS
+
+
+class ResultStore:
+    """
+    Idempotent calculation result store backed by SQLite with size and age eviction
+    """
+
+    def __init__(self,
+                 db_path: str = "result_store.sqlite3",
+                 max_entries: int = 500,
+                 max_bytes: int = 200 * 1024 * 1024,
+                 max_age_seconds: float = 24 * 3600):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        db_dir = os.path.dirname(os.path.abspath(db_path))
+        os.makedirs(db_dir, exist_ok=True)
+
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS results (
+                    fingerprint TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    response TEXT NOT NULL,
+                    pdf_path TEXT,
+                    size_bytes INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_results_last_access ON results(last_access)")
+
+        print(f"[STORE] Result store ready: {db_path} "
+              f"(max {max_entries} entries, {max_bytes / (1024 * 1024):.0f} MB, {max_age_seconds / 3600:.1f} h)")
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """Connection for one transaction: committed (or rolled back) and always closed"""
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    # ------------------------------------------------------------------
+    # FINGERPRINTING
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def canonicalize(value: Any) -> Any:
+        """Normalize a payload so equivalent inputs serialize identically"""
+        if hasattr(value, 'model_dump'):
+            value = value.model_dump()
+        elif hasattr(value, 'dict') and not isinstance(value, dict):
+            value = value.dict()
+        elif hasattr(value, 'to_dict'):
+            value = value.to_dict()
+
+        if isinstance(value, dict):
+            return {str(k): ResultStore.canonicalize(v) for k, v in sorted(value.items(), key=lambda kv: str(kv[0]))}
+        if isinstance(value, (list, tuple)):
+            return [ResultStore.canonicalize(v) for v in value]
+        if isinstance(value, bool) or value is None or isinstance(value, str):
+            return value
+        if isinstance(value, (int, float)):
+            # Round so float noise from upstream (e.g. 1.0000000001) does not split the cache
+            return round(float(value), 6)
+        try:
+            return round(float(value), 6)
+        except (TypeError, ValueError):
+            return str(value)
+
+    @staticmethod
+    def content_hash(value: Any) -> str:
+        """SHA-256 of the canonical JSON form of any payload"""
+        canonical = json.dumps(ResultStore.canonicalize(value), sort_keys=True, separators=(',', ':'))
+        return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+    def fingerprint(self, kind: str, **inputs) -> str:
+        """Fingerprint of a calculation: kind plus every input that affects the result"""
+        return self.content_hash({'kind': kind, 'inputs': inputs})
+
+    @staticmethod
+    def etag_for(fingerprint: str) -> str:
+        return f'"{fingerprint}"'
+
+    @staticmethod
+    def etag_matches(if_none_match: Optional[str], fingerprint: str) -> bool:
+        """Evaluate an If-None-Match header (supports lists, weak tags and '*')"""
+        if not if_none_match:
+            return False
+        for tag in if_none_match.split(','):
+            tag = tag.strip()
+            if tag == '*':
+                return True
+            if tag.startswith('W/'):
+                tag = tag[2:]
+            if tag.strip('"') == fingerprint:
+                return True
+        return False
+
+    # ------------------------------------------------------------------
+    # STORAGE
+    # ------------------------------------------------------------------
+
+    def get(self, fingerprint: str) -> Optional[Dict[str, Any]]:
+        """Return the stored entry for a fingerprint, or None if missing/expired"""
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            row = conn.execute(
+                "SELECT response, pdf_path, created_at FROM results WHERE fingerprint = ?",
+                (fingerprint,)
+            ).fetchone()
+
+            if row is None:
+                self.misses += 1
+                CACHE_REQUESTS.inc(cache="result_store", result="miss")
+                return None
+
+            response_json, pdf_path, created_at = row
+            if self.max_age_seconds and now - created_at > self.max_age_seconds:
+                self._delete(conn, [(fingerprint, pdf_path)])
+                self.misses += 1
+                CACHE_REQUESTS.inc(cache="result_store", result="miss")
+                return None
+
+            conn.execute("UPDATE results SET last_access = ? WHERE fingerprint = ?", (now, fingerprint))
+
+        self.hits += 1
+        CACHE_REQUESTS.inc(cache="result_store", result="hit")
+        return {
+            'fingerprint': fingerprint,
+            'etag': self.etag_for(fingerprint),
+            'response': json.loads(response_json),
+            'pdf_path': pdf_path if pdf_path and os.path.exists(pdf_path) else None,
+            'created_at': created_at
+        }
+
+    def put(self, fingerprint: str, kind: str, response: Dict[str, Any], pdf_path: Optional[str] = None):
+        """Store a JSON-serializable response (and optional PDF reference), then evict"""
+        response_json = json.dumps(response, default=str)
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            # A recomputed entry replaces the old row; its PDF would be left behind with no owner
+            replaced = conn.execute("SELECT fingerprint, pdf_path FROM results WHERE fingerprint = ? "
+                                    "AND pdf_path IS NOT NULL AND pdf_path IS NOT ?",
+                                    (fingerprint, pdf_path)).fetchall()
+            conn.execute(
+                "INSERT OR REPLACE INTO results "
+                "(fingerprint, kind, response, pdf_path, size_bytes, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (fingerprint, kind, response_json, pdf_path, len(response_json), now, now)
+            )
+            self._remove_pdfs(replaced)
+            self._evict(conn, now)
+
+    def _evict(self, conn: sqlite3.Connection, now: float):
+        """Drop expired entries, then least-recently-used entries until within count and size limits"""
+        doomed = []
+        if self.max_age_seconds:
+            doomed.extend(conn.execute(
+                "SELECT fingerprint, pdf_path FROM results WHERE created_at < ?",
+                (now - self.max_age_seconds,)
+            ).fetchall())
+            self._delete(conn, doomed)
+
+        count, total_bytes = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size_bytes), 0) FROM results").fetchone()
+        if count <= self.max_entries and total_bytes <= self.max_bytes:
+            if doomed:
+                print(f"[STORE] Evicted {len(doomed)} expired results")
+            return
+
+        lru = []
+        for fingerprint, pdf_path, size_bytes in conn.execute(
+                "SELECT fingerprint, pdf_path, size_bytes FROM results ORDER BY last_access ASC"):
+            if count <= self.max_entries and total_bytes <= self.max_bytes:
+                break
+            lru.append((fingerprint, pdf_path))
+            count -= 1
+            total_bytes -= size_bytes
+        self._delete(conn, lru)
+        print(f"[STORE] Evicted {len(doomed)} expired and {len(lru)} least-recently-used results")
+
+    def _delete(self, conn: sqlite3.Connection, entries: Iterable):
+        entries = list(entries)
+        if not entries:
+            return
+        conn.executemany("DELETE FROM results WHERE fingerprint = ?", [(fp,) for fp, _ in entries])
+        self._remove_pdfs(entries)
+
+    @staticmethod
+    def _remove_pdfs(entries: Iterable):
+        for _, pdf_path in entries:
+            if pdf_path and os.path.exists(pdf_path):
+                try:
+                    os.remove(pdf_path)
+                except OSError as e:
+                    print(f"[STORE] Could not remove evicted PDF {pdf_path}: {e}")
+
+    def clear(self) -> int:
+        """Remove every stored result; returns how many were removed"""
+        with self._lock, self._connect() as conn:
+            entries = conn.execute("SELECT fingerprint, pdf_path FROM results").fetchall()
+            self._delete(conn, entries)
+        return len(entries)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock, self._connect() as conn:
+            count, total_bytes = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size_bytes), 0) FROM results").fetchone()
+        lookups = self.hits + self.misses
+        return {
+            'entries': count,
+            'size_bytes': total_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+            'max_entries': self.max_entries,
+            'max_bytes': self.max_bytes,
+            'max_age_seconds': self.max_age_seconds
+        }
+
+
+def create_result_store_from_env() -> Optional[ResultStore]:
+    """Build the store from RESULT_STORE_* environment variables (None when disabled)"""
+    if os.getenv("RESULT_STORE_ENABLED", "true").lower() in ("0", "false", "no"):
+        print("[STORE] Result store disabled")
+        return None
+    return ResultStore(
+        db_path=os.getenv("RESULT_STORE_PATH", "reports/result_store.sqlite3"),
+        max_entries=int(os.getenv("RESULT_STORE_MAX_ENTRIES", 500)),
+        max_bytes=int(float(os.getenv("RESULT_STORE_MAX_MB", 200)) * 1024 * 1024),
+        max_age_seconds=float(os.getenv("RESULT_STORE_MAX_AGE_HOURS", 24)) * 3600
+    )
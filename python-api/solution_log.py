@@ -0,0 +1,328 @@
+# solution_log.py
+"""
+Solution Log Module
+Append-only local dataset of production LP solutions (catalog hash, targets, water,
+dosages, deviations). Records are queued by the calculation path and written by a
+background thread, so logging never adds disk I/O to a request. Catalog hashes reuse the
+canonical form of each fertilizer seen before, so hashing a catalog is cheap enough for
+the request path (recipe lookups). Segments roll over by day and by size; whole segments
+are deleted once older than max_age_seconds or beyond max_total_bytes, and retention
+listeners (the recipe index) drop what they hold from them.
+"""
+
+import glob
+import hashlib
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Any, Iterator, Tuple
+
+from lru_table import LRUTable
+from result_store import ResultStore
+
+SEGMENT_PATTERN = "solutions-*.jsonl"
+SEGMENT_PREFIX = "solutions-"
+CATALOG_FILE = "catalogs.jsonl"
+
+# Canonical JSON of each fertilizer, keyed by its field values
+_fertilizer_fragments = LRUTable(int(os.getenv("CATALOG_HASH_CACHE_MAX_ENTRIES", 20000)))
+
+
+def _canonical_json(fertilizer: Any) -> str:
+    return json.dumps(ResultStore.canonicalize(fertilizer), sort_keys=True, separators=(',', ':'))
+
+
+def _fertilizer_key(fertilizer: Any) -> Tuple:
+    """Every field of a Fertilizer / FertilizerRecord, as a hashable tuple"""
+    chemistry, composition = fertilizer.chemistry, fertilizer.composition
+    return (fertilizer.name, fertilizer.percentage, fertilizer.molecular_weight, fertilizer.salt_weight,
+            fertilizer.density, chemistry.formula, chemistry.purity, chemistry.solubility,
+            chemistry.is_ph_adjuster, tuple(composition.cations.items()), tuple(composition.anions.items()))
+
+
+def _segment_order(path: str) -> Tuple[str, int]:
+    """(day, sequence) of a segment: solutions-YYYYMMDD.jsonl is the day's first, -NNN its rollovers"""
+    stem = os.path.basename(path)[len(SEGMENT_PREFIX):-len(".jsonl")]
+    day, _, sequence = stem.partition("-")
+    return day, int(sequence) if sequence.isdigit() else 0
+
+
+def catalog_hash(fertilizers: List) -> str:
+    """Same value as ResultStore.content_hash(fertilizers); each distinct fertilizer is canonicalized once"""
+    parts = []
+    for fertilizer in fertilizers:
+        try:
+            key = _fertilizer_key(fertilizer)
+        except AttributeError:
+            parts.append(_canonical_json(fertilizer))
+            continue
+        # The list's canonical JSON is the comma-joined JSON of its items
+        parts.append(_fertilizer_fragments.get_or_build(key, lambda f=fertilizer: _canonical_json(f)))
+    return hashlib.sha256(("[" + ",".join(parts) + "]").encode('utf-8')).hexdigest()
+
+
+class SolutionLog:
+    """
+    Directory layout:
+        <dir>/solutions-YYYYMMDD.jsonl       one JSON record per solved calculation
+        <dir>/solutions-YYYYMMDD-NNN.jsonl   the same day's segments after max_segment_bytes
+        <dir>/catalogs.jsonl                 one entry per distinct fertilizer catalog (by content hash)
+    Retention (0 disables a limit) runs on the writer thread and never deletes the segment being written.
+    """
+
+    def __init__(self, directory: str = "reports/solution_log", max_queue: int = 10000,
+                 max_segment_bytes: int = 64 * 1024 * 1024,
+                 max_total_bytes: int = 1024 * 1024 * 1024,
+                 max_age_seconds: float = 90 * 24 * 3600,
+                 retention_interval_seconds: float = 60.0):
+        self.directory = directory
+        self.max_segment_bytes = max_segment_bytes
+        self.max_total_bytes = max_total_bytes
+        self.max_age_seconds = max_age_seconds
+        self.retention_interval_seconds = retention_interval_seconds
+        self.written = 0
+        self.dropped = 0
+        self.segments_removed = 0
+        self._segment: Optional[str] = None
+        self._last_retention = 0.0
+        self._queue: "queue.Queue[Dict[str, Any]]" = queue.Queue(maxsize=max_queue)
+        self._writer: Optional[threading.Thread] = None
+        self._writer_lock = threading.Lock()
+        self._listeners: List[Callable[[Dict[str, Any], str], None]] = []
+        self._retention_listeners: List[Callable[[List[str]], None]] = []
+        os.makedirs(directory, exist_ok=True)
+        self._known_catalogs = {entry['catalog_hash'] for entry in self._read_jsonl(self._catalog_path())}
+        print(f"[LOG] Solution log ready: {directory} ({len(self._known_catalogs)} catalogs known)")
+
+    def _catalog_path(self) -> str:
+        return os.path.join(self.directory, CATALOG_FILE)
+
+    # ------------------------------------------------------------------
+    # WRITING
+    # ------------------------------------------------------------------
+
+    def record(self,
+               fertilizers: List,
+               target_concentrations: Dict[str, float],
+               water_analysis: Dict[str, float],
+               dosages: Dict[str, float],
+               deviations_percent: Dict[str, float],
+               ionic_balance_error: float = 0.0,
+               method: str = "linear_programming",
+               status: str = "Optimal",
+               catalog_key: Optional[str] = None) -> bool:
+        """
+        Queue one solution; returns False if the queue is full and the record was dropped.
+        catalog_key is the fertilizers' catalog_hash when the caller already computed it.
+        """
+        entry = {
+            'record_id': uuid.uuid4().hex,
+            'timestamp': datetime.now().isoformat(),
+            'method': method,
+            'status': status,
+            'targets': dict(target_concentrations),
+            'water': dict(water_analysis),
+            'dosages': {name: float(d) for name, d in dosages.items() if d > 0},
+            'deviations_percent': {k: float(v) for k, v in deviations_percent.items()},
+            'ionic_balance_error': float(ionic_balance_error)
+        }
+
+        self._ensure_writer()
+        try:
+            # Unless the caller has it, the catalog is hashed on the writer thread, not in the request
+            self._queue.put_nowait({'entry': entry, 'fertilizers': list(fertilizers), 'catalog_key': catalog_key})
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def add_listener(self, listener: Callable[[Dict[str, Any], str], None]):
+        """Call listener(record, segment) on the writer thread for every record written from now on"""
+        self._listeners.append(listener)
+
+    def add_retention_listener(self, listener: Callable[[List[str]], None]):
+        """Call listener(segments) on the writer thread with the names of segments retention deleted"""
+        self._retention_listeners.append(listener)
+
+    def _ensure_writer(self):
+        if self._writer is not None and self._writer.is_alive():
+            return
+        with self._writer_lock:
+            if self._writer is None or not self._writer.is_alive():
+                self._writer = threading.Thread(target=self._run, name="solution-log-writer", daemon=True)
+                self._writer.start()
+
+    def _run(self):
+        while True:
+            # Drain whatever else is waiting so a burst becomes one append per file
+            items = [self._queue.get()]
+            while len(items) < 500:
+                try:
+                    items.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._append(items)
+            except Exception as e:
+                print(f"[LOG] Failed to write {len(items)} solution records: {e}")
+            finally:
+                for _ in items:
+                    self._queue.task_done()
+
+    def _append(self, items: List[Dict[str, Any]]):
+        new_catalogs = []
+        for item in items:
+            catalog_key = item['catalog_key'] or catalog_hash(item['fertilizers'])
+            item['entry']['catalog_hash'] = catalog_key
+            if catalog_key not in self._known_catalogs:
+                self._known_catalogs.add(catalog_key)
+                new_catalogs.append({'catalog_hash': catalog_key,
+                                     'fertilizers': [ResultStore.canonicalize(f) for f in item['fertilizers']]})
+
+        if new_catalogs:
+            with open(self._catalog_path(), "a", encoding="utf-8") as f:
+                for catalog in new_catalogs:
+                    f.write(json.dumps(catalog, separators=(',', ':')) + "\n")
+
+        segment = self._current_segment()
+        with open(segment, "a", encoding="utf-8") as f:
+            for item in items:
+                f.write(json.dumps(item['entry'], separators=(',', ':')) + "\n")
+        self.written += len(items)
+
+        segment_name = os.path.basename(segment)
+        for listener in self._listeners:
+            for item in items:
+                try:
+                    listener(item['entry'], segment_name)
+                except Exception as e:
+                    print(f"[LOG] Solution listener failed: {e}")
+
+        if time.monotonic() - self._last_retention >= self.retention_interval_seconds:
+            self.enforce_retention()
+
+    def _current_segment(self) -> str:
+        """Today's newest segment, or the next one once it has reached max_segment_bytes"""
+        day = datetime.now().strftime('%Y%m%d')
+        if self._segment is None or _segment_order(self._segment)[0] != day:
+            todays = [s for s in self.segments() if _segment_order(s)[0] == day]
+            self._segment = todays[-1] if todays else os.path.join(self.directory, f"{SEGMENT_PREFIX}{day}.jsonl")
+        if (self.max_segment_bytes and os.path.exists(self._segment)
+                and os.path.getsize(self._segment) >= self.max_segment_bytes):
+            sequence = _segment_order(self._segment)[1] + 1
+            self._segment = os.path.join(self.directory, f"{SEGMENT_PREFIX}{day}-{sequence:03d}.jsonl")
+        return self._segment
+
+    # ------------------------------------------------------------------
+    # RETENTION
+    # ------------------------------------------------------------------
+
+    def enforce_retention(self) -> List[str]:
+        """Delete segments past max_age_seconds, then the oldest beyond max_total_bytes; returns their names"""
+        self._last_retention = time.monotonic()
+        segments = [s for s in self.segments() if s != self._segment]
+        doomed = []
+        if self.max_age_seconds:
+            cutoff = time.time() - self.max_age_seconds
+            doomed = [s for s in segments if os.path.getmtime(s) < cutoff]
+        if self.max_total_bytes:
+            kept = [s for s in segments if s not in doomed]
+            total = sum(os.path.getsize(s) for s in self.segments() if s not in doomed)
+            for segment in kept:
+                if total <= self.max_total_bytes:
+                    break
+                doomed.append(segment)
+                total -= os.path.getsize(segment)
+        if not doomed:
+            return []
+
+        removed = []
+        for segment in doomed:
+            try:
+                os.remove(segment)
+                removed.append(os.path.basename(segment))
+            except OSError as e:
+                print(f"[LOG] Could not remove solution log segment {segment}: {e}")
+        self.segments_removed += len(removed)
+        print(f"[LOG] Retention removed {len(removed)} solution log segments")
+
+        for listener in self._retention_listeners:
+            try:
+                listener(removed)
+            except Exception as e:
+                print(f"[LOG] Retention listener failed: {e}")
+        return removed
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """Wait until every queued record is on disk"""
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.01)
+        return self._queue.unfinished_tasks == 0
+
+    # ------------------------------------------------------------------
+    # READING
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _read_jsonl(path: str) -> Iterator[Dict[str, Any]]:
+        if not os.path.exists(path):
+            return
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    # A torn last line from an interrupted write
+                    continue
+
+    def segments(self) -> List[str]:
+        """Segment paths, oldest first"""
+        return sorted(glob.glob(os.path.join(self.directory, SEGMENT_PATTERN)), key=_segment_order)
+
+    def iter_segments(self) -> Iterator[Tuple[str, Iterator[Dict[str, Any]]]]:
+        """(segment name, its records) for every segment, oldest first"""
+        for segment in self.segments():
+            yield os.path.basename(segment), self._read_jsonl(segment)
+
+    def iter_records(self) -> Iterator[Dict[str, Any]]:
+        """Every logged solution, oldest segment first"""
+        for _, records in self.iter_segments():
+            yield from records
+
+    def catalogs(self) -> Dict[str, Dict[str, Any]]:
+        return {entry['catalog_hash']: entry for entry in self._read_jsonl(self._catalog_path())}
+
+    def stats(self) -> Dict[str, Any]:
+        segments = self.segments()
+        return {
+            'directory': self.directory,
+            'segments': len(segments),
+            'size_bytes': sum(os.path.getsize(s) for s in segments),
+            'catalogs': len(self._known_catalogs),
+            'written_this_process': self.written,
+            'dropped_this_process': self.dropped,
+            'segments_removed_this_process': self.segments_removed,
+            'queued': self._queue.qsize(),
+            'max_segment_bytes': self.max_segment_bytes,
+            'max_total_bytes': self.max_total_bytes,
+            'max_age_seconds': self.max_age_seconds
+        }
+
+
+def create_solution_log_from_env() -> Optional[SolutionLog]:
+    """Build the log from SOLUTION_LOG_* environment variables (None when disabled)"""
+    if os.getenv("SOLUTION_LOG_ENABLED", "true").lower() in ("0", "false", "no"):
+        print("[LOG] Solution log disabled")
+        return None
+    return SolutionLog(
+        directory=os.getenv("SOLUTION_LOG_DIR", "reports/solution_log"),
+        max_queue=int(os.getenv("SOLUTION_LOG_MAX_QUEUE", 10000)),
+        max_segment_bytes=int(float(os.getenv("SOLUTION_LOG_SEGMENT_MB", 64)) * 1024 * 1024),
+        max_total_bytes=int(float(os.getenv("SOLUTION_LOG_MAX_MB", 1024)) * 1024 * 1024),
+        max_age_seconds=float(os.getenv("SOLUTION_LOG_MAX_AGE_DAYS", 90)) * 24 * 3600
+    )
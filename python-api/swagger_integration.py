@@ -9,8 +9,11 @@ import ssl
 import logging
 import asyncio
 from typing import Dict, List, Optional, Any
-from models import Fertilizer, FertilizerComposition, FertilizerChemistry
-from fertilizer_database import EnhancedFertilizerDatabase
+from fertilizer_records import FertilizerRecord, intern_fertilizer, make_fertilizer_record
+from fertilizer_database import get_fertilizer_database
+from fertilizer_mapping_cache import get_mapped_fertilizer_cache
+from element_registry import CATION_ELEMENTS, ANION_ELEMENTS
+from metrics import track_upstream
 
 class SwaggerAPIClient:
     """Complete Swagger API client with real authentication and data fetching"""
@@ -19,7 +22,7 @@ class SwaggerAPIClient:
         self.base_url = base_url.rstrip('/')
         self.auth_token = None
         self.headers = {'Content-Type': 'application/json'}
-        self.fertilizer_db = EnhancedFertilizerDatabase()
+        self.fertilizer_db = get_fertilizer_database()
         self.session = None
 
     async def __aenter__(self):
@@ -37,6 +40,7 @@ class SwaggerAPIClient:
         if self.session:
             await self.session.close()
 
+    @track_upstream("login")
     async def login(self, user_email: str, password: str) -> Dict[str, Any]:
         """
         Real login implementation with proper authentication
@@ -95,6 +99,7 @@ class SwaggerAPIClient:
             print(f"[ERROR] Authentication error: {e}")
             raise
 
+    @track_upstream("get_user_by_id")
     async def get_user_by_id(self, user_id: int) -> Dict[str, Any]:
         """Get user info by ID by fetching all users and filtering"""
         if not self.auth_token:
@@ -131,6 +136,7 @@ class SwaggerAPIClient:
             raise
         
         
+    @track_upstream("get_fertilizer_inputs")
     async def get_fertilizer_inputs(self, catalog_id: int) -> List[Dict[str, Any]]:
         """
         Fetch FertilizerInput data which contains pricing information
@@ -170,6 +176,7 @@ class SwaggerAPIClient:
             print(f"[ERROR] Network error fetching fertilizer inputs: {e}")
             return []
         
+    @track_upstream("get_fertilizers")
     async def get_fertilizers(self, catalog_id: int, include_inactives: bool = False) -> List[Dict[str, Any]]:
             """
             Get all fertilizers from the specified catalog
@@ -199,6 +206,9 @@ class SwaggerAPIClient:
                         
                         if len(fertilizers) > 5:
                             print(f"  ... and {len(fertilizers) - 5} more")
+
+                        # Revalidate the catalog: mapped products that changed or left are dropped
+                        get_mapped_fertilizer_cache().revalidate(catalog_id, fertilizers)
                         
                         return fertilizers
                         
@@ -215,6 +225,7 @@ class SwaggerAPIClient:
                 print(f"[ERROR] Network error fetching fertilizers: {e}")
                 raise Exception(f"Network error: {e}")
 
+    @track_upstream("get_crop_phase_requirements")
     async def get_crop_phase_requirements(self, phase_id: int) -> Optional[Dict[str, Any]]:
         """
         Get crop phase solution requirements
@@ -253,6 +264,7 @@ class SwaggerAPIClient:
             print(f"[ERROR] Network error fetching requirements: {e}")
             return None
 
+    @track_upstream("get_water_chemistry")
     async def get_water_chemistry(self, water_id: int, catalog_id: int) -> Optional[Dict[str, Any]]:
         """
         Get water chemistry analysis by ID
@@ -303,6 +315,7 @@ class SwaggerAPIClient:
             print(f"[ERROR] Network error fetching water analysis: {e}")
             return None
 
+    @track_upstream("get_soil_analysis")
     async def get_soil_analysis(self, crop_production_id: int) -> Optional[Dict[str, Any]]:
         """
         Get soil analysis for a crop production
@@ -367,9 +380,18 @@ class SwaggerAPIClient:
             print(f"[ERROR] Network error fetching soil analysis: {e}")
             return None
 
-    def map_swagger_fertilizer_to_model(self, swagger_fert: Dict[str, Any], chemistry: Optional[Dict[str, Any]] = None) -> Fertilizer:
+    def map_swagger_fertilizer_to_model(self, swagger_fert: Dict[str, Any], chemistry: Optional[Dict[str, Any]] = None) -> FertilizerRecord:
+        """
+        Convert Swagger fertilizer data to an interned fertilizer record; unchanged products
+        (same id and dateUpdated / content) come from the mapping cache without re-parsing
+        """
+        return get_mapped_fertilizer_cache().get_or_map(
+            swagger_fert, chemistry, self.fertilizer_db.version,
+            lambda: self._map_swagger_fertilizer(swagger_fert, chemistry))
+
+    def _map_swagger_fertilizer(self, swagger_fert: Dict[str, Any], chemistry: Optional[Dict[str, Any]] = None) -> FertilizerRecord:
         """
-        Convert Swagger fertilizer data to our Fertilizer model with intelligent composition mapping
+        Convert Swagger fertilizer data to an interned fertilizer record with intelligent composition mapping
         """
         name = swagger_fert.get('name', 'Unknown')
         print(f"    [PROCESS] Mapping fertilizer: {name}")
@@ -436,14 +458,8 @@ class SwaggerAPIClient:
 
         else:
             # Create default empty composition with all required elements
-            cations = {
-                'Ca': 0.0, 'K': 0.0, 'Mg': 0.0, 'Na': 0.0, 'NH4': 0.0,
-                'Fe': 0.0, 'Mn': 0.0, 'Zn': 0.0, 'Cu': 0.0
-            }
-            anions = {
-                'N': 0.0, 'S': 0.0, 'Cl': 0.0, 'P': 0.0, 'HCO3': 0.0,
-                'B': 0.0, 'Mo': 0.0
-            }
+            cations = {element: 0.0 for element in CATION_ELEMENTS}
+            anions = {element: 0.0 for element in ANION_ELEMENTS}
             molecular_weight = 100.0
             print(f"      [WARNING]  Not found in any source, using defaults")
 
@@ -457,24 +473,22 @@ class SwaggerAPIClient:
         if solubility < 0:
             solubility = 100.0
 
-        # Create Fertilizer object
-        fertilizer = Fertilizer(
-            name=name,
-            percentage=purity,
-            molecular_weight=molecular_weight,
-            salt_weight=molecular_weight,
-            density=density,
-            chemistry=FertilizerChemistry(
+        # Interned record: the same product with the same mapped values is one shared object
+        version = (formula, purity, density, solubility, is_ph_adjuster, molecular_weight,
+                   tuple(cations.items()), tuple(anions.items()))
+        fertilizer = intern_fertilizer(
+            swagger_fert.get('catalogId'), swagger_fert.get('id', name), (name, version),
+            lambda: make_fertilizer_record(
+                name=name,
+                percentage=purity,
+                molecular_weight=molecular_weight,
+                density=density,
                 formula=formula,
-                purity=purity,
                 solubility=solubility,
-                is_ph_adjuster=is_ph_adjuster
-            ),
-            composition=FertilizerComposition(
+                is_ph_adjuster=is_ph_adjuster,
                 cations=cations,
                 anions=anions
-            )
-        )
+            ))
 
         # Log main nutrients for verification
         main_nutrients = []
@@ -0,0 +1,7 @@
+# conftest.py
+"""Tests import the API modules the way main_api does: from the python-api directory"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
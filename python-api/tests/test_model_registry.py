@@ -0,0 +1,56 @@
+# test_model_registry.py
+"""
+Model Registry Tests
+Keep-last-N retention: old versions leave the index and the disk, while the active
+version and the rollback history survive however old they are.
+"""
+
+import os
+
+import numpy as np
+
+from model_registry import ModelRegistry
+
+
+def _register(registry: ModelRegistry, n: int):
+    return [registry.register({'weights': np.arange(4.0) * i}, {'source': 'test'}) for i in range(n)]
+
+
+def _artifact_exists(registry: ModelRegistry, version: str) -> bool:
+    return os.path.isdir(os.path.join(registry.versions_dir, version))
+
+
+def test_keeps_only_the_newest_versions(tmp_path):
+    registry = ModelRegistry(str(tmp_path), keep_versions=3)
+    versions = _register(registry, 6)
+
+    kept = [m['version'] for m in registry.list_versions()]
+    assert kept == versions[:-4:-1]
+    for version in versions[:3]:
+        assert not _artifact_exists(registry, version)
+    for version in versions[3:]:
+        assert _artifact_exists(registry, version)
+
+
+def test_never_prunes_active_or_rollback_history(tmp_path):
+    registry = ModelRegistry(str(tmp_path), keep_versions=2)
+    first, second = _register(registry, 2)
+    registry.promote(first)
+    registry.promote(second)
+    newer = _register(registry, 4)
+
+    kept = {m['version'] for m in registry.list_versions()}
+    assert kept == {first, second} | set(newer[-2:])
+    assert registry.active_version() == second
+    assert registry.previous_version() == first
+    # The rollback target is still loadable
+    components, metadata = registry.load(registry.rollback()['active'])
+    assert metadata['version'] == first
+    assert np.array_equal(components['weights'], np.arange(4.0) * 0)
+
+
+def test_zero_keeps_every_version(tmp_path):
+    registry = ModelRegistry(str(tmp_path), keep_versions=0)
+    versions = _register(registry, 5)
+    assert registry.prune() == []
+    assert {m['version'] for m in registry.list_versions()} == set(versions)
@@ -0,0 +1,83 @@
+# test_solution_log.py
+"""
+Solution Log Retention Tests
+Size rollover and age / total-size retention of log segments, the recipe index dropping
+recipes of deleted segments, and the feedback trainer's persisted trained-on watermark.
+"""
+
+import os
+import time
+
+from feedback_trainer import FeedbackTrainer
+from recipe_index import RecipeIndex
+from solution_log import SolutionLog
+
+
+def _log_solutions(log: SolutionLog, n: int):
+    """n solutions, each flushed on its own so each lands in its own segment"""
+    for i in range(n):
+        log.record([], {'N': 150.0 + i, 'K': 200.0}, {'Ca': 20.0}, {'KNO3': 0.5 + i / 10},
+                   {'N': 1.0, 'K': -1.0}, catalog_key="catalog")
+        assert log.flush()
+
+
+def _record_ids(log: SolutionLog):
+    return [record['record_id'] for record in log.iter_records()]
+
+
+def test_segments_roll_over_by_size(tmp_path):
+    log = SolutionLog(str(tmp_path), max_segment_bytes=1, max_total_bytes=0, max_age_seconds=0)
+    _log_solutions(log, 3)
+
+    names = [os.path.basename(s) for s in log.segments()]
+    assert len(names) == 3
+    assert names[1].endswith("-001.jsonl") and names[2].endswith("-002.jsonl")
+    assert len(_record_ids(log)) == 3
+
+
+def test_retention_removes_oldest_segments_and_their_recipes(tmp_path):
+    log = SolutionLog(str(tmp_path), max_segment_bytes=1, max_total_bytes=0, max_age_seconds=0)
+    index = RecipeIndex(log, min_rebuild=2)
+    index.ensure_loaded()
+    _log_solutions(log, 6)
+    assert index.stats()['recipes'] == 6
+
+    segments = log.segments()
+    log.max_total_bytes = sum(os.path.getsize(s) for s in segments[3:])
+    removed = log.enforce_retention()
+
+    assert removed == [os.path.basename(s) for s in segments[:3]]
+    assert log.segments() == segments[3:]
+    remaining = _record_ids(log)
+    assert len(remaining) == 3
+    assert sorted(index._catalogs["catalog"].record_ids) == sorted(remaining)
+
+
+def test_retention_by_age_keeps_the_current_segment(tmp_path):
+    log = SolutionLog(str(tmp_path), max_segment_bytes=1, max_total_bytes=0, max_age_seconds=3600)
+    _log_solutions(log, 3)
+    old = time.time() - 7200
+    for segment in log.segments():
+        os.utime(segment, (old, old))
+
+    removed = log.enforce_retention()
+
+    assert len(removed) == 2
+    assert len(log.segments()) == 1
+    assert len(_record_ids(log)) == 1
+
+
+def test_trained_on_watermark_survives_a_restart(tmp_path):
+    log = SolutionLog(str(tmp_path))
+    _log_solutions(log, 4)
+    trainer = FeedbackTrainer(log, min_samples=1, min_new_samples=1)
+    newest = trainer.load_dataset()['newest']
+    trainer.train_cycle = lambda force, trained_through: {
+        'status': 'not_better', 'total_samples': 4, 'trained_through': newest}
+    trainer.run_once()
+
+    restarted = FeedbackTrainer(log, min_samples=1, min_new_samples=1)
+    assert restarted.status()['trained_through'] == newest
+    assert restarted.load_dataset(since=newest)['new'] == 0
+    _log_solutions(log, 2)
+    assert restarted.load_dataset(since=newest)['new'] == 2
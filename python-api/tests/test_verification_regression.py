@@ -0,0 +1,127 @@
+# test_verification_regression.py
+"""
+Verification Regression Tests
+The current SolutionVerifier (dict wrappers and the verify_batch kernel) against the
+frozen per-dict reference on seeded random solutions. Any change in verification
+output, e.g. a different meq conversion, shows up here as a diff.
+"""
+
+import numpy as np
+import pytest
+
+from reference_verifier import SolutionVerifier as ReferenceVerifier
+from verification_analyzer import SolutionVerifier, IONIC_RATIOS, UNDEFINED
+
+NUTRIENTS = ('N', 'P', 'K', 'Ca', 'Mg', 'S', 'Fe', 'Mn', 'Zn', 'Cu', 'B', 'Mo', 'Na', 'Cl', 'HCO3', 'NH4')
+CASES = 300
+
+
+def _random_cases(seed: int = 2024):
+    """(targets, finals, water, dosages) per case; some nutrients missing or zero"""
+    rng = np.random.default_rng(seed)
+    reference = ReferenceVerifier()
+    cases = []
+    for _ in range(CASES):
+        # The reference divides by the range optimum, so only nutrients with a nonzero optimum are targeted
+        targets = {n: float(rng.uniform(0.01, 300)) for n in NUTRIENTS
+                   if reference.nutrient_ranges.get(n, {'optimal': 1})['optimal'] > 0 and rng.random() < 0.9}
+        finals = {n: float(rng.choice([0.0, rng.uniform(0, 400)], p=[0.1, 0.9])) for n in NUTRIENTS
+                  if rng.random() < 0.9}
+        water = {n: float(rng.uniform(0, 50)) for n in NUTRIENTS}
+        dosages = {'Calcium Nitrate': float(rng.uniform(0, 2)), 'Potassium Sulfate': float(rng.uniform(0, 1))}
+        cases.append((targets, finals, water, dosages))
+    return cases
+
+
+CASES_DATA = _random_cases()
+
+
+def _without_timestamps(value):
+    if isinstance(value, dict):
+        return {k: _without_timestamps(v) for k, v in value.items() if 'timestamp' not in k}
+    if isinstance(value, list):
+        return [_without_timestamps(v) for v in value]
+    return value
+
+
+@pytest.fixture(scope="module")
+def verifiers():
+    return ReferenceVerifier(), SolutionVerifier()
+
+
+# ------------------------------------------------------------------
+# DICT API
+# ------------------------------------------------------------------
+
+def test_meq_conversion_matches_reference(verifiers):
+    reference, current = verifiers
+    for _, finals, _, _ in CASES_DATA:
+        assert current._convert_to_meq_l(finals) == reference._convert_to_meq_l(finals)
+
+
+def test_verify_concentrations_matches_reference(verifiers):
+    reference, current = verifiers
+    for targets, finals, _, _ in CASES_DATA:
+        assert current.verify_concentrations(targets, finals) == reference.verify_concentrations(targets, finals)
+
+
+def test_verify_ionic_relationships_matches_reference(verifiers):
+    reference, current = verifiers
+    for _, finals, _, _ in CASES_DATA:
+        meq = reference._convert_to_meq_l(finals)
+        assert (current.verify_ionic_relationships(meq, {}, finals)
+                == reference.verify_ionic_relationships(meq, {}, finals))
+
+
+def test_verify_ionic_balance_matches_reference(verifiers):
+    reference, current = verifiers
+    for _, finals, _, _ in CASES_DATA:
+        meq = reference._convert_to_meq_l(finals)
+        assert current.verify_ionic_balance(meq) == reference.verify_ionic_balance(meq)
+
+
+def test_create_detailed_verification_matches_reference(verifiers):
+    reference, current = verifiers
+    for targets, finals, water, dosages in CASES_DATA:
+        expected = reference.create_detailed_verification(dosages, finals, targets, water, 1000)
+        actual = current.create_detailed_verification(dosages, finals, targets, water, 1000)
+        assert _without_timestamps(actual) == _without_timestamps(expected)
+
+
+# ------------------------------------------------------------------
+# ARRAY KERNEL
+# ------------------------------------------------------------------
+
+def test_verify_batch_matches_reference(verifiers):
+    reference, current = verifiers
+    # Every case scored in one batch; absent nutrients are 0 mg/L and untargeted ones target 0
+    final_mg = np.array([[finals.get(n, 0.0) for n in NUTRIENTS] for _, finals, _, _ in CASES_DATA])
+    targets = np.array([[targets.get(n, 0.0) for n in NUTRIENTS] for targets, _, _, _ in CASES_DATA])
+    batch = current.verify_batch(NUTRIENTS, final_mg, targets)
+    statuses = batch.status_labels()
+    balance_statuses = batch.balance_labels()
+    column = {n: j for j, n in enumerate(NUTRIENTS)}
+
+    for i, (case_targets, finals, _, _) in enumerate(CASES_DATA):
+        dense_finals = {n: finals.get(n, 0.0) for n in NUTRIENTS}
+
+        for expected in reference.verify_concentrations(case_targets, dense_finals):
+            j = column[expected['parameter']]
+            assert statuses[i, j] == expected['status']
+            assert round(float(batch.deviation[i, j]), 2) == expected['deviation']
+            assert round(float(batch.percentage_deviation[i, j]), 1) == expected['percentage_deviation']
+
+        meq = reference._convert_to_meq_l(dense_finals)
+        expected_ratios = {r['relationship_name']: r for r in reference.verify_ionic_relationships(meq, {}, dense_finals)}
+        for r, (_, label, _, _, _) in enumerate(IONIC_RATIOS):
+            if batch.ratio_status_codes[i, r] == UNDEFINED:
+                assert label not in expected_ratios
+            else:
+                assert round(float(batch.ratios[i, r]), 2) == expected_ratios[label]['actual_ratio']
+
+        expected_balance = reference.verify_ionic_balance(meq)
+        assert round(float(batch.cation_sum[i]), 3) == expected_balance['cation_sum']
+        assert round(float(batch.anion_sum[i]), 3) == expected_balance['anion_sum']
+        assert round(float(batch.balance_difference_percentage[i]), 2) == expected_balance['difference_percentage']
+        assert balance_statuses[i] == expected_balance['balance_status']
+
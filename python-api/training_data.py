@@ -0,0 +1,478 @@
+# training_data.py
+"""
+Synthetic Training Data Module
+Vectorized scenario sampling and labeling for the ML optimizers. Scenarios are drawn
+as whole arrays, labeled with array versions of the chemistry heuristics, generated
+in parallel shards with reproducible per-shard seeds, and optionally written to disk
+so training can stream them shard by shard
+"""
+
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, List, Tuple, Optional, Any, Iterator
+
+import numpy as np
+
+from element_registry import BALANCE_SPECIES, meq_factors
+from ml_features import CATION_ELEMENTS, ANION_ELEMENTS, MICRO_ELEMENTS, ENHANCED_ELEMENTS
+
+# ==============================================================================
+# SCENARIO RANGES
+# ==============================================================================
+
+# ml_optimizer.generate_real_training_data ranges
+STANDARD_ELEMENTS = ['N', 'P', 'K', 'Ca', 'Mg', 'S', 'Fe', 'Mn', 'Zn', 'Cu', 'B', 'Mo', 'Cl', 'HCO3']
+
+STANDARD_CROP_RANGES = {
+    'leafy_greens': {
+        'N': (120, 180), 'P': (30, 50), 'K': (180, 250), 'Ca': (150, 200),
+        'Mg': (40, 60), 'S': (60, 100), 'Fe': (1.5, 3.0), 'Mn': (0.3, 0.8)
+    },
+    'fruiting_crops': {
+        'N': (140, 220), 'P': (35, 65), 'K': (200, 350), 'Ca': (160, 220),
+        'Mg': (45, 70), 'S': (70, 120), 'Fe': (2.0, 4.0), 'Mn': (0.4, 1.0)
+    },
+    'herbs': {
+        'N': (100, 150), 'P': (25, 45), 'K': (150, 220), 'Ca': (120, 180),
+        'Mg': (30, 50), 'S': (50, 90), 'Fe': (1.0, 2.5), 'Mn': (0.2, 0.6)
+    }
+}
+STANDARD_TARGET_FILL = {
+    'Zn': (0.1, 0.5), 'Cu': (0.05, 0.2), 'B': (0.2, 0.8), 'Mo': (0.01, 0.1),
+    '*': (1, 10)
+}
+
+STANDARD_WATER_RANGES = {
+    'soft': {'Ca': (5, 25), 'Mg': (2, 10), 'K': (1, 8), 'N': (0, 5), 'HCO3': (20, 80)},
+    'medium': {'Ca': (20, 60), 'Mg': (8, 25), 'K': (3, 15), 'N': (1, 10), 'HCO3': (60, 150)},
+    'hard': {'Ca': (50, 120), 'Mg': (20, 50), 'K': (5, 25), 'N': (2, 20), 'HCO3': (100, 250)}
+}
+STANDARD_WATER_FILL = {'*': (0, 2)}
+
+# auto-train.py ranges (micronutrient-complete)
+ENHANCED_CROP_RANGES = {
+    'leafy_greens': {
+        'N': (120, 180), 'P': (30, 50), 'K': (150, 250), 'Ca': (120, 200), 'Mg': (30, 60), 'S': (50, 100),
+        'Fe': (1.5, 2.5), 'Mn': (0.4, 0.7), 'Zn': (0.2, 0.4), 'Cu': (0.08, 0.15), 'B': (0.3, 0.6), 'Mo': (0.03, 0.07)
+    },
+    'fruiting_crops': {
+        'N': (150, 220), 'P': (40, 70), 'K': (200, 350), 'Ca': (150, 250), 'Mg': (40, 80), 'S': (60, 120),
+        'Fe': (2.0, 3.5), 'Mn': (0.5, 1.0), 'Zn': (0.3, 0.6), 'Cu': (0.1, 0.2), 'B': (0.4, 0.8), 'Mo': (0.04, 0.08)
+    },
+    'herbs': {
+        'N': (100, 150), 'P': (25, 45), 'K': (120, 200), 'Ca': (100, 160), 'Mg': (25, 50), 'S': (40, 80),
+        'Fe': (1.2, 2.2), 'Mn': (0.3, 0.6), 'Zn': (0.15, 0.35), 'Cu': (0.06, 0.12), 'B': (0.25, 0.55), 'Mo': (0.02, 0.06)
+    }
+}
+ENHANCED_TARGET_FILL = {
+    'Fe': (2.0, 2.0), 'Mn': (0.5, 0.5), 'Zn': (0.3, 0.3), 'Cu': (0.1, 0.1), 'B': (0.5, 0.5), 'Mo': (0.05, 0.05),
+    '*': (50, 200)
+}
+
+ENHANCED_WATER_RANGES = {
+    'soft': {
+        'Ca': (5, 25), 'K': (1, 8), 'Mg': (2, 12), 'N': (0, 5), 'S': (2, 10),
+        'Fe': (0.05, 0.2), 'Mn': (0.01, 0.05), 'Zn': (0.005, 0.02), 'Cu': (0.002, 0.01), 'B': (0.02, 0.1), 'Mo': (0.001, 0.005)
+    },
+    'medium': {
+        'Ca': (20, 60), 'K': (3, 15), 'Mg': (8, 25), 'N': (1, 10), 'S': (5, 20),
+        'Fe': (0.1, 0.4), 'Mn': (0.02, 0.1), 'Zn': (0.01, 0.04), 'Cu': (0.005, 0.02), 'B': (0.05, 0.2), 'Mo': (0.002, 0.01)
+    },
+    'hard': {
+        'Ca': (50, 120), 'K': (5, 25), 'Mg': (20, 50), 'N': (2, 20), 'S': (10, 40),
+        'Fe': (0.2, 0.8), 'Mn': (0.05, 0.2), 'Zn': (0.02, 0.08), 'Cu': (0.01, 0.04), 'B': (0.1, 0.4), 'Mo': (0.005, 0.02)
+    }
+}
+ENHANCED_WATER_FILL = dict({e: (0, 0.1) for e in MICRO_ELEMENTS}, **{'*': (0, 5)})
+
+
+@dataclass
+class ScenarioProfile:
+    """Uniform sampling ranges per crop type and water type, as (type x element) bound arrays"""
+    name: str
+    elements: List[str]
+    crop_types: List[str]
+    water_types: List[str]
+    target_low: np.ndarray
+    target_high: np.ndarray
+    water_low: np.ndarray
+    water_high: np.ndarray
+
+    @classmethod
+    def from_ranges(cls, name: str, elements: List[str],
+                    crop_ranges: Dict[str, Dict[str, Tuple[float, float]]], target_fill: Dict[str, Tuple[float, float]],
+                    water_ranges: Dict[str, Dict[str, Tuple[float, float]]], water_fill: Dict[str, Tuple[float, float]]
+                    ) -> 'ScenarioProfile':
+        def bounds(ranges, fill):
+            low = np.zeros((len(ranges), len(elements)))
+            high = np.zeros((len(ranges), len(elements)))
+            for i, type_ranges in enumerate(ranges.values()):
+                for j, element in enumerate(elements):
+                    low[i, j], high[i, j] = type_ranges.get(element, fill.get(element, fill['*']))
+            return low, high
+
+        target_low, target_high = bounds(crop_ranges, target_fill)
+        water_low, water_high = bounds(water_ranges, water_fill)
+        return cls(name, list(elements), list(crop_ranges), list(water_ranges),
+                   target_low, target_high, water_low, water_high)
+
+
+STANDARD_PROFILE = ScenarioProfile.from_ranges(
+    "standard", STANDARD_ELEMENTS,
+    STANDARD_CROP_RANGES, STANDARD_TARGET_FILL, STANDARD_WATER_RANGES, STANDARD_WATER_FILL)
+
+ENHANCED_PROFILE = ScenarioProfile.from_ranges(
+    "enhanced", ENHANCED_ELEMENTS,
+    ENHANCED_CROP_RANGES, ENHANCED_TARGET_FILL, ENHANCED_WATER_RANGES, ENHANCED_WATER_FILL)
+
+
+def sample_scenarios(profile: ScenarioProfile, n_samples: int,
+                     rng: np.random.Generator) -> Dict[str, np.ndarray]:
+    """Draw crop type, water type, targets and water for n scenarios in a few array calls"""
+    crop_index = rng.integers(len(profile.crop_types), size=n_samples)
+    water_index = rng.integers(len(profile.water_types), size=n_samples)
+    targets = rng.uniform(profile.target_low[crop_index], profile.target_high[crop_index])
+    water = rng.uniform(profile.water_low[water_index], profile.water_high[water_index])
+    return {'targets': targets, 'water': water, 'crop_index': crop_index, 'water_index': water_index}
+
+
+# ==============================================================================
+# VECTORIZED LABELERS
+# ==============================================================================
+
+class GreedyChemistryLabeler:
+    """
+    Greedy stoichiometric dosages and balance quality used to label ml_optimizer
+    training data, for an arbitrary fertilizer list. Holds only NumPy arrays so it
+    can be shipped to worker processes.
+    """
+    quality_key = 'balance_quality'
+    nutrient_priority = ['P', 'Ca', 'K', 'Mg', 'S', 'N', 'Fe', 'Mn', 'Zn', 'Cu', 'B', 'Mo']
+
+    def __init__(self, fertilizers: List, elements: List[str]):
+        self.fertilizer_names = [f.name for f in fertilizers]
+        self.elements = list(elements)
+        self.purity = np.array([float(f.percentage) for f in fertilizers])
+
+        # Achieved concentrations also track ions no target mentions (Na, NH4, ...)
+        extra = []
+        for fert in fertilizers:
+            for element in list(fert.composition.cations) + list(fert.composition.anions):
+                if element not in self.elements and element not in extra:
+                    extra.append(element)
+        self.achieved_elements = list(dict.fromkeys(self.elements + extra + CATION_ELEMENTS + ANION_ELEMENTS))
+
+        # Greedy solve reads the merged composition (anions override cations for the same key)
+        self.composition = np.zeros((len(fertilizers), len(self.elements)))
+        # Achieved concentrations add cations and anions separately (mg/L per g/L of product)
+        self.contribution = np.zeros((len(fertilizers), len(self.achieved_elements)))
+        for i, fert in enumerate(fertilizers):
+            merged = dict(fert.composition.cations)
+            merged.update(fert.composition.anions)
+            for j, element in enumerate(self.elements):
+                self.composition[i, j] = merged.get(element, 0)
+            for content in (fert.composition.cations, fert.composition.anions):
+                for element, content_percent in content.items():
+                    if content_percent > 0:
+                        k = self.achieved_elements.index(element)
+                        self.contribution[i, k] += 1000.0 * content_percent * (fert.percentage / 100.0) / 100.0
+
+        self.cation_meq = meq_factors(self.achieved_elements, CATION_ELEMENTS, BALANCE_SPECIES)
+        self.anion_meq = meq_factors(self.achieved_elements, ANION_ELEMENTS, BALANCE_SPECIES)
+
+    def dosages(self, targets: np.ndarray, water: np.ndarray) -> np.ndarray:
+        """Greedy stoichiometric dosages (g/L), one row per scenario"""
+        n_rows = targets.shape[0]
+        rows = np.arange(n_rows)
+        remaining = np.maximum(0, targets - water)
+        dosages = np.zeros((n_rows, len(self.fertilizer_names)))
+        positive = np.clip(self.composition, 0, None)
+
+        for nutrient in self.nutrient_priority:
+            if nutrient not in self.elements:
+                continue
+            j = self.elements.index(nutrient)
+            need = remaining[:, j]
+
+            content = self.composition[:, j]
+            useful = (remaining > 0) @ self.composition.T
+            efficiency = useful / np.maximum(content, 1)[None, :]
+            # Fertilizers already above 3 g/L are skipped, as are those without the nutrient
+            eligible = (content > 0)[None, :] & (dosages <= 3.0)
+            efficiency = np.where(eligible, efficiency, -np.inf)
+
+            best = np.argmax(efficiency, axis=1)
+            chosen = (need > 0) & (efficiency[rows, best] > 0)
+            if not chosen.any():
+                continue
+
+            best_content = content[best]
+            best_purity = self.purity[best]
+            required_mg = np.where(
+                chosen, need / (np.where(chosen, best_content, 1) / 100.0) * (100.0 / best_purity), 0.0)
+            dosages[rows, best] += required_mg / 1000.0
+
+            contribution = required_mg[:, None] * positive[best] * (best_purity / 100.0)[:, None] / 100.0
+            remaining = np.where(chosen[:, None], np.maximum(0, remaining - contribution), remaining)
+
+        dosages = np.where(dosages < 0.001, 0.0, dosages)
+        return np.minimum(dosages, 8.0)
+
+    def quality(self, targets: np.ndarray, water: np.ndarray, dosages: np.ndarray) -> np.ndarray:
+        """Target achievement (60%) and ionic balance (40%) score per scenario"""
+        water_full = np.zeros((targets.shape[0], len(self.achieved_elements)))
+        water_full[:, :len(self.elements)] = water
+        achieved = water_full + np.where(dosages > 0, dosages, 0) @ self.contribution
+        achieved_targets = achieved[:, :len(self.elements)]
+
+        has_target = targets > 0
+        accuracy = 1 - np.minimum(
+            np.abs(achieved_targets - targets) / np.where(has_target, targets, 1.0), 1.0)
+        target_quality = np.where(has_target, accuracy, 0).sum(axis=1) / np.maximum(has_target.sum(axis=1), 1)
+
+        cation_meq = achieved @ self.cation_meq
+        anion_meq = achieved @ self.anion_meq
+        defined = (cation_meq > 0) & (anion_meq > 0)
+        balance_error = np.abs(cation_meq - anion_meq) / np.maximum(np.maximum(cation_meq, anion_meq), 1e-12)
+        balance_quality = np.where(defined, np.maximum(0, 1 - balance_error), 0)
+
+        return np.clip(target_quality * 0.6 + balance_quality * 0.4, 0, 1)
+
+    def label(self, targets: np.ndarray, water: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        dosages = self.dosages(targets, water)
+        return dosages, self.quality(targets, water, dosages)
+
+
+# auto-train.py sequential recipe: (fertilizer, primary element, primary %, secondary elements %)
+ENHANCED_FERTILIZER_SEQUENCE = [
+    # Macronutrients
+    ('fosfato_monopotasico', 'P', 22.76, {'K': 28.73}),
+    ('nitrato_calcio', 'Ca', 16.97, {'N': 11.86}),
+    ('nitrato_potasio', 'K', 38.67, {'N': 13.85}),
+    ('sulfato_magnesio', 'Mg', 9.87, {'S': 13.01}),
+    ('sulfato_potasio', 'K', 44.87, {'S': 18.39}),
+
+    # Micronutrients
+    ('quelato_hierro', 'Fe', 13.0, {'Na': 6.27, 'N': 7.63}),
+    ('sulfato_manganeso', 'Mn', 24.63, {'S': 14.37}),
+    ('sulfato_zinc', 'Zn', 22.74, {'S': 11.15}),
+    ('sulfato_cobre', 'Cu', 25.45, {'S': 12.84}),
+    ('acido_borico', 'B', 17.48, {}),
+    ('molibdato_sodio', 'Mo', 39.66, {'Na': 19.01})
+]
+ENHANCED_FERTILIZER_SET = [name for name, _, _, _ in ENHANCED_FERTILIZER_SEQUENCE]
+
+
+class SequentialMicronutrientLabeler:
+    """
+    Sequential dosages and micronutrient quality used to label auto-train.py training
+    data (98% purity, fixed fertilizer sequence)
+    """
+    quality_key = 'micronutrient_quality'
+
+    def __init__(self, fertilizer_set: Optional[List[str]] = None, elements: Optional[List[str]] = None):
+        allowed = set(fertilizer_set if fertilizer_set is not None else ENHANCED_FERTILIZER_SET)
+        self.sequence = [step for step in ENHANCED_FERTILIZER_SEQUENCE if step[0] in allowed]
+        self.fertilizer_names = [name for name, _, _, _ in self.sequence]
+        self.elements = list(elements or ENHANCED_ELEMENTS)
+
+    def dosages(self, targets: np.ndarray, water: np.ndarray) -> np.ndarray:
+        remaining = np.maximum(0, targets - water)
+        dosages = np.zeros((targets.shape[0], len(self.fertilizer_names)))
+
+        for f, (fert_name, primary, primary_content, secondary) in enumerate(self.sequence):
+            if primary not in self.elements:
+                continue
+            j = self.elements.index(primary)
+            need = remaining[:, j]
+            dosage_mg = need / (primary_content / 100) * (100 / 98)
+
+            if primary in MICRO_ELEMENTS:
+                dosage_mg = np.minimum(dosage_mg, 100)  # Max 100 mg/L for any micronutrient fertilizer
+                min_dosage, max_dosage = 0.001, 0.1
+            else:
+                min_dosage, max_dosage = 0.01, 5.0
+
+            accepted = (need > 0) & (dosage_mg / 1000 >= min_dosage) & (dosage_mg / 1000 <= max_dosage)
+            dosages[:, f] = np.where(accepted, dosage_mg / 1000, 0.0)
+
+            remaining[:, j] = np.where(accepted, 0.0, remaining[:, j])
+            for element, content in secondary.items():
+                if element in self.elements:
+                    k = self.elements.index(element)
+                    contribution = dosage_mg * (content / 100) * (98 / 100)
+                    remaining[:, k] = np.where(accepted, np.maximum(0, remaining[:, k] - contribution), remaining[:, k])
+
+        return dosages
+
+    def quality(self, targets: np.ndarray, water: np.ndarray, dosages: np.ndarray) -> np.ndarray:
+        """Micronutrient coverage score (+/-50% fully acceptable), 0.5 when no micro targets"""
+        scores = np.zeros(targets.shape[0])
+        counted = np.zeros(targets.shape[0])
+
+        for micro in MICRO_ELEMENTS:
+            if micro not in self.elements:
+                continue
+            achieved = np.zeros(targets.shape[0])
+            for f, (_, primary, primary_content, _) in enumerate(self.sequence):
+                if primary == micro:
+                    achieved += np.where(dosages[:, f] > 0, dosages[:, f] * 1000 * (primary_content / 100) * 0.98, 0)
+
+            target = targets[:, self.elements.index(micro)]
+            has_target = target > 0
+            deviation = np.abs(achieved - target) / np.where(has_target, target, 1.0)
+            score = np.where(deviation <= 0.5, 1.0 - deviation, np.maximum(0, 0.5 - (deviation - 0.5) * 0.3))
+            scores += np.where(has_target, score, 0)
+            counted += has_target
+
+        return np.where(counted > 0, scores / np.maximum(counted, 1), 0.5)
+
+    def label(self, targets: np.ndarray, water: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        dosages = self.dosages(targets, water)
+        return dosages, self.quality(targets, water, dosages)
+
+
+def dicts_to_matrix(records: List[Dict[str, float]], elements: List[str]) -> np.ndarray:
+    """Dense (rows x elements) matrix from nutrient dicts (absent elements are 0)"""
+    return np.array([[record.get(e, 0) for e in elements] for record in records], dtype=np.float64)
+
+
+# ==============================================================================
+# SHARDED PARALLEL GENERATION
+# ==============================================================================
+
+def generate_shard(profile: ScenarioProfile, labeler, n_samples: int,
+                   seed: np.random.SeedSequence, path: Optional[str] = None) -> Dict[str, np.ndarray]:
+    """Sample and label one shard; writes it to path (.npz) when given"""
+    rng = np.random.default_rng(seed)
+    shard = sample_scenarios(profile, n_samples, rng)
+    shard['dosages'], shard['quality'] = labeler.label(shard['targets'], shard['water'])
+    if path is not None:
+        np.savez(path, **shard)
+    return shard
+
+
+def _generate_shard_job(args) -> Dict[str, np.ndarray]:
+    return generate_shard(*args)
+
+
+def default_workers() -> int:
+    """
+    TRAINING_DATA_WORKERS (default 1). Vectorized labeling runs at roughly a million
+    scenarios per second, so process start-up dominates below a few million samples;
+    raise it for very large runs or heavier labelers.
+    """
+    return max(1, int(os.getenv("TRAINING_DATA_WORKERS", 1)))
+
+
+def generate_training_shards(profile: ScenarioProfile, labeler, n_samples: int,
+                             shard_size: int = 5000,
+                             workers: Optional[int] = None,
+                             seed: Optional[int] = None,
+                             output_dir: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Generate n_samples in shards of shard_size. Each shard gets its own child of one
+    SeedSequence, so output depends only on the seed, never on the worker count.
+    Returns the manifest and, when output_dir is None, the shards in memory.
+    """
+    start = time.perf_counter()
+    workers = workers or default_workers()
+    sizes = [shard_size] * (n_samples // shard_size)
+    if n_samples % shard_size:
+        sizes.append(n_samples % shard_size)
+
+    root_seed = np.random.SeedSequence(seed)
+    shard_seeds = root_seed.spawn(len(sizes))
+
+    paths = [None] * len(sizes)
+    if output_dir is not None:
+        os.makedirs(output_dir, exist_ok=True)
+        paths = [os.path.join(output_dir, f"shard_{i:05d}.npz") for i in range(len(sizes))]
+
+    jobs = [(profile, labeler, size, shard_seed, path)
+            for size, shard_seed, path in zip(sizes, shard_seeds, paths)]
+
+    if workers > 1 and len(jobs) > 1:
+        # spawn: never fork a process that may be running server threads
+        with ProcessPoolExecutor(max_workers=min(workers, len(jobs)),
+                                 mp_context=multiprocessing.get_context("spawn")) as pool:
+            shards = list(pool.map(_generate_shard_job, jobs))
+    else:
+        shards = [_generate_shard_job(job) for job in jobs]
+
+    elapsed = time.perf_counter() - start
+    manifest = {
+        'profile': profile.name,
+        'elements': profile.elements,
+        'crop_types': profile.crop_types,
+        'water_types': profile.water_types,
+        'fertilizer_names': labeler.fertilizer_names,
+        'quality_key': labeler.quality_key,
+        'samples': n_samples,
+        'shard_sizes': sizes,
+        'shard_files': [os.path.basename(p) for p in paths] if output_dir is not None else [],
+        'seed_entropy': str(root_seed.entropy),
+        'workers': min(workers, len(jobs)) if jobs else 0,
+        'seconds': round(elapsed, 3)
+    }
+    print(f"[DATA] Generated {n_samples:,} {profile.name} scenarios in {len(sizes)} shards "
+          f"({manifest['workers']} workers, {elapsed:.2f}s)")
+
+    if output_dir is not None:
+        with open(os.path.join(output_dir, "manifest.json"), "w") as f:
+            json.dump(manifest, f, indent=2)
+        return {'manifest': manifest, 'shards': None}
+    return {'manifest': manifest, 'shards': shards}
+
+
+def shard_to_scenarios(shard: Dict[str, np.ndarray], manifest: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Convert one shard to the scenario dicts the trainers consume"""
+    elements = manifest['elements']
+    names = manifest['fertilizer_names']
+    quality_key = manifest['quality_key']
+    scenarios = []
+    for row in range(len(shard['targets'])):
+        dosages = shard['dosages'][row]
+        scenario = {
+            'targets': dict(zip(elements, shard['targets'][row].tolist())),
+            'water': dict(zip(elements, shard['water'][row].tolist())),
+            'optimal_dosages': {names[f]: float(dosages[f]) for f in np.flatnonzero(dosages > 0)},
+            quality_key: float(shard['quality'][row]),
+            'crop_type': manifest['crop_types'][shard['crop_index'][row]],
+            'water_type': manifest['water_types'][shard['water_index'][row]]
+        }
+        if manifest['profile'] == 'enhanced':
+            scenario['fertilizer_set'] = names
+        scenarios.append(scenario)
+    return scenarios
+
+
+def iter_shards(directory: str) -> Iterator[Tuple[Dict[str, np.ndarray], Dict[str, Any]]]:
+    """Stream (arrays, manifest) for each shard written by generate_training_shards"""
+    with open(os.path.join(directory, "manifest.json")) as f:
+        manifest = json.load(f)
+    for filename in manifest['shard_files']:
+        with np.load(os.path.join(directory, filename)) as data:
+            yield {key: data[key] for key in data.files}, manifest
+
+
+def iter_training_scenarios(directory: str) -> Iterator[List[Dict[str, Any]]]:
+    """Stream scenario dicts shard by shard from disk"""
+    for shard, manifest in iter_shards(directory):
+        yield shard_to_scenarios(shard, manifest)
+
+
+def generate_training_scenarios(profile: ScenarioProfile, labeler, n_samples: int,
+                                workers: Optional[int] = None,
+                                seed: Optional[int] = None,
+                                shard_size: int = 5000) -> List[Dict[str, Any]]:
+    """In-memory convenience wrapper returning scenario dicts"""
+    result = generate_training_shards(profile, labeler, n_samples, shard_size, workers, seed)
+    scenarios = []
+    for shard in result['shards']:
+        scenarios.extend(shard_to_scenarios(shard, result['manifest']))
+    return scenarios
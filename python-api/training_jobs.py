@@ -0,0 +1,366 @@
+# training_jobs.py
+"""
+Training Jobs Module
+Runs ML training (data generation + model fitting) as a background job in a separate
+process, so the API event loop and its worker threads never share a CPU-bound fit.
+Jobs report progress, can be cancelled, run under thread / priority / memory limits and
+register their model without promoting it; a better model is marked 'promotion_pending'
+and promoted by on_complete only once the job has completed, never after a cancel or timeout.
+Feedback retrain-and-compare cycles (FeedbackTrainer) run through the same manager.
+"""
+
+import multiprocessing
+import os
+import queue
+import threading
+import time
+import traceback
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Any
+
+from training_workers import limit_worker_threads
+
+# Fertilizers the synthetic training scenarios are labeled with
+DEFAULT_TRAINING_FERTILIZERS = [
+    'nitrato de calcio', 'nitrato de potasio', 'fosfato monopotasico', 'sulfato de magnesio'
+]
+
+FINISHED_STATES = ('completed', 'failed', 'cancelled', 'timeout')
+
+
+class JobNotFound(KeyError):
+    """Raised for an unknown training job id"""
+
+
+class TrainingJobConflict(RuntimeError):
+    """Raised when a training job is submitted while another one is still running"""
+
+
+# ------------------------------------------------------------------
+# CHILD PROCESS
+# ------------------------------------------------------------------
+
+def _apply_resource_limits(limits: Dict[str, Any]):
+    """Thread, priority and address-space limits for the training process"""
+    limit_worker_threads(int(limits.get('cpu_threads', 2)))
+
+    if limits.get('nice'):
+        try:
+            os.nice(int(limits['nice']))
+        except (AttributeError, OSError):
+            pass
+
+    if limits.get('max_memory_mb'):
+        try:
+            import resource
+            limit = int(limits['max_memory_mb']) * 1024 * 1024
+            resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+        except (ImportError, ValueError, OSError) as e:
+            # resource is POSIX only
+            print(f"[JOBS] Memory limit not applied: {e}")
+
+
+def _training_job_main(params: Dict[str, Any], events) -> None:
+    """Entry point of the training process; every update goes back through the events queue"""
+    def send(event_type: str, **data):
+        events.put(dict(data, type=event_type, at=time.time()))
+
+    try:
+        _apply_resource_limits(params.get('limits', {}))
+
+        send('progress', stage='loading')
+        from fertilizer_database import get_fertilizer_database
+        from ml_optimizer import ProfessionalMLFertilizerOptimizer
+        from models import MLModelConfig
+
+        fertilizer_db = get_fertilizer_database()
+        fertilizers = [fertilizer_db.create_fertilizer_from_database(name)
+                       for name in params.get('fertilizers') or DEFAULT_TRAINING_FERTILIZERS]
+        fertilizers = [f for f in fertilizers if f is not None]
+
+        ml_optimizer = ProfessionalMLFertilizerOptimizer(
+            MLModelConfig(model_type=params['model_type']), auto_load=False)
+
+        send('progress', stage='generating_data', samples_total=params['n_samples'])
+        training_data = ml_optimizer.generate_real_training_data(
+            fertilizers=fertilizers, num_scenarios=params['n_samples'], seed=params.get('seed'))
+        send('progress', stage='training', samples_generated=len(training_data))
+
+        training_results = ml_optimizer.train_model(
+            training_data=training_data, fertilizers=fertilizers,
+            progress=lambda update: send('progress', **update), defer_promotion=True)
+
+        send('result',
+             training_results=training_results,
+             model_ready=ml_optimizer.is_trained,
+             training_samples=len(training_data),
+             registration=dict(ml_optimizer.last_registration or {}))
+    except BaseException as e:
+        send('error', error=f"{type(e).__name__}: {e}", traceback=traceback.format_exc())
+
+
+def _feedback_job_main(params: Dict[str, Any], events) -> None:
+    """Entry point of a feedback training process: one FeedbackTrainer.train_cycle over the solution log"""
+    def send(event_type: str, **data):
+        events.put(dict(data, type=event_type, at=time.time()))
+
+    try:
+        _apply_resource_limits(params.get('limits', {}))
+
+        send('progress', stage='loading')
+        from feedback_trainer import FeedbackTrainer
+        from solution_log import SolutionLog
+
+        trainer = FeedbackTrainer(SolutionLog(params['log_directory']), **params['settings'])
+        send('progress', stage='training')
+        feedback = trainer.train_cycle(force=params['force'], trained_through=params['trained_through'],
+                                       defer_promotion=True)
+
+        registration = feedback.get('registration') or {}
+        send('result',
+             feedback=feedback,
+             model_ready=bool(registration.get('promotion_pending')),
+             registration=dict(registration))
+    except BaseException as e:
+        send('error', error=f"{type(e).__name__}: {e}", traceback=traceback.format_exc())
+
+
+# ------------------------------------------------------------------
+# JOB MANAGER (API PROCESS)
+# ------------------------------------------------------------------
+
+class TrainingJobManager:
+    """One training process at a time, tracked by job id; keeps the most recent jobs"""
+
+    def __init__(self,
+                 timeout_seconds: float = 1800,
+                 cpu_threads: int = 2,
+                 max_memory_mb: int = 0,
+                 nice: int = 10,
+                 max_jobs_kept: int = 50,
+                 on_complete: Optional[Callable[[Dict[str, Any]], Any]] = None):
+        self.timeout_seconds = timeout_seconds
+        self.limits = {'cpu_threads': cpu_threads, 'max_memory_mb': max_memory_mb, 'nice': nice}
+        self.max_jobs_kept = max_jobs_kept
+        self.on_complete = on_complete
+
+        # spawn, not fork: the API process runs threads (warmup, writers) that fork would copy mid-lock
+        self._context = multiprocessing.get_context("spawn")
+        self._jobs: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._processes: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    # SUBMIT / CANCEL
+    # ------------------------------------------------------------------
+
+    def active_job(self) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            for job in self._jobs.values():
+                if job['status'] not in FINISHED_STATES:
+                    return dict(job)
+        return None
+
+    def submit(self, n_samples: int, model_type: str, seed: Optional[int] = None) -> Dict[str, Any]:
+        """Start a training process; raises TrainingJobConflict if one is already running"""
+        job = self._start('synthetic', _training_job_main,
+                          {'n_samples': n_samples, 'model_type': model_type, 'seed': seed},
+                          {'stage': 'queued', 'samples_total': n_samples, 'samples_generated': 0,
+                           'estimators_fitted': 0, 'estimators_total': None})
+        print(f"[JOBS] Training job {job['job_id']} started "
+              f"(pid {job['pid']}, {model_type}, {n_samples} samples)")
+        return job
+
+    def submit_feedback(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Start a feedback training cycle (see FeedbackTrainer.job_params); same conflict rule as submit"""
+        job = self._start('feedback', _feedback_job_main, params, {'stage': 'queued'})
+        print(f"[JOBS] Feedback training job {job['job_id']} started "
+              f"(pid {job['pid']}, {params['settings']['model_type']})")
+        return job
+
+    def _start(self, kind: str, target: Callable, params: Dict[str, Any],
+               progress: Dict[str, Any]) -> Dict[str, Any]:
+        with self._lock:
+            running = [j for j in self._jobs.values() if j['status'] not in FINISHED_STATES]
+            if running:
+                raise TrainingJobConflict(running[0]['job_id'])
+
+            job_id = uuid.uuid4().hex[:12]
+            job = {
+                'job_id': job_id,
+                'kind': kind,
+                'status': 'queued',
+                'params': params,
+                'limits': dict(self.limits, timeout_seconds=self.timeout_seconds),
+                'created_at': datetime.now().isoformat(),
+                'started_at': None,
+                'finished_at': None,
+                'progress': progress,
+                'result': None,
+                'error': None,
+                'cancel_requested': False
+            }
+            self._jobs[job_id] = job
+            self._trim()
+
+        events = self._context.Queue()
+        process = self._context.Process(
+            target=target,
+            args=(dict(params, limits=self.limits), events),
+            name=f"ml-training-{job_id}",
+            daemon=True
+        )
+        process.start()
+        with self._lock:
+            self._processes[job_id] = process
+            job.update(status='running', started_at=datetime.now().isoformat(), pid=process.pid)
+
+        threading.Thread(target=self._monitor, args=(job_id, process, events),
+                         name=f"ml-training-monitor-{job_id}", daemon=True).start()
+        return self.get(job_id)
+
+    def cancel(self, job_id: str) -> Dict[str, Any]:
+        """Terminate a running job; finished jobs are returned unchanged"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                raise JobNotFound(job_id)
+            process = self._processes.get(job_id)
+            if job['status'] in FINISHED_STATES or process is None:
+                return dict(job)
+            job['cancel_requested'] = True
+        process.terminate()
+        print(f"[JOBS] Cancelling training job {job_id}")
+        return self.get(job_id)
+
+    # ------------------------------------------------------------------
+    # MONITOR
+    # ------------------------------------------------------------------
+
+    def _monitor(self, job_id: str, process, events):
+        deadline = time.monotonic() + self.timeout_seconds
+        outcome: Optional[Dict[str, Any]] = None
+        timed_out = False
+
+        while True:
+            try:
+                event = events.get(timeout=0.5)
+            except queue.Empty:
+                if not process.is_alive():
+                    break
+                if time.monotonic() > deadline:
+                    timed_out = True
+                    process.terminate()
+                    break
+                continue
+            if event['type'] == 'progress':
+                self._update_progress(job_id, event)
+            else:
+                outcome = event
+
+        process.join(10)
+        if process.is_alive():
+            process.kill()
+            process.join()
+        # Events still buffered when the process exited
+        while outcome is None:
+            try:
+                event = events.get(timeout=0.1)
+            except queue.Empty:
+                break
+            if event['type'] == 'progress':
+                self._update_progress(job_id, event)
+            else:
+                outcome = event
+        events.close()
+
+        with self._lock:
+            job = self._jobs[job_id]
+            self._processes.pop(job_id, None)
+            update = {'status': 'completed', 'error': None}
+            if job['cancel_requested']:
+                update['status'] = 'cancelled'
+            elif timed_out:
+                update.update(status='timeout', error=f"exceeded {self.timeout_seconds:.0f}s")
+            elif outcome is None:
+                update.update(status='failed', error=f"training process exited with code {process.exitcode}")
+            elif outcome['type'] == 'error':
+                update.update(status='failed', error=outcome['error'])
+            else:
+                job['result'] = {k: v for k, v in outcome.items() if k not in ('type', 'at')}
+
+        # Promote and install the model before the job reads as completed, so waiters see it serving;
+        # a cancelled or timed-out job leaves its registered version unpromoted
+        if update['status'] == 'completed' and self.on_complete is not None:
+            job['progress']['stage'] = 'installing'
+            try:
+                self.on_complete(dict(job))
+            except Exception as e:
+                job['result']['install_error'] = str(e)
+                print(f"[JOBS] Could not install model from job {job_id}: {e}")
+
+        with self._lock:
+            if update['status'] == 'completed':
+                job['progress']['stage'] = 'done'
+            job.update(update, finished_at=datetime.now().isoformat())
+        print(f"[JOBS] Training job {job_id} {update['status']}"
+              + (f": {update['error']}" if update['error'] else ""))
+
+    def _update_progress(self, job_id: str, event: Dict[str, Any]):
+        with self._lock:
+            progress = self._jobs[job_id]['progress']
+            progress.update({k: v for k, v in event.items() if k not in ('type', 'at')})
+            progress['updated_at'] = datetime.fromtimestamp(event['at']).isoformat()
+
+    def _trim(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job['status'] in FINISHED_STATES]
+        while len(self._jobs) > self.max_jobs_kept and finished:
+            del self._jobs[finished.pop(0)]
+
+    # ------------------------------------------------------------------
+    # QUERIES
+    # ------------------------------------------------------------------
+
+    def get(self, job_id: str) -> Dict[str, Any]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                raise JobNotFound(job_id)
+            return {k: (dict(v) if isinstance(v, dict) else v) for k, v in job.items()}
+
+    def list_jobs(self) -> List[Dict[str, Any]]:
+        """Jobs newest first, without the (large) training results"""
+        with self._lock:
+            jobs = list(self._jobs.values())
+        return [{k: v for k, v in job.items() if k != 'result'} for job in reversed(jobs)]
+
+    def wait(self, job_id: str, timeout: Optional[float] = None, poll_seconds: float = 0.5) -> Dict[str, Any]:
+        """Block until the job finishes (or the timeout passes) and return its state"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            job = self.get(job_id)
+            if job['status'] in FINISHED_STATES or (deadline is not None and time.monotonic() > deadline):
+                return job
+            time.sleep(poll_seconds)
+
+    def shutdown(self):
+        """Terminate any running training process (API shutdown)"""
+        with self._lock:
+            running = [job_id for job_id, job in self._jobs.items() if job['status'] not in FINISHED_STATES]
+        for job_id in running:
+            self.cancel(job_id)
+
+
+def create_training_job_manager_from_env(
+        on_complete: Optional[Callable[[Dict[str, Any]], Any]] = None) -> TrainingJobManager:
+    """Build the manager from ML_TRAINING_* environment variables"""
+    return TrainingJobManager(
+        timeout_seconds=float(os.getenv("ML_TRAINING_TIMEOUT_SECONDS", 1800)),
+        cpu_threads=int(os.getenv("ML_TRAINING_CPU_THREADS", 2)),
+        max_memory_mb=int(os.getenv("ML_TRAINING_MAX_MEMORY_MB", 0)),
+        nice=int(os.getenv("ML_TRAINING_NICE", 10)),
+        max_jobs_kept=int(os.getenv("ML_TRAINING_MAX_JOBS_KEPT", 50)),
+        on_complete=on_complete
+    )
@@ -0,0 +1,170 @@
+# training_workers.py
+"""
+Training Workers Module
+Runs candidate model fits in worker processes that can actually be terminated, under a
+per-candidate timeout and a global time budget, optionally pinned to CPUs. Once one
+candidate satisfies the caller's stop condition the remaining ones are terminated.
+"""
+
+import multiprocessing
+import os
+import queue
+import time
+import traceback
+from typing import Callable, Dict, List, Optional, Any, Sequence, Tuple
+
+THREAD_ENV_VARS = ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS", "LOKY_MAX_CPU_COUNT")
+
+
+def limit_worker_threads(threads: int):
+    """Cap BLAS / OpenMP threads in this process (env for new pools, threadpoolctl for loaded ones)"""
+    for var in THREAD_ENV_VARS:
+        os.environ[var] = str(threads)
+    try:
+        from threadpoolctl import threadpool_limits
+        threadpool_limits(limits=threads)
+    except ImportError:
+        pass
+
+
+def pin_to_cpus(cpu_ids: Optional[Sequence[int]]) -> bool:
+    """Pin this process to the given CPUs (Linux only); returns whether pinning was applied"""
+    if not cpu_ids or not hasattr(os, "sched_setaffinity"):
+        return False
+    try:
+        os.sched_setaffinity(0, set(cpu_ids))
+        return True
+    except OSError:
+        return False
+
+
+def available_cpus() -> List[int]:
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def _candidate_worker(fn: Callable, name: str, args: Tuple, threads: int,
+                      cpu_ids: Optional[List[int]], results) -> None:
+    limit_worker_threads(threads)
+    pin_to_cpus(cpu_ids)
+    start = time.perf_counter()
+    try:
+        results.put((name, 'success', fn(*args), time.perf_counter() - start))
+    except BaseException as e:
+        results.put((name, 'error', f"{type(e).__name__}: {e}\n{traceback.format_exc()}",
+                     time.perf_counter() - start))
+
+
+class CandidatePool:
+    """
+    Each candidate is fn(*args) in its own spawned process. Outcomes are dicts with
+    name, status (success / error / timeout / budget_exceeded / stopped / skipped),
+    result (success only), error and seconds. fn and args must be picklable.
+    """
+
+    def __init__(self,
+                 max_workers: int = 0,
+                 threads_per_worker: int = 1,
+                 pin_cpus: bool = False,
+                 poll_seconds: float = 0.2):
+        cpus = available_cpus()
+        self.threads_per_worker = max(1, threads_per_worker)
+        self.max_workers = max_workers or max(1, len(cpus) // self.threads_per_worker)
+        self.pin_cpus = pin_cpus
+        self.poll_seconds = poll_seconds
+        self._cpus = cpus
+        self._context = multiprocessing.get_context("spawn")
+
+    def _cpu_slot(self, slot: int) -> Optional[List[int]]:
+        if not self.pin_cpus:
+            return None
+        width = self.threads_per_worker
+        start = (slot * width) % len(self._cpus)
+        return [self._cpus[(start + i) % len(self._cpus)] for i in range(width)]
+
+    def run(self,
+            fn: Callable,
+            candidates: List[Tuple[str, Tuple]],
+            timeout_seconds: Optional[float] = None,
+            time_budget_seconds: Optional[float] = None,
+            stop_when: Optional[Callable[[str, Any], bool]] = None) -> List[Dict[str, Any]]:
+        """Run every candidate (up to max_workers at a time); returns outcomes in candidate order"""
+        results = self._context.Queue()
+        pending = list(candidates)
+        running: Dict[str, Dict[str, Any]] = {}
+        outcomes: Dict[str, Dict[str, Any]] = {}
+        free_slots = list(range(self.max_workers))
+        budget_deadline = None if time_budget_seconds is None else time.monotonic() + time_budget_seconds
+        stopped = False
+
+        def finish(name: str, status: str, result: Any = None, error: Optional[str] = None,
+                   seconds: Optional[float] = None):
+            worker = running.pop(name, None)
+            if worker is not None:
+                if status != 'success' and status != 'error':
+                    worker['process'].terminate()
+                worker['process'].join(5)
+                if worker['process'].is_alive():
+                    worker['process'].kill()
+                    worker['process'].join()
+                free_slots.append(worker['slot'])
+                if seconds is None:
+                    seconds = time.monotonic() - worker['started']
+            outcomes[name] = {'name': name, 'status': status, 'result': result,
+                              'error': error, 'seconds': round(seconds or 0.0, 2)}
+
+        try:
+            while pending or running:
+                # Start candidates while there are free worker slots
+                while pending and free_slots and not stopped:
+                    name, args = pending.pop(0)
+                    slot = free_slots.pop(0)
+                    process = self._context.Process(
+                        target=_candidate_worker,
+                        args=(fn, name, args, self.threads_per_worker, self._cpu_slot(slot), results),
+                        name=f"candidate-{name}", daemon=True)
+                    process.start()
+                    running[name] = {'process': process, 'slot': slot, 'started': time.monotonic()}
+
+                if stopped or (budget_deadline is not None and time.monotonic() > budget_deadline):
+                    status = 'stopped' if stopped else 'budget_exceeded'
+                    for name in list(running):
+                        finish(name, status)
+                    for name, _ in pending:
+                        outcomes[name] = {'name': name, 'status': 'skipped' if stopped else status,
+                                          'result': None, 'error': None, 'seconds': 0.0}
+                    pending = []
+                    break
+
+                try:
+                    name, status, payload, seconds = results.get(timeout=self.poll_seconds)
+                except queue.Empty:
+                    now = time.monotonic()
+                    for name, worker in list(running.items()):
+                        if timeout_seconds is not None and now - worker['started'] > timeout_seconds:
+                            finish(name, 'timeout', error=f"exceeded {timeout_seconds:.0f}s")
+                        elif not worker['process'].is_alive():
+                            # A result may still be in the pipe; give it a moment before calling it lost
+                            worker.setdefault('exited', now)
+                            if now - worker['exited'] > 1.0:
+                                # Died without reporting (killed, out of memory)
+                                finish(name, 'error',
+                                       error=f"worker exited with code {worker['process'].exitcode}")
+                    continue
+
+                if name not in running:
+                    # Late result of a candidate that was already timed out
+                    continue
+                if status == 'success':
+                    finish(name, 'success', result=payload, seconds=seconds)
+                    if stop_when is not None and stop_when(name, payload):
+                        stopped = True
+                else:
+                    finish(name, 'error', error=payload, seconds=seconds)
+        finally:
+            for name in list(running):
+                finish(name, 'stopped')
+            results.close()
+
+        return [outcomes[name] for name, _ in candidates if name in outcomes]
@@ -4,9 +4,90 @@ COMPLETE VERIFICATION ANALYZER MODULE
 Solution verification and cost analysis with professional algorithms
 """
 
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Sequence, Tuple
+from dataclasses import dataclass
 import math
 import datetime
+import threading
+
+import numpy as np
+
+from fertilizer_matcher import PatternAutomaton, NO_MATCH, normalize_name
+from element_registry import CATION_ELEMENTS, ANION_ELEMENTS, MG_PER_MEQ, mg_per_meq
+
+# Status codes of the array verifier, indexes into these tables; recommendations take the nutrient / ratio name
+NUTRIENT_STATUSES = (
+    ("Excellent", "DarkGreen", "{} concentration is excellent and within optimal range"),
+    ("Good", "Green", "{} concentration is within acceptable range"),
+    ("High", "Orange", "{} slightly elevated. Monitor for potential toxicity"),
+    ("Low", "Orange", "{} slightly low. Consider increasing fertilizer"),
+    ("High", "Orange", "{} dangerously high. Reduce fertilizer immediately and dilute solution"),
+    ("Deviation High", "Red", "{} dangerously high. Reduce fertilizer immediately and dilute solution"),
+    ("Low", "Yellow", "{} critically low. Increase fertilizer significantly"),
+    ("Deviation Low", "Red", "{} critically low. Increase fertilizer significantly"),
+)
+RATIO_STATUSES = (
+    ("Excellent", "DarkGreen", "{} ratio is optimal"),
+    ("Good", "Green", "{} ratio is within acceptable range"),
+    ("Caution", "Orange", "{} ratio is outside optimal range but manageable"),
+    ("Imbalanced", "Red", "{} ratio is severely imbalanced and requires correction"),
+)
+BALANCE_STATUSES = (
+    ("Excellent", "DarkGreen", "Ionic balance is excellent. No adjustment needed."),
+    ("Good", "Green", "Ionic balance is acceptable. Minor adjustments may improve stability."),
+    ("Caution", "Orange", "Ionic balance is outside optimal range. Review fertilizer ratios."),
+    ("Poor", "Red", "Ionic balance is poor. Significant fertilizer adjustment required."),
+    ("Critical", "DarkRed", "Ionic balance is critically imbalanced. Complete formulation review needed."),
+)
+BALANCE_LIMITS = np.array([5.0, 10.0, 15.0, 25.0])
+UNDEFINED = -1
+
+# (ratio key, label, numerator, denominator, basis)
+IONIC_RATIOS = (
+    ('K_Ca', 'K:Ca Ratio (meq/L)', 'K', 'Ca', 'meq'),
+    ('Ca_Mg', 'Ca:Mg Ratio (meq/L)', 'Ca', 'Mg', 'meq'),
+    ('K_Mg', 'K:Mg Ratio (meq/L)', 'K', 'Mg', 'meq'),
+    ('N_K', 'N:K Ratio (mg/L)', 'N', 'K', 'mg'),
+)
+
+
+@dataclass
+class VerificationBatch:
+    """
+    Scores of many candidate solutions: nutrient arrays are (candidates x nutrients),
+    ratio arrays (candidates x ratios), balance arrays (candidates,). Status codes index
+    NUTRIENT_STATUSES / RATIO_STATUSES / BALANCE_STATUSES; UNDEFINED marks a ratio whose
+    denominator is zero (its value is NaN).
+    """
+    nutrients: Tuple[str, ...]
+    deviation: np.ndarray
+    percentage_deviation: np.ndarray
+    status_codes: np.ndarray
+    min_acceptable: np.ndarray
+    max_acceptable: np.ndarray
+    average_deviation_percent: np.ndarray
+    ratio_names: Tuple[str, ...]
+    ratios: np.ndarray
+    ratio_status_codes: np.ndarray
+    cation_sum: np.ndarray
+    anion_sum: np.ndarray
+    balance_difference_percentage: np.ndarray
+    balance_status_codes: np.ndarray
+
+    @property
+    def candidates(self) -> int:
+        return self.deviation.shape[0]
+
+    def status_labels(self) -> np.ndarray:
+        return np.array([status for status, _, _ in NUTRIENT_STATUSES])[self.status_codes]
+
+    def balance_labels(self) -> np.ndarray:
+        return np.array([status for status, _, _ in BALANCE_STATUSES])[self.balance_status_codes]
+
+    def acceptable_counts(self) -> np.ndarray:
+        """Nutrients per candidate rated Excellent or Good"""
+        return np.count_nonzero(self.status_codes <= 1, axis=1)
+
 
 class SolutionVerifier:
     """Professional solution verification module"""
@@ -44,6 +125,128 @@ class SolutionVerifier:
             'N_K': {'min': 0.6, 'max': 1.2, 'optimal': 0.75}
         }
 
+    # ------------------------------------------------------------------
+    # ARRAY VERIFICATION
+    # ------------------------------------------------------------------
+
+    def verify_batch(self, nutrients: Sequence[str], final_mg: Any, targets: Any,
+                     final_meq: Any = None) -> VerificationBatch:
+        """
+        Score candidate solutions in one pass. final_mg is (candidates x nutrients) in mg/L,
+        targets (nutrients,) or (candidates x nutrients); final_meq, same shape as final_mg,
+        defaults to the MG_PER_MEQ conversion of final_mg.
+        """
+        nutrients = tuple(nutrients)
+        final_mg = np.atleast_2d(np.asarray(final_mg, dtype=float))
+        targets = np.broadcast_to(np.asarray(targets, dtype=float), final_mg.shape)
+        if final_meq is None:
+            final_meq = self._meq_matrix(nutrients, final_mg)
+        else:
+            final_meq = np.atleast_2d(np.asarray(final_meq, dtype=float))
+
+        deviation, percentage, codes, min_acceptable, max_acceptable = self.score_nutrients(
+            nutrients, final_mg, targets)
+        # Percentage deviation is 0 for untargeted nutrients; average over the targeted ones
+        targeted_count = np.count_nonzero(targets > 0, axis=1)
+        average = percentage.sum(axis=1) / np.maximum(targeted_count, 1)
+        ratios, ratio_codes = self.score_ratios(nutrients, final_meq, final_mg)
+        cation_sum, anion_sum, balance_percentage, balance_codes = self.score_balance(nutrients, final_meq)
+
+        return VerificationBatch(
+            nutrients=nutrients,
+            deviation=deviation,
+            percentage_deviation=percentage,
+            status_codes=codes,
+            min_acceptable=min_acceptable,
+            max_acceptable=max_acceptable,
+            average_deviation_percent=average,
+            ratio_names=tuple(key for key, _, _, _, _ in IONIC_RATIOS),
+            ratios=ratios,
+            ratio_status_codes=ratio_codes,
+            cation_sum=cation_sum,
+            anion_sum=anion_sum,
+            balance_difference_percentage=balance_percentage,
+            balance_status_codes=balance_codes
+        )
+
+    def score_nutrients(self, nutrients: Sequence[str], final: np.ndarray,
+                        targets: np.ndarray) -> Tuple[np.ndarray, ...]:
+        """deviation, percentage deviation, status codes, min and max acceptable arrays"""
+        final = np.atleast_2d(np.asarray(final, dtype=float))
+        targets = np.broadcast_to(np.asarray(targets, dtype=float), final.shape)
+        tolerance = np.array([self.nutrient_ranges[n]['tolerance'] if n in self.nutrient_ranges else 0.15
+                              for n in nutrients], dtype=float)
+        optimal = np.array([self.nutrient_ranges[n]['optimal'] if n in self.nutrient_ranges else np.nan
+                            for n in nutrients], dtype=float)
+        optimal = np.where(np.isnan(optimal), targets, optimal)
+
+        deviation = final - targets
+        min_acceptable = targets * (1 - tolerance)
+        max_acceptable = targets * (1 + tolerance)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            percentage = np.where(targets > 0, np.abs(deviation) / targets * 100, 0.0)
+            excellent = np.abs(final - optimal) / optimal <= 0.05
+        acceptable = (min_acceptable <= final) & (final <= max_acceptable)
+        moderate = (targets * 0.7 <= final) & (final <= targets * 1.3)
+
+        codes = np.select(
+            [excellent, acceptable, moderate & (final > max_acceptable), moderate,
+             final > targets * 1.5, final > targets * 1.3, final < targets * 0.5],
+            [0, 1, 2, 3, 5, 4, 7],
+            default=6
+        )
+        return deviation, percentage, codes, min_acceptable, max_acceptable
+
+    def score_ratios(self, nutrients: Sequence[str], final_meq: np.ndarray,
+                     final_mg: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """(candidates x IONIC_RATIOS) ratios and status codes"""
+        final_meq = np.atleast_2d(np.asarray(final_meq, dtype=float))
+        final_mg = np.atleast_2d(np.asarray(final_mg, dtype=float))
+        index = {nutrient: i for i, nutrient in enumerate(nutrients)}
+        zeros = np.zeros(final_meq.shape[0])
+        ratios = np.empty((final_meq.shape[0], len(IONIC_RATIOS)))
+        codes = np.empty(ratios.shape, dtype=int)
+
+        for r, (key, _, numerator, denominator, basis) in enumerate(IONIC_RATIOS):
+            matrix = final_meq if basis == 'meq' else final_mg
+            top = matrix[:, index[numerator]] if numerator in index else zeros
+            bottom = matrix[:, index[denominator]] if denominator in index else zeros
+            with np.errstate(divide='ignore', invalid='ignore'):
+                ratio = np.where(bottom > 0, top / bottom, np.nan)
+            info = self.ionic_ratios[key]
+            ratios[:, r] = ratio
+            codes[:, r] = np.select(
+                [np.isnan(ratio),
+                 np.abs(ratio - info['optimal']) / info['optimal'] <= 0.10,
+                 (info['min'] <= ratio) & (ratio <= info['max']),
+                 (info['min'] * 0.8 <= ratio) & (ratio <= info['max'] * 1.2)],
+                [UNDEFINED, 0, 1, 2],
+                default=3
+            )
+        return ratios, codes
+
+    def score_balance(self, nutrients: Sequence[str], final_meq: np.ndarray) -> Tuple[np.ndarray, ...]:
+        """cation sum, anion sum, balance error % and balance status codes per candidate"""
+        final_meq = np.atleast_2d(np.asarray(final_meq, dtype=float))
+        cations = np.array([n in CATION_ELEMENTS for n in nutrients], dtype=bool)
+        anions = np.array([n in ANION_ELEMENTS for n in nutrients], dtype=bool)
+        cation_sum = final_meq[:, cations].sum(axis=1)
+        anion_sum = final_meq[:, anions].sum(axis=1)
+        total = cation_sum + anion_sum
+        with np.errstate(divide='ignore', invalid='ignore'):
+            percentage = np.where(total > 0, np.abs(cation_sum - anion_sum) / (total / 2) * 100, 0.0)
+        codes = np.searchsorted(BALANCE_LIMITS, percentage, side='left')
+        return cation_sum, anion_sum, percentage, codes
+
+    def _meq_matrix(self, nutrients: Sequence[str], final_mg: np.ndarray) -> np.ndarray:
+        divisors = mg_per_meq(tuple(nutrients))
+        with np.errstate(invalid='ignore'):
+            return np.where(~np.isnan(divisors) & (final_mg > 0), final_mg / divisors, 0.0)
+
+    # ------------------------------------------------------------------
+    # DICT API
+    # ------------------------------------------------------------------
+
     def verify_concentrations(self, target_concentrations: Dict[str, float], 
                             final_concentrations: Dict[str, float]) -> List[Dict[str, Any]]:
         """
@@ -53,91 +256,45 @@ class SolutionVerifier:
         print(f"Target parameters: {len(target_concentrations)}")
         print(f"Final parameters: {len(final_concentrations)}")
         
-        results = []
+        nutrients = [nutrient for nutrient in target_concentrations if nutrient in final_concentrations]
+        deviation, percentage, codes, min_acceptable, max_acceptable = self.score_nutrients(
+            nutrients,
+            [[final_concentrations[nutrient] for nutrient in nutrients]],
+            [target_concentrations[nutrient] for nutrient in nutrients]
+        )
 
-        for nutrient, target in target_concentrations.items():
-            if nutrient in final_concentrations:
-                final = final_concentrations[nutrient]
-                deviation = final - target
-                percentage_deviation = (abs(deviation) / target * 100) if target > 0 else 0
-
-                # Get nutrient-specific ranges
-                if nutrient in self.nutrient_ranges:
-                    ranges = self.nutrient_ranges[nutrient]
-                    tolerance = ranges['tolerance']
-                    min_acceptable = target * (1 - tolerance)
-                    max_acceptable = target * (1 + tolerance)
-                    optimal = ranges['optimal']
-                else:
-                    # Default ranges for unknown nutrients
-                    tolerance = 0.15
-                    min_acceptable = target * (1 - tolerance)
-                    max_acceptable = target * (1 + tolerance)
-                    optimal = target
-
-                # Determine status and color
-                status, color, recommendation = self._evaluate_nutrient_status(
-                    final, target, min_acceptable, max_acceptable, optimal, nutrient
-                )
-
-                result = {
-                    'parameter': nutrient,
-                    'target_value': round(target, 2),
-                    'actual_value': round(final, 2),
-                    'unit': 'mg/L',
-                    'deviation': round(deviation, 2),
-                    'percentage_deviation': round(percentage_deviation, 1),
-                    'status': status,
-                    'color': color,
-                    'recommendation': recommendation,
-                    'min_acceptable': round(min_acceptable, 2),
-                    'max_acceptable': round(max_acceptable, 2),
-                    'optimal_range': f"{ranges['min']}-{ranges['max']}" if nutrient in self.nutrient_ranges else f"{target*0.8:.0f}-{target*1.2:.0f}"
-                }
+        results = []
+        for j, nutrient in enumerate(nutrients):
+            target = target_concentrations[nutrient]
+            final = final_concentrations[nutrient]
+            percentage_deviation = float(percentage[0, j])
+            status, color, recommendation = NUTRIENT_STATUSES[codes[0, j]]
+            ranges = self.nutrient_ranges.get(nutrient)
 
-                results.append(result)
-                
-                # Log significant deviations
-                if percentage_deviation > 20:
-                    print(f"  [WARNING]  {nutrient}: {percentage_deviation:.1f}% deviation ({status})")
-                elif percentage_deviation > 10:
-                    print(f"  [FORM] {nutrient}: {percentage_deviation:.1f}% deviation")
+            results.append({
+                'parameter': nutrient,
+                'target_value': round(target, 2),
+                'actual_value': round(final, 2),
+                'unit': 'mg/L',
+                'deviation': round(float(deviation[0, j]), 2),
+                'percentage_deviation': round(percentage_deviation, 1),
+                'status': status,
+                'color': color,
+                'recommendation': recommendation.format(nutrient),
+                'min_acceptable': round(float(min_acceptable[0, j]), 2),
+                'max_acceptable': round(float(max_acceptable[0, j]), 2),
+                'optimal_range': f"{ranges['min']}-{ranges['max']}" if ranges else f"{target*0.8:.0f}-{target*1.2:.0f}"
+            })
+            
+            # Log significant deviations
+            if percentage_deviation > 20:
+                print(f"  [WARNING]  {nutrient}: {percentage_deviation:.1f}% deviation ({status})")
+            elif percentage_deviation > 10:
+                print(f"  [FORM] {nutrient}: {percentage_deviation:.1f}% deviation")
 
         print(f"[SUCCESS] Verification completed for {len(results)} nutrients")
         return results
 
-    def _evaluate_nutrient_status(self, final: float, target: float, 
-                                min_acceptable: float, max_acceptable: float, 
-                                optimal: float, nutrient: str) -> tuple:
-        """
-        Evaluate nutrient status with professional criteria
-        """
-        # Excellent range (within 5% of optimal)
-        if abs(final - optimal) / optimal <= 0.05:
-            return "Excellent", "DarkGreen", f"{nutrient} concentration is excellent and within optimal range"
-        
-        # Good range (within acceptable limits)
-        elif min_acceptable <= final <= max_acceptable:
-            return "Good", "Green", f"{nutrient} concentration is within acceptable range"
-        
-        # Moderate deviation
-        elif target * 0.7 <= final <= target * 1.3:
-            if final > max_acceptable:
-                return "High", "Orange", f"{nutrient} slightly elevated. Monitor for potential toxicity"
-            else:
-                return "Low", "Orange", f"{nutrient} slightly low. Consider increasing fertilizer"
-        
-        # Critical deviation
-        else:
-            if final > target * 1.3:
-                severity = "Deviation High" if final > target * 1.5 else "High"
-                color = "Red" if severity == "Deviation High" else "Orange"
-                return severity, color, f"{nutrient} dangerously high. Reduce fertilizer immediately and dilute solution"
-            else:
-                severity = "Deviation Low" if final < target * 0.5 else "Low"
-                color = "Red" if severity == "Deviation Low" else "Yellow"
-                return severity, color, f"{nutrient} critically low. Increase fertilizer significantly"
-
     def verify_ionic_relationships(self, final_meq: Dict[str, float], 
                                  final_mmol: Dict[str, float], 
                                  final_mg: Dict[str, float]) -> List[Dict[str, Any]]:
@@ -146,150 +303,47 @@ class SolutionVerifier:
         """
         print(f"\n[?][?]  VERIFYING IONIC RELATIONSHIPS")
         
-        results = []
-
-        # K:Ca ratio (meq/L basis)
-        k_meq = final_meq.get('K', 0)
-        ca_meq = final_meq.get('Ca', 0)
-        
-        if ca_meq > 0:
-            k_ca_ratio = k_meq / ca_meq
-            ratio_info = self.ionic_ratios['K_Ca']
-            
-            status, color, recommendation = self._evaluate_ratio_status(
-                k_ca_ratio, ratio_info, "K:Ca", "meq/L ratio"
-            )
-            
-            results.append({
-                'relationship_name': 'K:Ca Ratio (meq/L)',
-                'actual_ratio': round(k_ca_ratio, 2),
-                'target_min': ratio_info['min'],
-                'target_max': ratio_info['max'],
-                'optimal': ratio_info['optimal'],
-                'unit': 'meq/L ratio',
-                'status': status,
-                'color': color,
-                'recommendation': recommendation
-            })
-
-        # Ca:Mg ratio (meq/L basis)
-        mg_meq = final_meq.get('Mg', 0)
-        
-        if mg_meq > 0:
-            ca_mg_ratio = ca_meq / mg_meq
-            ratio_info = self.ionic_ratios['Ca_Mg']
-            
-            status, color, recommendation = self._evaluate_ratio_status(
-                ca_mg_ratio, ratio_info, "Ca:Mg", "meq/L ratio"
-            )
-            
-            results.append({
-                'relationship_name': 'Ca:Mg Ratio (meq/L)',
-                'actual_ratio': round(ca_mg_ratio, 2),
-                'target_min': ratio_info['min'],
-                'target_max': ratio_info['max'],
-                'optimal': ratio_info['optimal'],
-                'unit': 'meq/L ratio',
-                'status': status,
-                'color': color,
-                'recommendation': recommendation
-            })
-
-        # K:Mg ratio (meq/L basis)
-        if mg_meq > 0:
-            k_mg_ratio = k_meq / mg_meq
-            ratio_info = self.ionic_ratios['K_Mg']
-            
-            status, color, recommendation = self._evaluate_ratio_status(
-                k_mg_ratio, ratio_info, "K:Mg", "meq/L ratio"
-            )
-            
-            results.append({
-                'relationship_name': 'K:Mg Ratio (meq/L)',
-                'actual_ratio': round(k_mg_ratio, 2),
-                'target_min': ratio_info['min'],
-                'target_max': ratio_info['max'],
-                'optimal': ratio_info['optimal'],
-                'unit': 'meq/L ratio',
-                'status': status,
-                'color': color,
-                'recommendation': recommendation
-            })
+        elements = ('K', 'Ca', 'Mg', 'N')
+        ratios, codes = self.score_ratios(
+            elements,
+            [[final_meq.get(element, 0) for element in elements]],
+            [[final_mg.get(element, 0) for element in elements]]
+        )
 
-        # N:K ratio (mg/L basis)
-        n_mg = final_mg.get('N', 0)
-        k_mg = final_mg.get('K', 0)
-        
-        if k_mg > 0:
-            n_k_ratio = n_mg / k_mg
-            ratio_info = self.ionic_ratios['N_K']
-            
-            status, color, recommendation = self._evaluate_ratio_status(
-                n_k_ratio, ratio_info, "N:K", "mg/L ratio"
-            )
-            
+        results = []
+        for r, (key, label, numerator, denominator, basis) in enumerate(IONIC_RATIOS):
+            if codes[0, r] == UNDEFINED:
+                continue
+            ratio_info = self.ionic_ratios[key]
+            status, color, recommendation = RATIO_STATUSES[codes[0, r]]
             results.append({
-                'relationship_name': 'N:K Ratio (mg/L)',
-                'actual_ratio': round(n_k_ratio, 2),
+                'relationship_name': label,
+                'actual_ratio': round(float(ratios[0, r]), 2),
                 'target_min': ratio_info['min'],
                 'target_max': ratio_info['max'],
                 'optimal': ratio_info['optimal'],
-                'unit': 'mg/L ratio',
+                'unit': f"{basis}/L ratio",
                 'status': status,
                 'color': color,
-                'recommendation': recommendation
+                'recommendation': recommendation.format(f"{numerator}:{denominator}")
             })
 
         print(f"[SUCCESS] Ionic relationship verification completed: {len(results)} ratios analyzed")
         return results
 
-    def _evaluate_ratio_status(self, actual_ratio: float, ratio_info: Dict[str, float], 
-                             ratio_name: str, unit: str) -> tuple:
-        """
-        Evaluate ionic ratio status
-        """
-        min_val = ratio_info['min']
-        max_val = ratio_info['max']
-        optimal = ratio_info['optimal']
-        
-        # Excellent (within 10% of optimal)
-        if abs(actual_ratio - optimal) / optimal <= 0.10:
-            return "Excellent", "DarkGreen", f"{ratio_name} ratio is optimal"
-        
-        # Good (within acceptable range)
-        elif min_val <= actual_ratio <= max_val:
-            return "Good", "Green", f"{ratio_name} ratio is within acceptable range"
-        
-        # Moderate imbalance
-        elif min_val * 0.8 <= actual_ratio <= max_val * 1.2:
-            return "Caution", "Orange", f"{ratio_name} ratio is outside optimal range but manageable"
-        
-        # Severe imbalance
-        else:
-            return "Imbalanced", "Red", f"{ratio_name} ratio is severely imbalanced and requires correction"
-
     def verify_ionic_balance(self, final_meq: Dict[str, float]) -> Dict[str, Any]:
         """
         Professional ionic balance verification with detailed analysis
         """
         print(f"\n[?][?]  VERIFYING IONIC BALANCE")
         
-        # Define cations and anions
-        cation_elements = ['Ca', 'K', 'Mg', 'Na', 'NH4', 'Fe', 'Mn', 'Zn', 'Cu']
-        anion_elements = ['N', 'S', 'Cl', 'P', 'HCO3', 'B', 'Mo']
-        
-        # Calculate sums
-        cation_sum = sum(final_meq.get(cation, 0) for cation in cation_elements)
-        anion_sum = sum(final_meq.get(anion, 0) for anion in anion_elements)
-        
-        # Calculate balance metrics
+        elements = CATION_ELEMENTS + ANION_ELEMENTS
+        cation_sums, anion_sums, percentages, codes = self.score_balance(
+            elements, [[final_meq.get(element, 0) for element in elements]])
+        cation_sum = float(cation_sums[0])
+        anion_sum = float(anion_sums[0])
         difference = abs(cation_sum - anion_sum)
-        total_ions = cation_sum + anion_sum
-        
-        if total_ions > 0:
-            difference_percentage = (difference / (total_ions / 2)) * 100
-        else:
-            difference_percentage = 0
+        difference_percentage = float(percentages[0])
         
         # Professional balance evaluation
         balance_status = self._evaluate_balance_status(difference_percentage)
@@ -307,8 +361,8 @@ class SolutionVerifier:
             'balance_status': balance_status['status'],
             'balance_color': balance_status['color'],
             'balance_recommendation': balance_status['recommendation'],
-            'cation_distribution': self._calculate_ion_distribution(final_meq, cation_elements),
-            'anion_distribution': self._calculate_ion_distribution(final_meq, anion_elements)
+            'cation_distribution': self._calculate_ion_distribution(final_meq, list(CATION_ELEMENTS)),
+            'anion_distribution': self._calculate_ion_distribution(final_meq, list(ANION_ELEMENTS))
         }
         
         print(f"Cation sum: {cation_sum:.2f} meq/L")
@@ -321,36 +375,9 @@ class SolutionVerifier:
         """
         Evaluate ionic balance status with professional criteria
         """
-        if difference_percentage <= 5.0:
-            return {
-                'status': 'Excellent',
-                'color': 'DarkGreen',
-                'recommendation': 'Ionic balance is excellent. No adjustment needed.'
-            }
-        elif difference_percentage <= 10.0:
-            return {
-                'status': 'Good',
-                'color': 'Green',
-                'recommendation': 'Ionic balance is acceptable. Minor adjustments may improve stability.'
-            }
-        elif difference_percentage <= 15.0:
-            return {
-                'status': 'Caution',
-                'color': 'Orange',
-                'recommendation': 'Ionic balance is outside optimal range. Review fertilizer ratios.'
-            }
-        elif difference_percentage <= 25.0:
-            return {
-                'status': 'Poor',
-                'color': 'Red',
-                'recommendation': 'Ionic balance is poor. Significant fertilizer adjustment required.'
-            }
-        else:
-            return {
-                'status': 'Critical',
-                'color': 'DarkRed',
-                'recommendation': 'Ionic balance is critically imbalanced. Complete formulation review needed.'
-            }
+        code = int(np.searchsorted(BALANCE_LIMITS, difference_percentage, side='left'))
+        status, color, recommendation = BALANCE_STATUSES[code]
+        return {'status': status, 'color': color, 'recommendation': recommendation}
 
     def _calculate_ion_distribution(self, final_meq: Dict[str, float], ion_list: List[str]) -> Dict[str, float]:
         """
@@ -388,39 +415,27 @@ class SolutionVerifier:
         nutrient_analysis = self.verify_concentrations(target_concentrations, achieved_concentrations)
         
         # 2. Calculate deviations and statistics
-        total_deviation = 0
-        nutrient_count = 0
-        excellent_count = 0
-        good_count = 0
-        poor_count = 0
-        
-        deviation_details = {}
-        
-        for nutrient in target_concentrations.keys():
-            target = target_concentrations[nutrient]
-            achieved = achieved_concentrations.get(nutrient, 0)
-            
-            if target > 0:
-                deviation_percent = abs((achieved - target) / target * 100)
-                total_deviation += deviation_percent
-                nutrient_count += 1
-                
-                deviation_details[nutrient] = {
-                    'target': target,
-                    'achieved': achieved,
-                    'deviation_percent': deviation_percent,
-                    'absolute_difference': achieved - target
-                }
-                
-                # Count status categories
-                if deviation_percent <= 5:
-                    excellent_count += 1
-                elif deviation_percent <= 15:
-                    good_count += 1
-                else:
-                    poor_count += 1
+        targeted = [nutrient for nutrient, target in target_concentrations.items() if target > 0]
+        targets = np.array([target_concentrations[nutrient] for nutrient in targeted], dtype=float)
+        achieved = np.array([achieved_concentrations.get(nutrient, 0) for nutrient in targeted], dtype=float)
+        deviation_percents = np.abs((achieved - targets) / targets * 100)
+
+        # Status categories: <= 5% excellent, <= 15% good, poor beyond
+        categories = np.searchsorted([5.0, 15.0], deviation_percents, side='left')
+        excellent_count, good_count, poor_count = (int(np.count_nonzero(categories == c)) for c in range(3))
+        nutrient_count = len(targeted)
+
+        deviation_details = {
+            nutrient: {
+                'target': target_concentrations[nutrient],
+                'achieved': achieved_concentrations.get(nutrient, 0),
+                'deviation_percent': float(deviation_percents[j]),
+                'absolute_difference': achieved_concentrations.get(nutrient, 0) - target_concentrations[nutrient]
+            }
+            for j, nutrient in enumerate(targeted)
+        }
         
-        average_deviation = total_deviation / nutrient_count if nutrient_count > 0 else 0
+        average_deviation = sum(deviation_percents.tolist()) / nutrient_count if nutrient_count > 0 else 0
         
         # 3. Dosage analysis
         active_fertilizers = [name for name, dosage in dosages.items() if dosage > 0.001]
@@ -791,25 +806,10 @@ class SolutionVerifier:
     
     def _convert_to_meq_l(self, concentrations_mg_l: Dict[str, float]) -> Dict[str, float]:
         """Convert mg/L concentrations to meq/L for ionic balance calculations"""
-        
-        # Atomic weights and valences
-        conversion_factors = {
-            'Ca': 20.04,   # Ca²⁺ = 40.08/2
-            'K': 39.10,    # K⁺ = 39.10/1  
-            'Mg': 12.15,   # Mg²⁺ = 24.31/2
-            'Na': 22.99,   # Na⁺ = 22.99/1
-            'NH4': 18.04,  # NH₄⁺ = 18.04/1
-            'N': 14.01,    # NO₃⁻ = 14.01/1 (as N)
-            'S': 16.03,    # SO₄²⁻ = 32.06/2 (as S)
-            'P': 30.97,    # H₂PO₄⁻ = 30.97/1 (as P)
-            'Cl': 35.45,   # Cl⁻ = 35.45/1
-            'HCO3': 61.02  # HCO₃⁻ = 61.02/1
-        }
-        
         meq_l = {}
         for element, mg_l in concentrations_mg_l.items():
-            if element in conversion_factors and mg_l > 0:
-                meq_l[element] = mg_l / conversion_factors[element]
+            if element in MG_PER_MEQ and mg_l > 0:
+                meq_l[element] = mg_l / MG_PER_MEQ[element]
             else:
                 meq_l[element] = 0
         
@@ -839,6 +839,77 @@ class SolutionVerifier:
             return 'F'
 
 
+# Fallback cost (CRC per kg) by keyword when no table entry matches; first keyword in order wins
+KEYWORD_COSTS = {
+    'nitrato': 1.00,
+    'sulfato': 0.80,
+    'fosfato': 2.50,
+    'cloruro': 1.20,
+    'calcio': 0.80,
+    'potasio': 1.40,
+    'magnesio': 0.70,
+    'hierro': 5.00,
+    'zinc': 4.00,
+    'cobre': 5.50,
+    'manganeso': 3.50,
+    'boro': 6.00,
+    'molibdeno': 12.00,
+    'acido': 1.50
+}
+DEFAULT_COST = 2.00
+
+
+class FertilizerCostIndex:
+    """
+    Cost table normalized once: a hash index on normalized names, a pattern automaton for
+    the name-in-entry / entry-in-name partial match and one for the keyword fallback.
+    Lookups are memoized per name as (cost, match), match being exact / case_insensitive /
+    partial / keyword / default.
+    """
+
+    def __init__(self, fertilizer_costs: Dict[str, float]):
+        self.fertilizer_costs = dict(fertilizer_costs)
+        entries = list(self.fertilizer_costs.items())
+        self._normalized: Dict[str, float] = {}
+        for cost_name, cost in entries:
+            self._normalized.setdefault(normalize_name(cost_name), cost)
+        self._entry_costs = [cost for _, cost in entries]
+        self._entries = PatternAutomaton((normalize_name(name), rank) for rank, (name, _) in enumerate(entries))
+        self._keyword_costs = list(KEYWORD_COSTS.items())
+        self._keywords = PatternAutomaton((keyword, rank) for rank, (keyword, _) in enumerate(self._keyword_costs))
+        self._memo: Dict[str, Tuple[float, str]] = {}
+        self._lock = threading.Lock()
+
+    def lookup(self, fertilizer_name: str) -> Tuple[float, str]:
+        cached = self._memo.get(fertilizer_name)
+        if cached is None:
+            cached = self._resolve(fertilizer_name)
+            with self._lock:
+                self._memo[fertilizer_name] = cached
+        return cached
+
+    def _resolve(self, fertilizer_name: str) -> Tuple[float, str]:
+        if fertilizer_name in self.fertilizer_costs:
+            return self.fertilizer_costs[fertilizer_name], 'exact'
+
+        normalized = normalize_name(fertilizer_name)
+        if normalized in self._normalized:
+            return self._normalized[normalized], 'case_insensitive'
+
+        rank = self._entries.first_match(normalized)
+        if rank != NO_MATCH:
+            return self._entry_costs[rank], 'partial'
+
+        rank = self._keywords.first_match(normalized, bidirectional=False)
+        if rank != NO_MATCH:
+            keyword, cost = self._keyword_costs[rank]
+            print(f"    [MONEY] Using keyword-based cost for {fertilizer_name}: ₡{cost:.2f}/kg")
+            return cost, 'keyword'
+
+        print(f"    [WARNING]  Unknown fertilizer {fertilizer_name}, using default cost: ₡{DEFAULT_COST:.2f}/kg")
+        return DEFAULT_COST, 'default'
+
+
 class CostAnalyzer:
     """Professional cost analysis module with market-based pricing"""
 
@@ -955,6 +1026,8 @@ class CostAnalyzer:
             'Na2MoO4.2H2O': 95000.0
         }
 
+        self.cost_index = FertilizerCostIndex(self.fertilizer_costs)
+
         # ACTUALIZAR TAMBIÉN los regional_factors para Costa Rica:
         self.regional_factors = {
             'North America': 1.0,
@@ -995,12 +1068,15 @@ class CostAnalyzer:
         for name, amount in fertilizer_amounts_kg.items():
             print(f"  • {name}: {amount:.3f} kg")
         
-        # Use the existing cost calculation method
+        # Use the existing cost calculation method, with the prices matched from the API
+        api_prices = {name: data['price'] for name, data in fertilizer_data.items()
+                      if isinstance(data, dict) and data.get('price') is not None}
         cost_result = self.calculate_solution_cost_with_api_data(
             fertilizer_amounts=fertilizer_amounts_kg,
             concentrated_volume=volume_liters,
             diluted_volume=volume_liters,  # Assuming no dilution for now
-            region=region
+            region=region,
+            api_prices=api_prices
         )
         
         # Enhance the result with additional analysis for the constrained endpoint
@@ -1122,9 +1198,12 @@ class CostAnalyzer:
     def calculate_solution_cost_with_api_data(self, fertilizer_amounts: Dict[str, float], 
                               concentrated_volume: float, 
                               diluted_volume: float,
-                              region: str = 'Default') -> Dict[str, Any]:
+                              region: str = 'Default',
+                              api_prices: Optional[Dict[str, float]] = None) -> Dict[str, Any]:
         """
-        Calculate comprehensive solution cost analysis
+        Calculate comprehensive solution cost analysis.
+        api_prices (CRC/kg by fertilizer name, as matched from FertilizerInput) take
+        precedence over the internal table; the regional factor applies to table prices only.
         """
         print(f"\n[MONEY] CALCULATING COST ANALYSIS")
         print(f"Fertilizer amounts: {len(fertilizer_amounts)} fertilizers")
@@ -1137,11 +1216,19 @@ class CostAnalyzer:
         total_cost_concentrated = 0
         total_cost_diluted = 0
         
+        api_price_lookup = self._api_price_lookup(api_prices)
+
         # Calculate cost for each fertilizer
         for fertilizer, amount_kg in fertilizer_amounts.items():
             if amount_kg > 0:
-                # Get cost per kg (try multiple name variations)
-                cost_per_kg = self._get_fertilizer_cost(fertilizer) * regional_factor
+                # Get cost per kg: API price first, then the internal table
+                api_price = api_price_lookup(fertilizer)
+                if api_price is not None:
+                    cost_per_kg, price_source, price_match = api_price, 'api', 'api'
+                else:
+                    cost_per_kg, price_match = self.cost_index.lookup(fertilizer)
+                    cost_per_kg *= regional_factor
+                    price_source = 'fallback'
                 
                 # Calculate costs
                 cost_concentrated = amount_kg * cost_per_kg
@@ -1151,7 +1238,8 @@ class CostAnalyzer:
                     'amount_kg': round(amount_kg, 4),
                     'cost_per_kg': round(cost_per_kg, 2),
                     'total_cost': round(cost_concentrated, 3),
-                    'price_source': 'fallback'  # Default to fallback since we're using internal pricing
+                    'price_source': price_source,
+                    'price_match': price_match
                 }
                 
                 total_cost_concentrated += cost_concentrated
@@ -1175,9 +1263,10 @@ class CostAnalyzer:
         
         # Calculate pricing summary
         total_fertilizers_used = len([f for f in cost_per_fertilizer.keys() if cost_per_fertilizer[f]['amount_kg'] > 0])
-        api_prices_used = 0  # Default to 0 since we're using fallback prices
-        fallback_prices_used = total_fertilizers_used
-        api_price_coverage = 0.0  # Default to 0% since we're using fallback prices
+        api_prices_used = sum(1 for info in cost_per_fertilizer.values()
+                              if info['amount_kg'] > 0 and info['price_source'] == 'api')
+        fallback_prices_used = total_fertilizers_used - api_prices_used
+        api_price_coverage = round(api_prices_used / total_fertilizers_used * 100, 1) if total_fertilizers_used else 0.0
         
         # Enhanced result structure to match expected format
         result = {
@@ -1219,50 +1308,20 @@ class CostAnalyzer:
         
         return result
 
+    @staticmethod
+    def _api_price_lookup(api_prices: Optional[Dict[str, float]]):
+        """name -> API price (exact, then normalized name) or None"""
+        if not api_prices:
+            return lambda name: None
+        valid = {name: float(price) for name, price in api_prices.items() if price is not None and price > 0}
+        normalized = {}
+        for name, price in valid.items():
+            normalized.setdefault(normalize_name(name), price)
+        return lambda name: valid.get(name, normalized.get(normalize_name(name)))
+
     def _get_fertilizer_cost(self, fertilizer_name: str) -> float:
         """
-        Get fertilizer cost with intelligent name matching
+        Get fertilizer cost with intelligent name matching (memoized table lookup)
         """
-        # Try exact match first
-        if fertilizer_name in self.fertilizer_costs:
-            return self.fertilizer_costs[fertilizer_name]
-        
-        # Try case-insensitive match
-        name_lower = fertilizer_name.lower()
-        for cost_name, cost in self.fertilizer_costs.items():
-            if cost_name.lower() == name_lower:
-                return cost
-        
-        # Try partial matching
-        for cost_name, cost in self.fertilizer_costs.items():
-            if name_lower in cost_name.lower() or cost_name.lower() in name_lower:
-                return cost
-        
-        # Try keyword matching for common fertilizers
-        keyword_mapping = {
-            'nitrato': 1.00,
-            'sulfato': 0.80,
-            'fosfato': 2.50,
-            'cloruro': 1.20,
-            'calcio': 0.80,
-            'potasio': 1.40,
-            'magnesio': 0.70,
-            'hierro': 5.00,
-            'zinc': 4.00,
-            'cobre': 5.50,
-            'manganeso': 3.50,
-            'boro': 6.00,
-            'molibdeno': 12.00,
-            'acido': 1.50
-        }
-        
-        for keyword, default_cost in keyword_mapping.items():
-            if keyword in name_lower:
-                print(f"    [MONEY] Using keyword-based cost for {fertilizer_name}: ₡{default_cost:.2f}/kg")
-                return default_cost
-        
-        # Default cost for unknown fertilizers
-        default_cost = 2.00
-        print(f"    [WARNING]  Unknown fertilizer {fertilizer_name}, using default cost: ₡{default_cost:.2f}/kg")
-        return default_cost
+        return self.cost_index.lookup(fertilizer_name)[0]
    
\ No newline at end of file
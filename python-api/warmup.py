@@ -0,0 +1,157 @@
+# warmup.py
+"""
+Startup Warmup Module
+Primes the solver, PDF renderer, ML model and (optionally) catalog fetches before
+the readiness probe reports ready, so the first real request is not a cold one
+"""
+
+import asyncio
+import os
+import tempfile
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Any, Callable
+
+from models import FertilizerRequest, CalculationSettings
+
+# Built-in sample catalog: a representative macro set (micros are auto-added by the calculator)
+SAMPLE_FERTILIZERS = [
+    'nitrato de calcio',
+    'nitrato de potasio',
+    'fosfato monopotasico',
+    'sulfato de magnesio',
+    'sulfato de potasio'
+]
+
+SAMPLE_TARGETS = {
+    'N': 150, 'P': 40, 'K': 200, 'Ca': 180, 'Mg': 50, 'S': 80,
+    'Fe': 2.0, 'Mn': 0.5, 'Zn': 0.3, 'Cu': 0.1, 'B': 0.5, 'Mo': 0.05
+}
+
+SAMPLE_WATER = {
+    'Ca': 20, 'K': 5, 'Mg': 8, 'Na': 10, 'N': 2, 'S': 5, 'Cl': 5, 'HCO3': 60,
+    'Fe': 0.1, 'Mn': 0.02, 'Zn': 0.02, 'Cu': 0.01, 'B': 0.05, 'Mo': 0.001
+}
+
+
+def _env_flag(name: str, default: bool) -> bool:
+    return os.getenv(name, str(default)).lower() not in ("0", "false", "no")
+
+
+@dataclass
+class WarmupConfig:
+    """Which warmup steps run at startup (WARMUP_* environment variables)"""
+    run_lp: bool = True
+    render_pdf: bool = True
+    load_ml_model: bool = True
+    prefetch_catalog_ids: List[int] = field(default_factory=list)
+
+    @classmethod
+    def from_env(cls) -> 'WarmupConfig':
+        catalogs = [c.strip() for c in os.getenv("WARMUP_PREFETCH_CATALOGS", "").split(",") if c.strip()]
+        return cls(
+            run_lp=_env_flag("WARMUP_LP", True),
+            render_pdf=_env_flag("WARMUP_PDF", True),
+            load_ml_model=_env_flag("WARMUP_ML_MODEL", True),
+            prefetch_catalog_ids=[int(c) for c in catalogs if c.isdigit()]
+        )
+
+
+class WarmupFailed(Exception):
+    """Raised when a critical warmup step fails; carries every step result"""
+
+    def __init__(self, message: str, steps: Dict[str, Any]):
+        super().__init__(message)
+        self.steps = steps
+
+
+def build_sample_request(fertilizer_db) -> FertilizerRequest:
+    """Representative calculation built only from the local composition database"""
+    return FertilizerRequest(
+        fertilizers=[fertilizer_db.create_fertilizer_from_database(name) for name in SAMPLE_FERTILIZERS],
+        target_concentrations=dict(SAMPLE_TARGETS),
+        water_analysis=dict(SAMPLE_WATER),
+        calculation_settings=CalculationSettings(
+            volume_liters=1000, precision=3, units="mg/L", crop_phase="Warmup")
+    )
+
+
+def run_warmup_steps(calculator,
+                     fertilizer_db,
+                     pdf_generator,
+                     ml_optimizer_holder,
+                     config: WarmupConfig,
+                     prefetch_catalog: Callable[[int], Any] = None) -> Dict[str, Any]:
+    """
+    Run the configured warmup steps. The sample LP is critical (failure keeps the
+    instance unready); PDF, ML model and catalog prefetch failures are reported only.
+    """
+    steps: Dict[str, Any] = {}
+    critical_failures = []
+
+    def run_step(name: str, critical: bool, func: Callable[[], Any]):
+        start = time.perf_counter()
+        try:
+            detail = func()
+            steps[name] = {'ok': True, 'seconds': round(time.perf_counter() - start, 3), 'detail': detail}
+            print(f"[WARMUP] {name}: OK ({steps[name]['seconds']:.2f}s)")
+        except Exception as e:
+            steps[name] = {'ok': False, 'seconds': round(time.perf_counter() - start, 3),
+                           'critical': critical, 'error': str(e)}
+            print(f"[WARMUP] {name}: FAILED ({e})")
+            if critical:
+                critical_failures.append(name)
+
+    sample_results = {}
+
+    def sample_lp():
+        request = build_sample_request(fertilizer_db)
+        sample_results.update(calculator.calculate_linear_programming_solution(request, log_solution=False))
+        sample_results['_request'] = request
+        return {
+            'status': sample_results['optimization_status'],
+            'active_fertilizers': sample_results['active_fertilizers']
+        }
+
+    def throwaway_pdf():
+        if not sample_results:
+            raise RuntimeError("sample LP did not run")
+        request = sample_results['_request']
+        calculation_data = {
+            "integration_metadata": {
+                "data_source": "Startup warmup (built-in sample catalog)",
+                "fertilizers_processed": len(request.fertilizers),
+                "optimization_method": "linear_programming",
+                "calculation_timestamp": time.strftime("%Y-%m-%dT%H:%M:%S")
+            },
+            "calculation_results": {k: v for k, v in sample_results.items() if k != '_request'},
+            "fertilizer_database": {},
+            "water_analysis": request.water_analysis,
+            "target_concentrations": request.target_concentrations
+        }
+        fd, path = tempfile.mkstemp(prefix="warmup_", suffix=".pdf")
+        os.close(fd)
+        try:
+            pdf_generator.generate_comprehensive_pdf(calculation_data, path)
+            return {'size_bytes': os.path.getsize(path)}
+        finally:
+            if os.path.exists(path):
+                os.remove(path)
+
+    def ml_model():
+        return {'model_loaded': ml_optimizer_holder.get().ensure_model_loaded()}
+
+    if config.run_lp:
+        run_step("sample_lp", True, sample_lp)
+    if config.render_pdf:
+        run_step("throwaway_pdf", False, throwaway_pdf)
+    if config.load_ml_model:
+        run_step("ml_model", False, ml_model)
+    if prefetch_catalog is not None:
+        for catalog_id in config.prefetch_catalog_ids:
+            run_step(f"prefetch_catalog_{catalog_id}", False,
+                     lambda catalog_id=catalog_id: asyncio.run(prefetch_catalog(catalog_id)))
+
+    if critical_failures:
+        raise WarmupFailed(f"Critical warmup steps failed: {', '.join(critical_failures)}", steps)
+    return steps